@@ -0,0 +1,132 @@
+"""
+Benchmark: flattening transparent images for JPEG output
+
+Compares the old order (composite onto white at full resolution, with the
+alpha band copied out by split(), then downscale) with the current one: box
+reduce with alpha premultiplied once, one compositing pass at the reduced
+size, then the LANCZOS resize on three channels.
+
+Each variant runs in its own process, so its peak memory can be read from
+the operating system: Pillow allocates pixels outside Python's allocator,
+where tracemalloc cannot see them. Peak memory is only reported where the
+resource module exists (Linux, macOS).
+
+Usage:
+    python benchmarks/flatten_benchmark.py
+    python benchmarks/flatten_benchmark.py --size 8000x6000 --max-width 1920 --repeat 5
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+# Make the package importable when run from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from imagereducer.image_reducer import ImageReducer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss() -> int:
+    """Peak resident memory of this process in bytes, or 0 if unknown."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+def flatten_then_resize(img: Image.Image, max_width: int) -> Image.Image:
+    """The previous order: full-size background, split() copies, then resize."""
+    background = Image.new('RGB', img.size, (255, 255, 255))
+    background.paste(img, mask=img.split()[3])
+    background.thumbnail((max_width, max_width), Image.Resampling.LANCZOS)
+    return background
+
+
+def resize_then_flatten(img: Image.Image, max_width: int) -> Image.Image:
+    """The current order, as ImageReducer runs it."""
+    return ImageReducer()._downscale(img, max_width, flatten=True)
+
+
+VARIANTS = {
+    'flatten, then resize (before)': flatten_then_resize,
+    'resize, then flatten (now)': resize_then_flatten,
+}
+
+
+def make_input(path: Path, size):
+    """Write a noisy RGBA PNG with a gradient alpha channel."""
+    noise = [Image.effect_noise(size, 64) for _ in range(3)]
+    img = Image.merge('RGB', (noise[0], noise[1].transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise[2]))
+    img.putalpha(Image.linear_gradient('L').resize(size))
+    img.save(path, 'PNG', compress_level=1)
+
+
+def run_variant(name: str, path: str, max_width: int, repeat: int):
+    """Worker process: time one variant; print seconds and extra peak bytes."""
+    func = VARIANTS[name]
+    best = None
+    extra = 0
+    for _ in range(repeat):
+        with Image.open(path) as img:
+            img.load()
+            baseline = _peak_rss()
+            start = time.perf_counter()
+            func(img, max_width)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        extra = max(extra, _peak_rss() - baseline)
+    print(f"{best} {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark alpha flattening for JPEG output")
+    parser.add_argument('--size', default='8000x6000', help="Input size, WIDTHxHEIGHT (default 8000x6000)")
+    parser.add_argument('--max-width', type=int, default=1920, help="Output size (default 1920)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per variant; the fastest counts (default 3)")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_variant(args.worker, args.input, args.max_width, args.repeat)
+        return
+
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / "input.png"
+        print(f"Creating a {width}x{height} RGBA PNG...")
+        make_input(path, (width, height))
+
+        results = {}
+        for name in VARIANTS:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', name, '--input', str(path),
+                 '--max-width', str(args.max_width), '--repeat', str(args.repeat)],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            results[name] = (float(output[0]), int(output[1]))
+
+    print(f"\n{'Variant':<32}{'Time':>10}{'Extra peak memory':>20}")
+    for name, (seconds, extra) in results.items():
+        memory = f"{extra / (1024 * 1024):.0f} MB" if resource is not None else "n/a"
+        print(f"{name:<32}{seconds * 1000:>8.0f} ms{memory:>20}")
+
+    (before_time, before_memory), (now_time, now_memory) = results.values()
+    print(f"\nTime saved: {(1 - now_time / before_time) * 100:.0f}%")
+    if resource is not None and before_memory:
+        print(f"Peak memory saved: {(before_memory - now_memory) / (1024 * 1024):.0f} MB "
+              f"({(1 - now_memory / before_memory) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
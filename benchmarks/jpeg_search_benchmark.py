@@ -0,0 +1,124 @@
+"""
+Benchmark: JPEG size search with fast trial encodes
+
+Compares the previous search, where every attempt was encoded with Huffman
+optimization, with the current one: the first attempt is a full encode
+(most images fit right away), further attempts are fast baseline trials, and
+only the setting predicted to fit is encoded in full. Both must end with the
+same file; the Size column shows it.
+
+Each scenario is a 1920 px image and a target that needs a different number
+of search steps, from none to many. Smooth images gain little: their trial
+encodes are nearly as slow as full ones.
+
+Usage:
+    python benchmarks/jpeg_search_benchmark.py
+    python benchmarks/jpeg_search_benchmark.py --repeat 5
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+# Make the package importable when run from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from imagereducer.image_reducer import ImageReducer
+
+
+def _encode(img: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def search_before(reducer: ImageReducer, img: Image.Image, target: int):
+    """The previous loop: every attempt optimized."""
+    quality = reducer.quality
+    data = _encode(img, quality)
+    encodes = 1
+    while len(data) > target and quality > reducer.min_quality:
+        quality -= 5
+        data = _encode(img, quality)
+        encodes += 1
+    size = img.size
+    while len(data) > target and max(size) > reducer.min_width:
+        # Each size is resized from the original, as the search does now
+        size = (int(size[0] * 0.9), int(size[1] * 0.9))
+        data = _encode(img.resize(size, Image.Resampling.LANCZOS), quality)
+        encodes += 1
+    return data, encodes
+
+
+def search_now(reducer: ImageReducer, img: Image.Image, target: int):
+    """The current loop, as ImageReducer runs it."""
+    encodes = 0
+    original = reducer._encode
+
+    def counting_encode(*args, **kwargs):
+        nonlocal encodes
+        encodes += 1
+        return original(*args, **kwargs)
+
+    reducer._encode = counting_encode
+    _, _, data = reducer._reduce_jpeg(img, target)
+    return data, encodes
+
+
+def make_photo(size, detail: int) -> Image.Image:
+    """Smooth gradients with noise; more detail compresses worse."""
+    channels = [
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.effect_noise(size, detail),
+    ]
+    noise = Image.effect_noise(size, detail)
+    return Image.merge('RGB', [Image.blend(channel, noise, 0.3) for channel in channels])
+
+
+SCENARIOS = [
+    # name, noise level, target in KB
+    ('fits at once', 20, 2048),
+    ('a few quality steps', 40, 700),
+    ('all quality steps', 64, 450),
+    ('quality and resize steps', 64, 250),
+    ('smooth, quality steps', 4, 40),
+    ('smooth, resize steps', 4, 15),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the JPEG size search")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per scenario; the fastest counts (default 3)")
+    args = parser.parse_args()
+
+    reducer = ImageReducer(min_width=800)
+    print(f"{'Scenario':<26}{'Encodes':>10}{'Before':>10}{'Now':>10}{'Saved':>8}{'Size':>18}")
+    total_before = total_now = 0.0
+    for name, detail, target_kb in SCENARIOS:
+        img = make_photo((1920, 1280), detail)
+        target = target_kb * 1024
+        timings = {}
+        for label, search in (('before', search_before), ('now', search_now)):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                data, encodes = search(reducer, img.copy(), target)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = (best, encodes, len(data))
+        before, now = timings['before'], timings['now']
+        total_before += before[0]
+        total_now += now[0]
+        print(f"{name:<26}{before[1]:>5} / {now[1]:<3}{before[0] * 1000:>8.0f}ms{now[0] * 1000:>8.0f}ms"
+              f"{(1 - now[0] / before[0]) * 100:>7.0f}%{before[2] // 1024:>8} / {now[2] // 1024} KB")
+    print(f"\nTotal encode time: {total_before * 1000:.0f} ms before, {total_now * 1000:.0f} ms now "
+          f"({(1 - total_now / total_before) * 100:.0f}% saved)")
+
+
+if __name__ == '__main__':
+    main()
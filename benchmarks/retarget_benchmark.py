@@ -0,0 +1,103 @@
+"""
+Benchmark: re-running a folder with another target size
+
+Reduces a folder of 1920 px photos for one target size, then again for
+another: once without the rate cache, which repeats the whole size search,
+and once with the sizes the first run recorded. Both second runs must write
+the same files; the Same column shows it.
+
+Both directions are run. For a larger target the first run already tried
+the settings that fit; for a smaller one the cache predicts the setting
+from the recorded sizes, and a wrong guess costs encodes, not quality.
+
+Usage:
+    python benchmarks/retarget_benchmark.py
+    python benchmarks/retarget_benchmark.py --files 12 --first 0.5 --second 1.0
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+# Make the package importable when run from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from imagereducer.image_reducer import ImageReducer
+from imagereducer.ratecache import RateCache
+
+
+def make_photo(size, detail: int) -> Image.Image:
+    """Smooth gradients with noise; more detail compresses worse."""
+    channels = [
+        Image.linear_gradient('L').resize(size),
+        Image.radial_gradient('L').resize(size),
+        Image.effect_noise(size, detail),
+    ]
+    noise = Image.effect_noise(size, detail)
+    return Image.merge('RGB', [Image.blend(channel, noise, 0.3) for channel in channels])
+
+
+def run(inputs, output: Path, max_size_mb: float, cache=None):
+    """Reduce every input; return (seconds, encodes, output bytes per file)."""
+    reducer = ImageReducer(max_size_mb=max_size_mb, rate_cache=cache)
+    encodes = 0
+    original = reducer._encode
+
+    def counting_encode(*args, **kwargs):
+        nonlocal encodes
+        encodes += 1
+        return original(*args, **kwargs)
+
+    reducer._encode = counting_encode
+    output.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    for path in inputs:
+        reducer.reduce(path, output / path.name)
+    elapsed = time.perf_counter() - start
+    return elapsed, encodes, [(output / path.name).read_bytes() for path in inputs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark re-targeting a folder with the rate cache")
+    parser.add_argument('--files', type=int, default=8, help="Photos in the folder (default 8)")
+    parser.add_argument('--first', type=float, default=0.3, help="Target of the first run in MB (default 0.3)")
+    parser.add_argument('--second', type=float, default=0.5, help="Target of the second run in MB (default 0.5)")
+    args = parser.parse_args()
+    # The given direction, then the opposite one
+    directions = [(args.first, args.second), (args.second, args.first)]
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        inputs = []
+        print(f"Creating {args.files} photos...")
+        for number in range(args.files):
+            path = folder / "input" / f"photo{number}.png"
+            path.parent.mkdir(exist_ok=True)
+            make_photo((1920, 1280), 40 + 8 * (number % 4)).save(path, compress_level=1)
+            inputs.append(path)
+
+        results = []
+        for number, (first_mb, second_mb) in enumerate(directions):
+            run_folder = folder / f"run{number}"
+            with RateCache(run_folder / "cache.db") as cache:
+                first = run(inputs, run_folder / "first", first_mb, cache)
+                cold = run(inputs, run_folder / "cold", second_mb)
+                warm = run(inputs, run_folder / "warm", second_mb, cache)
+            results.append((first_mb, second_mb, first, cold, warm))
+
+    for first_mb, second_mb, first, cold, warm in results:
+        print(f"\n{'Run':<34}{'Encodes/file':>14}{'Time/file':>12}{'Same':>6}")
+        for name, (seconds, encodes, _), same in (
+                (f"{first_mb} MB, first run", first, ''),
+                (f"{second_mb} MB, no cache", cold, ''),
+                (f"{second_mb} MB, cached sizes", warm, 'yes' if warm[2] == cold[2] else 'NO')):
+            print(f"{name:<34}{encodes / args.files:>14.1f}{seconds / args.files * 1000:>10.0f}ms{same:>6}")
+        print(f"Re-targeting {first_mb} -> {second_mb} MB, time saved: {(1 - warm[0] / cold[0]) * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,21 @@ import threading
 import queue
 import os
 import sys
-from PIL import Image
+
+from imagereducer.config import load_config
+from imagereducer.image_reducer import (
+    ImageReducer, AVIF_AVAILABLE, WEBP_AVAILABLE, DEFAULT_LARGE_IMAGE_PIXELS, DEFAULT_MAX_IMAGE_PIXELS,
+    PASS_THROUGH_MODES, SUBSAMPLING_MODES, FORMAT_EXTENSIONS
+)
+from imagereducer.classify import describe_content, describe_encoding
+from imagereducer.probe import probe_images, order_by_cost
+from imagereducer.dedupe import find_duplicates, link_or_copy
+from imagereducer.perceptual import find_near_duplicates, DEFAULT_MAX_DISTANCE
+from imagereducer.writer import OutputWriter, OUTPUT_LAYOUTS
+from imagereducer.scheduler import MemoryBudget, run_jobs, DEFAULT_MEMORY_BUDGET_MB
+from imagereducer.progress import ProgressTracker, ProgressReport, REPORT_FILENAME, format_duration
+from imagereducer.journal import BatchJournal, JOURNAL_FILENAME
+from imagereducer.ratecache import RateCache, RATE_CACHE_FILENAME
 
 # Import version information
 try:
@@ -32,6 +46,10 @@ except ImportError:
     VIDEO_COMPRESSION_AVAILABLE = False
     FFMPEG_INSTALLED = False
 
+# Log view limits: only the newest lines are kept, refreshed at a fixed rate
+DEFAULT_MAX_LOG_LINES = 500
+DEFAULT_REFRESH_MS = 250
+
 class ImageCompressorGUI:
     def __init__(self, root):
         self.root = root
@@ -50,6 +68,8 @@ class ImageCompressorGUI:
         self.quality = tk.IntVar(value=85)
         self.max_width = tk.IntVar(value=1920)
         self.preserve_transparency = tk.BooleanVar(value=False)
+        self.output_format = tk.StringVar(value="auto")
+        self.resume = tk.BooleanVar(value=False)
         
         # Video compression variables
         self.video_crf = tk.IntVar(value=28)
@@ -58,6 +78,48 @@ class ImageCompressorGUI:
         self.processing = False
         self.cancel_flag = False
         self.progress_queue = queue.Queue()
+        self.tracker = None
+        self.report_path = None
+        
+        # Parallelism and memory budget from config.ini
+        config = load_config()
+        if config.getboolean('Advanced', 'MultiThreading', fallback=True):
+            self.max_threads = max(1, config.getint('Advanced', 'MaxThreads', fallback=4))
+        else:
+            self.max_threads = 1
+        self.memory_budget_mb = config.getint('Advanced', 'MemoryBudgetMB', fallback=DEFAULT_MEMORY_BUDGET_MB)
+        self.large_image_pixels = config.getint('Advanced', 'LargeImagePixels', fallback=DEFAULT_LARGE_IMAGE_PIXELS)
+        self.max_image_pixels = config.getint('Advanced', 'MaxImagePixels', fallback=DEFAULT_MAX_IMAGE_PIXELS)
+        self.keep_metadata = config.getboolean('Output', 'KeepExifData', fallback=False)
+        self.convert_to_srgb = config.getboolean('Output', 'ConvertToSRGB', fallback=True)
+        self.analyze_content = config.getboolean('Output', 'AnalyzeContent', fallback=True)
+        self.progressive = config.getboolean('Output', 'ProgressiveJpeg', fallback=True)
+        self.subsampling = config.get('Output', 'ChromaSubsampling', fallback='auto').strip().lower()
+        if self.subsampling not in SUBSAMPLING_MODES:
+            self.subsampling = 'auto'
+        self.detect_duplicates = config.getboolean('Advanced', 'DetectDuplicates', fallback=True)
+        self.link_duplicates = config.getboolean('Advanced', 'LinkDuplicates', fallback=False)
+        self.near_duplicates = config.get('Advanced', 'NearDuplicates', fallback='off').strip().lower()
+        if self.near_duplicates not in ('off', 'report', 'skip', 'link'):
+            self.near_duplicates = 'off'
+        self.near_duplicate_distance = config.getint('Advanced', 'NearDuplicateDistance', fallback=DEFAULT_MAX_DISTANCE)
+        self.fsync_outputs = config.getboolean('Advanced', 'FsyncOutputs', fallback=False)
+        self.use_rate_cache = config.getboolean('Advanced', 'RateCache', fallback=True)
+        self.pass_through = config.get('Advanced', 'PassThrough', fallback='copy').strip().lower()
+        if self.pass_through not in PASS_THROUGH_MODES:
+            self.pass_through = 'copy'
+        
+        # Output layout; SubfolderByDate predates OutputLayout and means 'date'
+        self.output_layout = config.get('Output', 'OutputLayout', fallback='flat').strip().lower()
+        if self.output_layout not in OUTPUT_LAYOUTS:
+            self.output_layout = 'flat'
+        if self.output_layout == 'flat' and config.getboolean('Output', 'SubfolderByDate', fallback=False):
+            self.output_layout = 'date'
+        self.shard_levels = config.getint('Output', 'ShardLevels', fallback=1)
+        
+        # Progress view; the full per-file log goes to the report file
+        self.max_log_lines = max(10, config.getint('UI', 'MaxLogLines', fallback=DEFAULT_MAX_LOG_LINES))
+        self.refresh_ms = max(50, config.getint('UI', 'RefreshMs', fallback=DEFAULT_REFRESH_MS))
         
         # Setup UI
         self.create_widgets()
@@ -240,6 +302,27 @@ class ImageCompressorGUI:
         tk.Label(output_frame, text="(Created inside selected folder)", 
                 font=("Segoe UI", 8), fg="gray").pack(side=tk.LEFT)
         
+        # Output format
+        format_frame = tk.Frame(settings_frame)
+        format_frame.pack(fill=tk.X, pady=3)
+        tk.Label(format_frame, text="Output Format:", font=("Segoe UI", 9)).pack(side=tk.LEFT)
+        format_values = ['auto', 'jpeg', 'png']
+        if WEBP_AVAILABLE:
+            format_values.append('webp')
+        if AVIF_AVAILABLE:
+            format_values.append('avif')
+        format_combo = ttk.Combobox(
+            format_frame,
+            textvariable=self.output_format,
+            values=format_values,
+            width=12,
+            state='readonly',
+            font=("Segoe UI", 9)
+        )
+        format_combo.pack(side=tk.LEFT, padx=10)
+        tk.Label(format_frame, text="(auto = JPEG, PNG when keeping transparency; WebP/AVIF are smaller)", 
+                font=("Segoe UI", 8), fg="gray").pack(side=tk.LEFT)
+        
         # Video Settings
         video_settings_frame = tk.LabelFrame(
             content_frame,
@@ -293,7 +376,20 @@ class ImageCompressorGUI:
             font=("Segoe UI", 9)
         )
         transparency_check.pack(side=tk.LEFT)
-        tk.Label(transparency_frame, text="(Keep alpha channel for PNG files)", 
+        tk.Label(transparency_frame, text="(Keep alpha channel for PNG files: PNG, WebP or AVIF output)", 
+                font=("Segoe UI", 8), fg="gray").pack(side=tk.LEFT, padx=5)
+        
+        # Resume an interrupted batch
+        resume_frame = tk.Frame(settings_frame)
+        resume_frame.pack(fill=tk.X, pady=3)
+        resume_check = tk.Checkbutton(
+            resume_frame,
+            text="Resume Interrupted Batch",
+            variable=self.resume,
+            font=("Segoe UI", 9)
+        )
+        resume_check.pack(side=tk.LEFT)
+        tk.Label(resume_frame, text="(Skip files already compressed into the output folder)", 
                 font=("Segoe UI", 8), fg="gray").pack(side=tk.LEFT, padx=5)
         
         # Action buttons
@@ -343,7 +439,24 @@ class ImageCompressorGUI:
             mode='determinate',
             length=100
         )
-        self.progress_bar.pack(fill=tk.X, pady=(0, 10))
+        self.progress_bar.pack(fill=tk.X, pady=(0, 5))
+        
+        # Counters, throughput and ETA, and a link to the full report
+        stats_frame = tk.Frame(progress_frame)
+        stats_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        self.stats_label = tk.Label(stats_frame, text="", font=("Segoe UI", 9), anchor=tk.W)
+        self.stats_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.report_link = tk.Label(
+            stats_frame,
+            text="",
+            font=("Segoe UI", 9, "underline"),
+            fg="#1a73e8",
+            cursor="hand2"
+        )
+        self.report_link.pack(side=tk.RIGHT)
+        self.report_link.bind("<Button-1>", lambda event: self.open_report())
         
         # Status text with scrollbar
         text_frame = tk.Frame(progress_frame)
@@ -365,11 +478,47 @@ class ImageCompressorGUI:
     
     def log_message(self, message):
         """Add message to status text"""
+        self.append_log([message])
+    
+    def append_log(self, messages):
+        """Add messages to status text in one insert, keeping only the last max_log_lines lines"""
+        lines = "\n".join(messages).split("\n")[-self.max_log_lines:]
         self.status_text.config(state=tk.NORMAL)
-        self.status_text.insert(tk.END, message + "\n")
+        self.status_text.insert(tk.END, "\n".join(lines) + "\n")
+        line_count = int(self.status_text.index("end-1c").split(".")[0])
+        if line_count > self.max_log_lines:
+            self.status_text.delete("1.0", f"{line_count - self.max_log_lines}.0")
         self.status_text.see(tk.END)
         self.status_text.config(state=tk.DISABLED)
     
+    def update_stats(self):
+        """Show the tracker's counters, throughput and ETA"""
+        if self.tracker is None:
+            return
+        stats = self.tracker.snapshot()
+        self.progress_bar['value'] = stats['percent']
+        saved_mb = (stats['input_bytes'] - stats['output_bytes']) / (1024 * 1024)
+        text = f"{stats['done']}/{stats['total']} files"
+        if stats['failed']:
+            text += f" ({stats['failed']} failed)"
+        text += f"  •  {stats['rate']:.1f} files/s  •  ETA {format_duration(stats['eta'])}"
+        text += f"  •  {saved_mb:.1f} MB saved"
+        self.stats_label.config(text=text)
+    
+    def open_report(self):
+        """Open the full report file in the default text viewer"""
+        if not self.report_path or not self.report_path.exists():
+            return
+        try:
+            if sys.platform == 'win32':
+                os.startfile(self.report_path)
+            else:
+                import subprocess
+                opener = 'open' if sys.platform == 'darwin' else 'xdg-open'
+                subprocess.Popen([opener, str(self.report_path)])
+        except OSError as e:
+            messagebox.showerror("Error", f"Cannot open {self.report_path}: {e}")
+    
     def browse_folder(self):
         """Browse for a folder"""
         folder = filedialog.askdirectory(title="Select Folder with Images")
@@ -429,6 +578,10 @@ class ImageCompressorGUI:
         self.compress_btn.config(state=tk.DISABLED)
         self.cancel_btn.config(state=tk.NORMAL)
         self.progress_bar['value'] = 0
+        self.tracker = None
+        self.report_path = None
+        self.stats_label.config(text="")
+        self.report_link.config(text="")
         
         # Start compression in a separate thread
         thread = threading.Thread(target=self.compress_images, daemon=True)
@@ -441,6 +594,9 @@ class ImageCompressorGUI:
     
     def compress_images(self):
         """Main compression logic (runs in separate thread)"""
+        report = None
+        journal = None
+        rate_cache = None
         try:
             path = self.selected_path.get()
             
@@ -543,6 +699,8 @@ class ImageCompressorGUI:
                     stem_choice = {}
                     for f in image_files:
                         key = f.stem.lower()
+                        if self.output_layout == 'mirror':
+                            key = (f.parent, key)  # subfolders keep their own outputs
                         if key not in stem_choice:
                             stem_choice[key] = f
                         else:
@@ -558,16 +716,71 @@ class ImageCompressorGUI:
                 self.progress_queue.put(("error", "No media files found in the selected location."))
                 return
             
-            # Create output folder
-            output_folder.mkdir(exist_ok=True)
+            # Create output folder and index the names already in it. Every output
+            # is written under a temporary name and renamed into place when done.
+            writer = OutputWriter(
+                output_folder,
+                fsync=self.fsync_outputs,
+                layout=self.output_layout,
+                source_root=output_folder.parent,
+                shard_levels=self.shard_levels
+            )
+            
+            # The journal records each file's output name and progress as the
+            # batch runs, so an interrupted batch can continue where it stopped
+            resume = self.resume.get()
+            journal = BatchJournal(output_folder / JOURNAL_FILENAME, resume=resume)
+            previous_outputs = {}
+            already_done = 0
+            if resume:
+                completed_sources = journal.completed()
+                remaining_images = [f for f in image_files if os.path.abspath(f) not in completed_sources]
+                remaining_videos = [f for f in video_files if os.path.abspath(f) not in completed_sources]
+                already_done = len(image_files) + len(video_files) - len(remaining_images) - len(remaining_videos)
+                image_files, video_files = remaining_images, remaining_videos
+                # Unfinished files are written to the names chosen for them last time
+                for source, output in journal.outputs().items():
+                    if output_folder in output.parents:
+                        previous_outputs[source] = writer.claim(output)
+            
+            # Sizes measured by earlier runs into this folder let a run with
+            # another target size skip most of each image's search
+            if self.use_rate_cache:
+                rate_cache = RateCache(output_folder / RATE_CACHE_FILENAME)
+            
+            def output_for(source, stem, ext):
+                previous = previous_outputs.get(os.path.abspath(source))
+                if previous is not None and previous.suffix == ext:
+                    return previous
+                return writer.reserve(stem, ext, source=source)
             
             total_files = len(image_files) + len(video_files)
-            self.progress_queue.put(("log", f"🔍 Found {len(image_files)} image(s) and {len(video_files)} video(s) to process\n"))
-            self.progress_queue.put(("log", "=" * 70))
+            
+            # Counters for the progress bar, throughput and ETA; the UI reads
+            # them at its refresh rate instead of getting a message per file
+            tracker = ProgressTracker(total_files)
+            self.tracker = tracker
+            
+            # Every line also goes to the report file; the window keeps only the newest
+            report = ProgressReport(output_folder / REPORT_FILENAME, append=resume)
+            self.progress_queue.put(("report", report.path))
+            
+            def log(message):
+                report.write(message)
+                self.progress_queue.put(("log", message))
+            
+            if resume:
+                log(f"⏩ Resuming: {already_done} file(s) already done, {total_files} to go\n")
+                if not total_files:
+                    report.close()
+                    self.progress_queue.put(("complete", ""))
+                    return
+            
+            log(f"🔍 Found {len(image_files)} image(s) and {len(video_files)} video(s) to process\n")
+            log("=" * 70)
             
             # Process results tracking
             results = []
-            processed_count = 0
             
             # Process video files first
             if video_files and VIDEO_COMPRESSION_AVAILABLE:
@@ -581,7 +794,8 @@ class ImageCompressorGUI:
                     msg += "  3. Add FFmpeg to your system PATH\n"
                     msg += "  4. Restart this application\n\n"
                     msg += f"Skipping {len(video_files)} video file(s).\n"
-                    self.progress_queue.put(("log", msg))
+                    log(msg)
+                    tracker.advance(len(video_files), failed=True)
                     video_files = []  # Skip video processing
                 
                 if video_files:  # Only process if FFmpeg is available
@@ -589,11 +803,11 @@ class ImageCompressorGUI:
                     
                     for i, input_path in enumerate(video_files, 1):
                         if self.cancel_flag:
-                            self.progress_queue.put(("log", "\n❌ Compression canceled by user."))
+                            log("\n❌ Compression canceled by user.")
                             break
                         
-                        processed_count += 1
-                        self.progress_queue.put(("log", f"🎬 Processing Video: {input_path.name} (#{processed_count}/{total_files})\n"))
+                        log(f"🎬 {input_path.name} (#{i}/{total_files}): compressing with "
+                            f"CRF={self.video_crf.get()}, preset={self.video_preset.get()}...")
                         
                         try:
                             # Get original size
@@ -601,31 +815,27 @@ class ImageCompressorGUI:
                             
                             # Create output path - always use .mp4 for video output for compatibility
                             stem = input_path.stem
-                            output_path = output_folder / f"{stem}_compressed.mp4"
-                            
-                            # Handle existing files
-                            counter = 1
-                            while output_path.exists():
-                                output_path = output_folder / f"{stem}_compressed_{counter}.mp4"
-                                counter += 1
+                            output_path = output_for(input_path, f"{stem}_compressed", ".mp4")
+                            journal.plan([(input_path, output_path)])
+                            journal.start(input_path)
                             
                             # Compress video
-                            self.progress_queue.put(("log", f"   Compressing with CRF={self.video_crf.get()}, preset={self.video_preset.get()}...\n"))
-                            
-                            result = video_reducer.compress(
-                                str(input_path),
-                                str(output_path)
-                            )
+                            with writer.atomic(output_path) as temp_output:
+                                result = video_reducer.compress(
+                                    str(input_path),
+                                    str(temp_output)
+                                )
+                                if not result['success']:
+                                    writer.release(output_path)
+                                    raise RuntimeError(result['error'])
                             
                             if result['success']:
                                 final_size_mb = result['output_size'] / (1024 * 1024)
                                 reduction = result['reduction_percent']
                                 
-                                msg = f"✅ {input_path.name}\n"
-                                msg += f"    {original_size_mb:.2f} MB → {final_size_mb:.2f} MB ({reduction:.1f}% reduction)\n"
-                                
-                                self.progress_queue.put(("log", msg))
-                                self.progress_queue.put(("progress", (processed_count / total_files) * 100))
+                                log(f"✅ {input_path.name}: {original_size_mb:.2f} MB → {final_size_mb:.2f} MB ({reduction:.1f}% reduction)")
+                                tracker.advance(input_bytes=result['input_size'], output_bytes=result['output_size'])
+                                journal.finish(input_path, result['output_size'])
                                 
                                 results.append({
                                     'name': input_path.name,
@@ -635,69 +845,200 @@ class ImageCompressorGUI:
                                     'reduction': reduction
                                 })
                             else:
-                                self.progress_queue.put(("log", f"❌ Error: {result['error']}\n"))
+                                log(f"❌ Error: {input_path.name} - {result['error']}")
+                                tracker.advance(failed=True)
+                                journal.fail(input_path, result['error'])
                             
                         except Exception as e:
-                            self.progress_queue.put(("log", f"❌ Error: {input_path.name} - {str(e)}\n"))
+                            log(f"❌ Error: {input_path.name} - {str(e)}")
+                            tracker.advance(failed=True)
+                            journal.fail(input_path, e)
             
             # Process image files
-            for i, input_path in enumerate(image_files, 1):
-                if self.cancel_flag:
-                    self.progress_queue.put(("log", "\n❌ Compression canceled by user."))
-                    break
+            reducer = ImageReducer(
+                quality=self.quality.get(),
+                max_width=self.max_width.get(),
+                max_size_mb=self.max_size_mb.get(),
+                large_image_pixels=self.large_image_pixels,
+                max_image_pixels=self.max_image_pixels,
+                output_format=self.output_format.get(),
+                keep_metadata=self.keep_metadata,
+                convert_to_srgb=self.convert_to_srgb,
+                pass_through=self.pass_through,
+                analyze_content=self.analyze_content,
+                progressive=self.progressive,
+                subsampling=self.subsampling,
+                rate_cache=rate_cache
+            )
+            preserve_transparency = self.preserve_transparency.get()
+            
+            # Planning: read every header once (no pixel decoding). The result
+            # drives the transparency check, memory estimates and job order.
+            infos = probe_images(image_files, max_workers=self.max_threads * 2)
+            
+            # Byte-identical inputs are compressed once; the others reuse that output
+            duplicate_of = {}
+            if self.detect_duplicates:
+                groups = find_duplicates(
+                    image_files, max_workers=self.max_threads * 2, sizes=[info.file_size for info in infos]
+                )
+                for group in groups:
+                    for duplicate in group[1:]:
+                        duplicate_of[duplicate] = group[0]
+                if duplicate_of:
+                    log(f"🔁 {len(duplicate_of)} duplicate image(s) will reuse an identical file's output\n")
+            
+            # Visually identical images (burst shots, re-exports): report them,
+            # skip them, or reuse the output of the highest-resolution one
+            skipped = set()
+            if self.near_duplicates != 'off':
+                candidates = [p for p, info in zip(image_files, infos) if p not in duplicate_of and not info.error]
+                near_groups = find_near_duplicates(
+                    candidates, max_distance=self.near_duplicate_distance, max_workers=self.max_threads,
+                    max_image_pixels=self.max_image_pixels,
+                    budget=MemoryBudget(self.memory_budget_mb * 1024 * 1024)
+                )
+                for group in near_groups:
+                    names = ", ".join(p.name for p in group[1:])
+                    log(f"👯 Looks like {group[0].name}: {names}")
+                    for near in group[1:]:
+                        if self.near_duplicates == 'skip':
+                            skipped.add(near)
+                        elif self.near_duplicates == 'link':
+                            duplicate_of[near] = group[0]
+                # Exact copies follow their original
+                for duplicate, original in list(duplicate_of.items()):
+                    while original in duplicate_of:
+                        original = duplicate_of[original]
+                    duplicate_of[duplicate] = original
+                    if original in skipped:
+                        skipped.add(duplicate)
+                if skipped:
+                    log(f"⏭️  Skipping {len(skipped)} near-duplicate image(s)\n")
+                    tracker.advance(len(skipped))
+            
+            # Choose every output name up front so parallel workers never race on it
+            has_alpha = {path: info.has_alpha for path, info in zip(image_files, infos)}
+            image_jobs = []
+            duplicate_outputs = {}
+            for input_path, info in zip(image_files, infos):
+                if input_path in skipped:
+                    continue
                 
-                processed_count += 1
-                # Debug: Log which file we're processing
-                self.progress_queue.put(("log", f"🔄 Processing Image: {input_path.name} (#{processed_count}/{total_files})\n"))
+                # Determine output extension based on transparency preservation;
+                # duplicates share their original's output, so use its format
+                source_path = duplicate_of.get(input_path, input_path)
+                stem = input_path.stem
+                input_ext = source_path.suffix.lower()
+                preserve_alpha = preserve_transparency and input_ext == '.png' and has_alpha[source_path]
+                
+                output_ext = reducer.output_extension(preserve_alpha)
+                output_path = output_for(input_path, stem, output_ext)
+                
+                if output_path.name != f"{stem}{output_ext}":
+                    log(f"⚠️  File {stem}{output_ext} already exists, using {output_path.name}")
+                
+                if input_path in duplicate_of:
+                    duplicate_outputs.setdefault(duplicate_of[input_path], []).append((input_path, output_path))
+                else:
+                    image_jobs.append((input_path, output_path, preserve_alpha, info))
+            
+            journal.plan(
+                [(job[0], job[1]) for job in image_jobs]
+                + [pair for pairs in duplicate_outputs.values() for pair in pairs]
+            )
+            
+            # Largest first, so one giant file does not run alone at the end
+            image_jobs = order_by_cost(image_jobs, key=lambda job: job[3], max_width=reducer.max_width)
+            
+            def process_image(job):
+                input_path, output_path, preserve_alpha, _ = job
+                journal.start(input_path)
+                
+                # Files that already meet the target are used as they are, undecoded
+                if reducer.pass_through != 'off' and reducer.meets_target(input_path, preserve_alpha):
+                    with writer.atomic(output_path) as temp_output:
+                        how = link_or_copy(input_path, temp_output, hard_link=reducer.pass_through == 'link')
+                    return how, output_path
+                
+                encoded = reducer.encode_file(input_path, preserve_alpha)
+                output_ext = FORMAT_EXTENSIONS[encoded['format']]
+                if output_ext != output_path.suffix:
+                    # The image's content picked another format than planned
+                    writer.release(output_path)
+                    output_path = output_for(input_path, input_path.stem, output_ext)
+                writer.write_bytes(output_path, encoded.pop('data'))
+                return encoded, output_path
+            
+            # Jobs run in parallel, admitted only while their estimated peak
+            # memory fits the configured budget
+            budget = MemoryBudget(self.memory_budget_mb * 1024 * 1024)
+            completed = run_jobs(
+                image_jobs,
+                process_image,
+                max_workers=self.max_threads,
+                budget=budget,
+                estimate=lambda job: reducer.estimate_memory(job[3], job[2]) if not job[3].error else 0,
+                should_stop=lambda: self.cancel_flag
+            )
+            
+            passed_count = 0
+            encodings = {}
+            for (input_path, output_path, _, _), outcome, error in completed:
+                duplicates = duplicate_outputs.get(input_path, [])
+                if error is None:
+                    outcome, output_path = outcome
+                
+                if error is not None:
+                    log(f"❌ Error: {input_path.name} - {str(error)}")
+                    writer.release(output_path)
+                    journal.fail(input_path, error)
+                    for duplicate_path, duplicate_output in duplicates:
+                        writer.release(duplicate_output)
+                        journal.fail(duplicate_path, error)
+                    tracker.advance(1 + len(duplicates), failed=True)
+                    continue
                 
                 try:
-                    # Get original size
-                    original_size_mb = os.path.getsize(input_path) / (1024 * 1024)
-                    
-                    # Determine output extension based on transparency preservation
-                    stem = input_path.stem
-                    input_ext = input_path.suffix.lower()
-                    preserve_alpha = self.preserve_transparency.get() and input_ext == '.png'
-                    
-                    # Check if input PNG has transparency
-                    if preserve_alpha:
-                        with Image.open(input_path) as check_img:
-                            has_alpha = check_img.mode in ('RGBA', 'LA') or (check_img.mode == 'P' and 'transparency' in check_img.info)
-                            preserve_alpha = has_alpha
-                    
-                    output_ext = '.png' if preserve_alpha else '.jpg'
-                    output_path = output_folder / f"{stem}{output_ext}"
-                    
-                    # Debug: Check if file exists before compression
-                    original_output_path = output_path
-                    counter = 1
-                    while output_path.exists():
-                        output_path = output_folder / f"{stem}_{counter}{output_ext}"
-                        counter += 1
-                    
-                    # Debug logging
-                    if counter > 1:
-                        self.progress_queue.put(("log", f"⚠️  File {original_output_path.name} already exists, using {output_path.name}\n"))
-                    
-                    # Compress image
-                    result = self.reduce_image(
-                        input_path,
-                        output_path,
-                        self.quality.get(),
-                        self.max_width.get(),
-                        self.max_size_mb.get(),
-                        preserve_alpha
-                    )
-                    
-                    final_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+                    original_size = os.path.getsize(input_path)
+                    final_size = os.path.getsize(output_path)
+                    original_size_mb = original_size / (1024 * 1024)
+                    final_size_mb = final_size / (1024 * 1024)
                     reduction = ((original_size_mb - final_size_mb) / original_size_mb) * 100 if original_size_mb > 0 else 0
                     
-                    status = "✅" if final_size_mb < self.max_size_mb.get() else "⚠️"
-                    msg = f"{status} {input_path.name}\n"
-                    msg += f"    {original_size_mb:.2f} MB → {final_size_mb:.2f} MB ({reduction:.1f}% reduction)\n"
+                    journal.finish(input_path, final_size, output=output_path)
+                    if isinstance(outcome, str):
+                        passed_count += 1 + len(duplicates)
+                        how = 'linked' if outcome == 'link' else 'copied'
+                        msg = f"⏩ {input_path.name}: already {original_size_mb:.2f} MB, {how} unchanged"
+                    else:
+                        status = "✅" if final_size_mb < reducer.max_size_mb else "⚠️"
+                        msg = f"{status} {input_path.name}: {original_size_mb:.2f} MB → {final_size_mb:.2f} MB ({reduction:.1f}% reduction)"
+                        if outcome['content']:
+                            msg += f" · {describe_content(outcome['content'])}"
+                            encoding = describe_encoding(outcome['content'])
+                            encodings[encoding] = encodings.get(encoding, 0) + 1 + len(duplicates)
                     
-                    self.progress_queue.put(("log", msg))
-                    self.progress_queue.put(("progress", (processed_count / total_files) * 100))
+                    # Identical inputs get the same output without being encoded again
+                    for duplicate_path, duplicate_output in duplicates:
+                        if duplicate_output.suffix != output_path.suffix:
+                            writer.release(duplicate_output)
+                            duplicate_output = output_for(duplicate_path, duplicate_path.stem, output_path.suffix)
+                        with writer.atomic(duplicate_output) as temp_output:
+                            how = link_or_copy(output_path, temp_output, hard_link=self.link_duplicates)
+                        journal.finish(duplicate_path, final_size, output=duplicate_output)
+                        msg += f"\n🔁 {duplicate_path.name} matches, {'linked' if how == 'link' else 'copied'} to {duplicate_output.name}"
+                        results.append({
+                            'name': duplicate_path.name,
+                            'type': 'image',
+                            'original': original_size_mb,
+                            'final': final_size_mb,
+                            'reduction': reduction
+                        })
+                    
+                    log(msg)
+                    count = 1 + len(duplicates)
+                    tracker.advance(count, input_bytes=original_size * count, output_bytes=final_size * count)
                     
                     results.append({
                         'name': input_path.name,
@@ -708,7 +1049,14 @@ class ImageCompressorGUI:
                     })
                     
                 except Exception as e:
-                    self.progress_queue.put(("log", f"❌ Error: {input_path.name} - {str(e)}\n"))
+                    log(f"❌ Error: {input_path.name} - {str(e)}")
+                    tracker.advance(1 + len(duplicates), failed=True)
+                    journal.fail(input_path, e)
+            
+            writer.close()
+            
+            if self.cancel_flag and image_jobs:
+                log("\n❌ Compression canceled by user.")
             
             # Summary
             if results and not self.cancel_flag:
@@ -720,22 +1068,36 @@ class ImageCompressorGUI:
                 images_count = sum(1 for r in results if r.get('type') == 'image')
                 videos_count = sum(1 for r in results if r.get('type') == 'video')
                 
-                self.progress_queue.put(("log", "\n" + "=" * 70))
-                self.progress_queue.put(("log", "📈 SUMMARY"))
+                log("\n" + "=" * 70)
+                log("📈 SUMMARY")
                 
                 if images_count > 0 and videos_count > 0:
-                    self.progress_queue.put(("log", f"✅ Processed: {images_count} image(s) and {videos_count} video(s)"))
+                    log(f"✅ Processed: {images_count} image(s) and {videos_count} video(s)")
                 elif images_count > 0:
-                    self.progress_queue.put(("log", f"✅ Processed: {images_count} image(s)"))
+                    log(f"✅ Processed: {images_count} image(s)")
                 else:
-                    self.progress_queue.put(("log", f"✅ Processed: {videos_count} video(s)"))
+                    log(f"✅ Processed: {videos_count} video(s)")
                 
-                self.progress_queue.put(("log", f"💾 Space saved: {total_original - total_final:.2f} MB ({total_reduction:.1f}%)"))
-                self.progress_queue.put(("log", f"📁 Output: {output_folder}"))
+                if passed_count:
+                    log(f"⏩ Already small, used unchanged: {passed_count} image(s)")
+                if encodings:
+                    log("🧭 Encoded as: " + ", ".join(f"{count} {name}" for name, count in
+                                                     sorted(encodings.items(), key=lambda item: -item[1])))
+                log(f"💾 Space saved: {total_original - total_final:.2f} MB ({total_reduction:.1f}%)")
+                log(f"📁 Output: {output_folder}")
+                log(f"📄 Full report: {report.path}")
+                report.close()  # flushed before the report can be opened
                 self.progress_queue.put(("complete", ""))
             
         except Exception as e:
             self.progress_queue.put(("error", f"Error: {str(e)}"))
+        finally:
+            if report is not None:
+                report.close()
+            if journal is not None:
+                journal.close()
+            if rate_cache is not None:
+                rate_cache.close()
     
     def reduce_image(self, input_path, output_path, initial_quality, max_width, max_size_mb, preserve_alpha=False):
         """Reduce image size while maintaining quality
@@ -748,79 +1110,8 @@ class ImageCompressorGUI:
             max_size_mb: Target file size in MB
             preserve_alpha: If True, preserve PNG transparency (PNG output only)
         """
-        target_size_bytes = int(max_size_mb * 1024 * 1024)
-        
-        with Image.open(input_path) as img:
-            if preserve_alpha:
-                # Preserve transparency for PNG files
-                # Convert palette mode with transparency to RGBA
-                if img.mode == 'P' and 'transparency' in img.info:
-                    img = img.convert('RGBA')
-                elif img.mode not in ('RGBA', 'LA'):
-                    # If no alpha channel, still save as PNG but convert to RGBA for consistency
-                    img = img.convert('RGBA')
-                
-                quality = initial_quality
-                
-                # Resize if too large
-                if max(img.size) > max_width:
-                    img.thumbnail((max_width, max_width), Image.Resampling.LANCZOS)
-                
-                # Save as PNG with optimization
-                # PNG compression level: 0-9, where 9 is maximum compression
-                compress_level = 9
-                img.save(output_path, "PNG", optimize=True, compress_level=compress_level)
-                
-                # If still too large, progressively resize
-                if os.path.getsize(output_path) > target_size_bytes:
-                    scale_factor = 0.95
-                    while os.path.getsize(output_path) > target_size_bytes and max(img.size) > 800:
-                        new_width = int(img.size[0] * scale_factor)
-                        new_height = int(img.size[1] * scale_factor)
-                        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        img.save(output_path, "PNG", optimize=True, compress_level=compress_level)
-                        scale_factor = 0.95
-                
-                return img.size, compress_level
-            else:
-                # Standard JPEG compression (existing behavior)
-                # Convert to RGB if needed
-                if img.mode in ('RGBA', 'P', 'LA'):
-                    # For PNG with transparency, use white background
-                    if img.mode in ('RGBA', 'LA'):
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        if img.mode == 'RGBA':
-                            background.paste(img, mask=img.split()[3])
-                        else:
-                            background.paste(img, mask=img.split()[1])
-                        img = background
-                    else:
-                        img = img.convert('RGB')
-                
-                quality = initial_quality
-                
-                # Resize if too large
-                if max(img.size) > max_width:
-                    img.thumbnail((max_width, max_width), Image.Resampling.LANCZOS)
-                
-                # Save with optimization
-                img.save(output_path, "JPEG", quality=quality, optimize=True)
-                
-                # Adjust quality if needed
-                while os.path.getsize(output_path) > target_size_bytes and quality > 60:
-                    quality -= 5
-                    img.save(output_path, "JPEG", quality=quality, optimize=True)
-                
-                # Further resize if still too large
-                if os.path.getsize(output_path) > target_size_bytes:
-                    scale_factor = 0.9
-                    while os.path.getsize(output_path) > target_size_bytes and max(img.size) > 800:
-                        new_width = int(img.size[0] * scale_factor)
-                        new_height = int(img.size[1] * scale_factor)
-                        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        img.save(output_path, "JPEG", quality=quality, optimize=True)
-                
-                return img.size, quality
+        reducer = ImageReducer(quality=initial_quality, max_width=max_width, max_size_mb=max_size_mb)
+        return reducer.reduce(input_path, output_path, preserve_alpha)
     
     def show_help(self):
         """Show help dialog with instructions"""
@@ -1006,37 +1297,52 @@ Need more help? See README.md in the installation folder.
             self.start_compression()
     
     def check_progress_queue(self):
-        """Check for progress updates from worker thread"""
+        """Check for progress updates from worker thread
+        
+        Runs every refresh_ms. Log lines that arrived since the last check
+        are added in a single insert, and the counters are read once, so the
+        cost per refresh does not grow with the number of files.
+        """
+        lines = []
+        events = []
         try:
             while True:
                 msg_type, data = self.progress_queue.get_nowait()
-                
                 if msg_type == "log":
-                    self.log_message(data)
-                elif msg_type == "progress":
-                    self.progress_bar['value'] = data
-                elif msg_type == "complete":
-                    self.processing = False
-                    self.compress_btn.config(state=tk.NORMAL)
-                    self.cancel_btn.config(state=tk.DISABLED)
-                    messagebox.showinfo("Complete", "Media compression completed successfully!")
-                elif msg_type == "video_complete":
-                    self.processing = False
-                    self.compress_btn.config(state=tk.NORMAL)
-                    self.cancel_btn.config(state=tk.DISABLED)
-                    messagebox.showinfo("Video Files Detected", 
-                                       "Video files detected. Please use the command line for video compression.\n\n"
-                                       "See the instructions in the Progress window above.")
-                elif msg_type == "error":
-                    self.processing = False
-                    self.compress_btn.config(state=tk.NORMAL)
-                    self.cancel_btn.config(state=tk.DISABLED)
-                    messagebox.showerror("Error", data)
+                    lines.append(data)
+                else:
+                    events.append((msg_type, data))
         except queue.Empty:
             pass
         
+        if lines:
+            self.append_log(lines)
+        self.update_stats()
+        
+        for msg_type, data in events:
+            if msg_type == "report":
+                self.report_path = data
+                self.report_link.config(text="📄 Open full report")
+            elif msg_type == "complete":
+                self.processing = False
+                self.compress_btn.config(state=tk.NORMAL)
+                self.cancel_btn.config(state=tk.DISABLED)
+                messagebox.showinfo("Complete", "Media compression completed successfully!")
+            elif msg_type == "video_complete":
+                self.processing = False
+                self.compress_btn.config(state=tk.NORMAL)
+                self.cancel_btn.config(state=tk.DISABLED)
+                messagebox.showinfo("Video Files Detected", 
+                                   "Video files detected. Please use the command line for video compression.\n\n"
+                                   "See the instructions in the Progress window above.")
+            elif msg_type == "error":
+                self.processing = False
+                self.compress_btn.config(state=tk.NORMAL)
+                self.cancel_btn.config(state=tk.DISABLED)
+                messagebox.showerror("Error", data)
+        
         # Continue checking
-        self.root.after(100, self.check_progress_queue)
+        self.root.after(self.refresh_ms, self.check_progress_queue)
 
 
 def check_dependencies():
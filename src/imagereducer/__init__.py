@@ -4,6 +4,20 @@ ImageReducer Package
 This package provides image and video compression functionality.
 """
 
-from .video_reducer import VideoReducer, compress_video, check_ffmpeg_installed
+from .image_reducer import ImageReducer, compress_bytes, compress_image, reduce_image
+from .scheduler import MemoryBudget, run_jobs
+from .archive import compress_archive
+from .classify import classify_image
+from .dedupe import find_duplicates
+from .perceptual import find_near_duplicates
+from .watcher import FolderWatcher
 
-__all__ = ['VideoReducer', 'compress_video', 'check_ffmpeg_installed']
+__all__ = ['ImageReducer', 'compress_bytes', 'compress_image', 'reduce_image', 'MemoryBudget', 'run_jobs', 'compress_archive', 'find_duplicates',
+           'find_near_duplicates', 'classify_image', 'FolderWatcher']
+
+# Video support needs ffmpeg-python; image compression works without it
+try:
+    from .video_reducer import VideoReducer, compress_video, check_ffmpeg_installed
+    __all__ += ['VideoReducer', 'compress_video', 'check_ffmpeg_installed']
+except ImportError:
+    pass
@@ -0,0 +1,257 @@
+"""
+Asyncio Module
+
+Async versions of compress_image, compress_bytes and compress_video for asyncio applications,
+plus compress_many, which compresses a batch concurrently and yields results
+as they complete. Images run on a thread pool (Pillow releases the GIL while
+decoding and encoding); videos run FFmpeg through
+asyncio.create_subprocess_exec, so the event loop is never blocked.
+
+Cancelling a call kills its FFmpeg process and removes the partial output.
+Image work already running on a thread finishes in the background, but its
+output only appears if it completes (outputs are written atomically).
+
+Example:
+    >>> async for result in compress_many([("a.jpg", "out/a.jpg"), ("b.mov", "out/b.mp4")]):
+    ...     print(result['input_path'], result['success'])
+"""
+
+import os
+import asyncio
+import logging
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+from . import image_reducer
+from .writer import temp_path
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mpeg', '.avi', '.mkv')
+
+
+async def compress_image(
+    input_file,
+    output_file,
+    quality: int = 85,
+    max_width: int = 1920,
+    max_size_mb: float = 1.0,
+    preserve_transparency: bool = False,
+    output_format: str = 'auto',
+    executor: Optional[Executor] = None
+) -> dict:
+    """
+    Compress an image file without blocking the event loop.
+
+    Args:
+        input_file: Path to input image file
+        output_file: Path to output image file
+        quality: Initial JPEG quality (default 85)
+        max_width: Maximum width/height in pixels (default 1920)
+        max_size_mb: Target file size in MB (default 1.0)
+        preserve_transparency: Keep PNG transparency (default False)
+        output_format: 'auto', 'jpeg', 'png', 'webp' or 'avif' (default 'auto')
+        executor: Thread pool to run on (default: the loop's default executor)
+
+    Returns:
+        Dictionary with compression results, as image_reducer.compress_image
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(
+        image_reducer.compress_image,
+        str(input_file),
+        str(output_file),
+        quality=quality,
+        max_width=max_width,
+        max_size_mb=max_size_mb,
+        preserve_transparency=preserve_transparency,
+        output_format=output_format
+    ))
+
+
+async def compress_bytes(data, executor: Optional[Executor] = None, **options) -> dict:
+    """
+    Compress an image held in memory without blocking the event loop.
+
+    Args:
+        data: Encoded image as bytes, bytearray, memoryview or a seekable file object
+        executor: Thread pool to run on (default: the loop's default executor)
+        **options: Settings as for image_reducer.compress_bytes (quality, output_format, ...)
+
+    Returns:
+        Dictionary with compression results; the compressed image is in 'data'
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(image_reducer.compress_bytes, data, **options))
+
+
+async def compress_video(
+    input_file,
+    output_file,
+    crf: int = 28,
+    preset: str = "medium",
+    resolution: Optional[Tuple[int, int]] = None
+) -> dict:
+    """
+    Compress a video file with an FFmpeg subprocess, without blocking the event loop.
+
+    Args:
+        input_file: Path to input video file
+        output_file: Path to output video file
+        crf: Constant Rate Factor (0-51, default 28). Lower = better quality
+        preset: Encoding speed preset (default 'medium')
+        resolution: Optional tuple (width, height) to resize video
+
+    Returns:
+        Dictionary with compression results, as video_reducer.compress_video
+
+    Raises:
+        asyncio.CancelledError: When cancelled; FFmpeg is killed first
+    """
+    result = {
+        'success': False,
+        'input_size': 0,
+        'output_size': 0,
+        'reduction_percent': 0.0,
+        'error': None
+    }
+    try:
+        from .video_reducer import VideoReducer
+    except ImportError:
+        result['error'] = "Video support needs ffmpeg-python: pip install ffmpeg-python"
+        return result
+
+    reducer = VideoReducer(crf=crf, preset=preset)
+    input_path, output_path = Path(input_file), Path(output_file)
+    if not input_path.exists():
+        result['error'] = f"Input file not found: {input_path}"
+        return result
+    if not reducer.is_supported(input_path):
+        result['error'] = f"Unsupported file format. Supported: {reducer.supported_formats}"
+        return result
+    result['input_size'] = input_path.stat().st_size
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # FFmpeg writes to a temporary name, renamed into place only on success
+    temp_output = temp_path(output_path)
+    args = reducer.ffmpeg_args(str(input_path), str(temp_output), resolution)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        result['error'] = ("FFmpeg not found. Please install FFmpeg and add it to your system PATH. "
+                           "Download from: https://ffmpeg.org/download.html")
+        return result
+
+    try:
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            result['error'] = f"FFmpeg error: {stderr.decode('utf-8', errors='replace').strip()}"
+            logger.error(result['error'])
+            return result
+        os.replace(temp_output, output_path)
+    except BaseException:
+        # Cancelled (or failed): do not leave FFmpeg running on its own
+        if process.returncode is None:
+            process.kill()
+            await asyncio.shield(process.wait())
+        raise
+    finally:
+        try:
+            os.unlink(temp_output)
+        except OSError:
+            pass
+
+    result['output_size'] = output_path.stat().st_size
+    if result['input_size'] > 0:
+        reduction = (result['input_size'] - result['output_size']) / result['input_size'] * 100
+        result['reduction_percent'] = round(reduction, 2)
+    result['success'] = True
+    return result
+
+
+class _TrackingExecutor(ThreadPoolExecutor):
+    """Thread pool that can cancel its queued work (shutdown(cancel_futures=True) needs Python 3.9)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._futures = set()
+
+    def submit(self, *args, **kwargs):
+        future = super().submit(*args, **kwargs)
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return future
+
+    def cancel_queued(self):
+        """Cancel every submitted call that has not started yet."""
+        for future in list(self._futures):
+            future.cancel()
+
+
+async def compress_many(
+    files: Iterable[Tuple[str, str]],
+    max_concurrency: int = 4,
+    image_options: Optional[dict] = None,
+    video_options: Optional[dict] = None
+) -> AsyncIterator[dict]:
+    """
+    Compress many files concurrently, yielding results as they complete.
+
+    At most max_concurrency files are in progress at once, and files are only
+    taken from the iterable as slots free up, so long (or endless) inputs
+    are fine. Closing the iterator early (break, or cancelling the consuming
+    task) cancels the files still in progress and kills their FFmpeg processes.
+
+    Args:
+        files: (input_path, output_path) pairs; videos are recognised by extension
+        max_concurrency: Files compressed at once; also the image thread count
+        image_options: Keyword arguments for compress_image (quality, max_width, ...)
+        video_options: Keyword arguments for compress_video (crf, preset, resolution)
+
+    Yields:
+        Result dictionaries, in completion order, with 'input_path' and
+        'output_path' added
+    """
+    image_options = image_options or {}
+    video_options = video_options or {}
+    max_concurrency = max(1, max_concurrency)
+    executor = _TrackingExecutor(max_workers=max_concurrency, thread_name_prefix="imagereducer-aio")
+
+    async def run(input_file, output_file):
+        if Path(input_file).suffix.lower() in VIDEO_EXTENSIONS:
+            result = await compress_video(input_file, output_file, **video_options)
+        else:
+            result = await compress_image(input_file, output_file, executor=executor, **image_options)
+        result['input_path'] = str(input_file)
+        result['output_path'] = str(output_file)
+        return result
+
+    pending = set()
+    file_iter = iter(files)
+    try:
+        while True:
+            for input_file, output_file in file_iter:
+                pending.add(asyncio.ensure_future(run(input_file, output_file)))
+                if len(pending) >= max_concurrency:
+                    break
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        # Never block the loop waiting for image threads that are still running
+        executor.cancel_queued()
+        executor.shutdown(wait=False)
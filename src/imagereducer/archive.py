@@ -0,0 +1,258 @@
+"""
+Archive Module
+
+Compresses the images inside a ZIP or TAR archive straight into a new
+archive, without extracting anything to disk. Members are read into memory
+one at a time per worker, compressed in parallel with compress_bytes(), and
+appended to the output archive as they complete. Other members, and images
+that fail to compress, are copied unchanged, so nothing goes missing. Output
+members are stored uncompressed: JPEG, WebP and AVIF data does not deflate,
+so compressing it again only costs time.
+"""
+
+import time
+import zipfile
+import tarfile
+import logging
+from pathlib import Path, PurePosixPath
+from typing import Callable, Optional
+
+from .image_reducer import BufferReader, FORMAT_EXTENSIONS, open_image
+from .scheduler import MemoryBudget, run_jobs
+from .writer import atomic_output
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+INPUT_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+OUTPUT_SUFFIXES = ('.zip', '.tar')
+
+
+def is_archive(path) -> bool:
+    """Whether path names a supported input archive."""
+    return str(path).lower().endswith(INPUT_SUFFIXES)
+
+
+def _is_image(name: str, extensions) -> bool:
+    path = PurePosixPath(name)
+    # Finder metadata, not images (copied like any other file)
+    if path.parts and path.parts[0] == '__MACOSX' or path.name.startswith('._'):
+        return False
+    return path.suffix.lower() in extensions
+
+
+class _Cancelled(Exception):
+    """should_stop() fired: the output archive is incomplete."""
+
+
+class _Member:
+    """One archive member, read into memory on first use."""
+
+    def __init__(self, name: str, date_time, read: Callable[[], bytes], image: bool):
+        self.name = name
+        self.date_time = date_time
+        self.image = image
+        self._read = read
+        self._data = None
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    def release(self):
+        self._data = None
+        self._read = None
+
+
+def _zip_members(archive: zipfile.ZipFile, extensions):
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        # Read by the worker that takes the job, so members inflate in parallel
+        yield _Member(info.filename, info.date_time, lambda info=info: archive.read(info),
+                      _is_image(info.filename, extensions))
+
+
+def _tar_members(archive: tarfile.TarFile, extensions):
+    # A (compressed) tar can only be read front to back, so each member is
+    # read here, by whichever worker asks for the next job
+    for info in archive:
+        if not info.isfile():
+            continue
+        with archive.extractfile(info) as f:
+            data = f.read()
+        yield _Member(info.name, time.localtime(info.mtime)[:6], lambda data=data: data,
+                      _is_image(info.name, extensions))
+
+
+class _ArchiveWriter:
+    """Appends stored (uncompressed) members to a ZIP or TAR file."""
+
+    def __init__(self, path: Path):
+        self._names = set()
+        if path.name.lower().endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED)
+            self._tar = None
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path, 'w')
+
+    def reserve(self, name: str, ext: str) -> str:
+        """Output member name, with _1, _2, ... added if it is taken."""
+        path = PurePosixPath(name.lstrip('/'))
+        stem = str(path.with_suffix(''))
+        candidate = f"{stem}{ext}"
+        counter = 1
+        while candidate.casefold() in self._names:
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        self._names.add(candidate.casefold())
+        return candidate
+
+    def add(self, name: str, data: bytes, date_time):
+        if self._zip is not None:
+            # ZIP timestamps cannot predate 1980 (tar members can)
+            info = zipfile.ZipInfo(name, date_time=max(tuple(date_time), (1980, 1, 1, 0, 0, 0)))
+            info.compress_type = zipfile.ZIP_STORED
+            with self._zip.open(info, 'w') as f:
+                f.write(data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.mktime(tuple(date_time) + (0, 0, -1))
+            self._tar.addfile(info, BufferReader(data))
+
+    def close(self):
+        (self._zip or self._tar).close()
+
+
+def compress_archive(
+    input_path,
+    output_path,
+    reducer,
+    max_workers: int = 4,
+    budget: Optional[MemoryBudget] = None,
+    on_result: Optional[Callable[[str, dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> dict:
+    """
+    Compress every image in a ZIP or TAR archive into a new archive.
+
+    Args:
+        input_path: .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz archive
+        output_path: .zip or .tar archive to write (replaced atomically)
+        reducer: Configured ImageReducer
+        max_workers: Number of compression threads
+        budget: Optional MemoryBudget limiting concurrent decoded memory
+        on_result: Called with (member name, compress_bytes result) as each
+                   member completes, e.g. for progress output
+        should_stop: Callable polled between members; True stops early,
+                     and no output archive is written
+
+    Returns:
+        Dictionary with:
+            - success: bool (False if the archives could not be read or
+              written, or the run was cancelled)
+            - processed: int (images compressed into the output)
+            - copied: int (members copied unchanged: non-images and the
+              images that failed)
+            - failed: list of (member name, error)
+            - input_size: int (bytes of the processed members)
+            - output_size: int (bytes written for them)
+            - cancelled: bool (should_stop() fired)
+            - error: str (if success is False)
+    """
+    input_path, output_path = Path(input_path), Path(output_path)
+    summary = {
+        'success': False,
+        'processed': 0,
+        'copied': 0,
+        'failed': [],
+        'input_size': 0,
+        'output_size': 0,
+        'cancelled': False,
+        'error': None
+    }
+    if not is_archive(input_path):
+        summary['error'] = f"Unsupported archive. Supported: {INPUT_SUFFIXES}"
+        return summary
+    if not output_path.name.lower().endswith(OUTPUT_SUFFIXES):
+        summary['error'] = f"Unsupported output archive. Supported: {OUTPUT_SUFFIXES}"
+        return summary
+
+    extensions = set(reducer.supported_formats)
+
+    def estimate(member):
+        if not member.image:
+            return 0
+        with open_image(BufferReader(member.data)) as img:
+            return reducer.estimate_memory(img)
+
+    def process(member):
+        if not member.image:
+            member.data  # read on the worker, like images
+            return None
+        return reducer.compress_bytes(member.data)
+
+    try:
+        if input_path.name.lower().endswith('.zip'):
+            source = zipfile.ZipFile(input_path)
+            members = _zip_members(source, extensions)
+        else:
+            source = tarfile.open(input_path, 'r:*')
+            members = _tar_members(source, extensions)
+
+        with source, atomic_output(output_path) as temp_output:
+            writer = _ArchiveWriter(temp_output)
+            try:
+                completed = run_jobs(
+                    members,
+                    process,
+                    max_workers=max_workers,
+                    budget=budget,
+                    estimate=estimate,
+                    should_stop=should_stop
+                )
+                for member, result, error in completed:
+                    if member.image and error is not None:
+                        result = {'success': False, 'error': str(error)}
+                    if member.image and result['success']:
+                        name = writer.reserve(member.name, FORMAT_EXTENSIONS[result['format']])
+                        writer.add(name, result['data'], member.date_time)
+                        summary['processed'] += 1
+                        summary['input_size'] += result['input_size']
+                        summary['output_size'] += result['output_size']
+                        result['data'] = None  # written; do not hold it until the next result
+                    else:
+                        if member.image:
+                            summary['failed'].append((member.name, result['error']))
+                        try:
+                            data = member.data
+                        except (OSError, zipfile.BadZipFile) as e:
+                            if not member.image:
+                                summary['failed'].append((member.name, str(e)))
+                        else:
+                            # Copied unchanged, under its own name
+                            name = writer.reserve(member.name, PurePosixPath(member.name).suffix)
+                            writer.add(name, data, member.date_time)
+                            summary['copied'] += 1
+                    member.release()
+                    if on_result and member.image:
+                        on_result(member.name, result)
+                if should_stop and should_stop():
+                    raise _Cancelled()
+            finally:
+                writer.close()
+        summary['success'] = True
+    except _Cancelled:
+        # atomic_output() has deleted the partial archive
+        summary['cancelled'] = True
+        summary['error'] = "Cancelled; no output archive was written"
+        logger.info(summary['error'])
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        summary['error'] = f"Archive error: {e}"
+        logger.error(summary['error'])
+
+    return summary
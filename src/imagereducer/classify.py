@@ -0,0 +1,143 @@
+"""
+Classify Module
+
+Looks at an image's pixels to tell which encoder suits it. Photos compress
+best as JPEG; logos, diagrams and screenshots (few colours, flat areas, hard
+edges) as palette PNG, where JPEG would blur the edges and still be bigger.
+It also finds images that are grey in every pixel, or that carry an alpha
+channel without any transparency, so neither costs extra bytes.
+
+Every measurement is a single pass of one of Pillow's C routines, mostly on a
+reduced copy of the image, so classification costs a few milliseconds next to
+the decode and encode.
+"""
+
+import logging
+from typing import Optional
+
+from PIL import Image, ImageChops, ImageFilter
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Images with at most this many distinct colours fit a palette (PNG-8)
+PALETTE_MAX_COLORS = 256
+
+# Entropy and edges are measured on a copy reduced to about this size
+ANALYSIS_SIZE = 512
+
+# Luminance entropy (bits per pixel, 0 - 8) below which an image counts as a
+# graphic rather than a photo; photos are normally 6.5 or more
+GRAPHIC_MAX_ENTROPY = 5.0
+
+# Share of edge pixels from which a low-entropy image with many colours
+# (anti-aliased text, UI screenshots) counts as a graphic
+GRAPHIC_MIN_EDGES = 0.04
+
+# Edge strength (0 - 255) counted as an edge pixel
+EDGE_THRESHOLD = 48
+
+# Largest difference between colour channels that still counts as grey.
+# JPEG decoding leaves small differences in grey images
+GRAY_TOLERANCE = 6
+
+
+def _alpha(img: Image.Image) -> str:
+    """'none', 'opaque' (an alpha channel with no transparency) or 'used'."""
+    if img.mode == 'P':
+        return 'used' if 'transparency' in img.info else 'none'
+    if 'A' not in img.getbands():
+        return 'none'
+    low, _ = img.getchannel('A').getextrema()
+    return 'opaque' if low == 255 else 'used'
+
+
+def _is_gray(img: Image.Image) -> bool:
+    if img.mode in ('1', 'L', 'LA', 'I', 'I;16', 'F'):
+        return True
+    if img.mode not in ('RGB', 'RGBA'):
+        return False
+    r, g, b = img.getchannel('R'), img.getchannel('G'), img.getchannel('B')
+    return (ImageChops.difference(r, g).getextrema()[1] <= GRAY_TOLERANCE
+            and ImageChops.difference(g, b).getextrema()[1] <= GRAY_TOLERANCE)
+
+
+def _sample(img: Image.Image) -> Image.Image:
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    factor = max(img.width, img.height) // ANALYSIS_SIZE
+    return img.reduce(factor) if factor > 1 else img
+
+
+def classify_image(img: Image.Image) -> dict:
+    """
+    Measure an image's content and classify it.
+
+    Args:
+        img: Decoded image (any mode)
+
+    Returns:
+        Dictionary with:
+            - kind: str ('photo' or 'graphic')
+            - alpha: str ('none', 'opaque' or 'used')
+            - grayscale: bool (all pixels grey)
+            - colors: int, or None if more than PALETTE_MAX_COLORS
+            - entropy: float (luminance entropy, bits per pixel)
+            - edge_density: float (share of edge pixels, 0 - 1)
+    """
+    # Alpha and colours are counted on every pixel: one transparent pixel or
+    # one extra colour matters. getcolors() stops as soon as the limit is passed
+    alpha = _alpha(img)
+    colors = img.getcolors(PALETTE_MAX_COLORS)
+    color_count = len(colors) if colors is not None else None
+
+    sample = _sample(img)
+    grayscale = _is_gray(sample)
+    luminance = sample.convert('L')
+    entropy = luminance.entropy()
+    histogram = luminance.filter(ImageFilter.FIND_EDGES).histogram()
+    edge_density = sum(histogram[EDGE_THRESHOLD:]) / max(sample.width * sample.height, 1)
+
+    graphic = entropy < GRAPHIC_MAX_ENTROPY and (color_count is not None or edge_density >= GRAPHIC_MIN_EDGES)
+    return {
+        'kind': 'graphic' if graphic else 'photo',
+        'alpha': alpha,
+        'grayscale': grayscale,
+        'colors': color_count,
+        'entropy': round(entropy, 2),
+        'edge_density': round(edge_density, 4),
+    }
+
+
+def describe_encoding(content: dict) -> str:
+    """Name of the encoding chosen for a classified image, e.g. 'palette PNG'."""
+    encoding = content.get('format', '')
+    if content.get('mode') == 'P':
+        return f"palette {encoding}"
+    if content.get('mode') == 'L':
+        return f"grayscale {encoding}"
+    return encoding
+
+
+def describe_content(content: Optional[dict]) -> str:
+    """
+    One-line summary of a classification and the encoding chosen for it.
+
+    Args:
+        content: classify_image() result, with 'format' and 'mode' added by
+                 the reducer
+
+    Returns:
+        Text such as 'graphic, 12 colours → palette PNG'; '' for None
+    """
+    if not content:
+        return ""
+    parts = [content['kind']]
+    if content['colors'] is not None:
+        parts.append(f"{content['colors']} colours")
+    if content['grayscale']:
+        parts.append("grayscale")
+    if content['alpha'] == 'opaque':
+        parts.append("alpha unused")
+    encoding = describe_encoding(content)
+    return f"{', '.join(parts)} → {encoding}" if encoding else ", ".join(parts)
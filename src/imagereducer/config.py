@@ -0,0 +1,48 @@
+"""
+Configuration Module
+
+Loads settings from config.ini. Missing files or keys fall back to defaults,
+so callers always get a usable ConfigParser.
+"""
+
+import sys
+import configparser
+from pathlib import Path
+from typing import List, Optional
+
+CONFIG_FILENAME = "config.ini"
+
+
+def _candidate_paths() -> List[Path]:
+    """Locations searched for config.ini, in priority order."""
+    candidates = [Path.cwd() / CONFIG_FILENAME]
+    # PyInstaller bundles config.ini next to the extracted application
+    bundle_dir = getattr(sys, '_MEIPASS', None)
+    if bundle_dir:
+        candidates.append(Path(bundle_dir) / CONFIG_FILENAME)
+    # Project root when running from source (src/imagereducer/config.py)
+    candidates.append(Path(__file__).resolve().parents[2] / CONFIG_FILENAME)
+    return candidates
+
+
+def load_config(path: Optional[str] = None) -> configparser.ConfigParser:
+    """
+    Load config.ini.
+
+    Args:
+        path: Explicit config file path. If omitted, the current directory,
+              the bundled application folder and the project root are searched.
+
+    Returns:
+        ConfigParser with the first config file found (empty if none exists)
+    """
+    config = configparser.ConfigParser()
+    # Keys in config.ini are CamelCase; keep them as written
+    config.optionxform = str
+
+    paths = [Path(path)] if path else _candidate_paths()
+    for candidate in paths:
+        if candidate.is_file():
+            config.read(candidate, encoding='utf-8')
+            break
+    return config
@@ -0,0 +1,150 @@
+"""
+Dedupe Module
+
+Finds byte-identical files before compression, so each distinct image is
+encoded once. Candidates are narrowed in three increasingly expensive steps:
+file size, a hash of the first and last block, and a streamed full hash.
+"""
+
+import os
+import hashlib
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .writer import copy_file
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Bytes hashed from each end of a file for the partial hash
+PARTIAL_BLOCK = 64 * 1024
+
+# Read size for the streamed full hash
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path, partial: bool = False) -> str:
+    """
+    Hash a file without reading it into memory at once.
+
+    Args:
+        path: Path to the file
+        partial: Only hash the first and last PARTIAL_BLOCK bytes. Files up
+                 to twice that size are hashed completely either way.
+
+    Returns:
+        Hex digest (BLAKE2b, 128 bit)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        if partial:
+            digest.update(f.read(PARTIAL_BLOCK))
+            size = os.fstat(f.fileno()).st_size
+            if size > 2 * PARTIAL_BLOCK:
+                f.seek(-PARTIAL_BLOCK, os.SEEK_END)
+            digest.update(f.read(PARTIAL_BLOCK))
+        else:
+            buffer = bytearray(CHUNK_SIZE)
+            view = memoryview(buffer)
+            while True:
+                count = f.readinto(buffer)
+                if not count:
+                    break
+                digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def _split(groups: List[List[Path]], key: Callable, executor: ThreadPoolExecutor) -> List[List[Path]]:
+    """Split every group by key(path), computed in parallel; drop singletons."""
+    paths = [path for group in groups for path in group]
+
+    def safe_key(path):
+        try:
+            return key(path)
+        except OSError as e:
+            logger.warning(f"Could not hash {path}: {e}")
+            return None
+
+    keys = dict(zip(paths, executor.map(safe_key, paths)))
+    result = []
+    for group in groups:
+        buckets: Dict[str, List[Path]] = defaultdict(list)
+        for path in group:
+            if keys[path] is not None:
+                buckets[keys[path]].append(path)
+        result.extend(bucket for bucket in buckets.values() if len(bucket) > 1)
+    return result
+
+
+def find_duplicates(paths: Iterable, max_workers: int = 4,
+                    sizes: Optional[Iterable[int]] = None) -> List[List[Path]]:
+    """
+    Group byte-identical files.
+
+    Only files sharing a size are ever read. Of those, only files whose first
+    and last blocks also match are hashed in full, in parallel.
+
+    Args:
+        paths: File paths
+        max_workers: Number of hashing threads
+        sizes: File sizes in the same order as paths, if already known
+               (e.g. from probe.ImageInfo.file_size); saves a stat per file
+
+    Returns:
+        Groups of two or more identical files, each in input order. Files
+        that cannot be read are never reported as duplicates.
+    """
+    paths = [Path(p) for p in paths]
+    if sizes is None:
+        sizes = []
+        for path in paths:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(None)
+
+    size_of = dict(zip(paths, sizes))
+    by_size: Dict[int, List[Path]] = defaultdict(list)
+    for path, size in size_of.items():
+        if size:  # skip unreadable and empty files
+            by_size[size].append(path)
+    groups = [group for group in by_size.values() if len(group) > 1]
+    if not groups:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        groups = _split(groups, lambda p: file_digest(p, partial=True), executor)
+        # The partial hash already covered every byte of small files
+        small = [g for g in groups if size_of[g[0]] <= 2 * PARTIAL_BLOCK]
+        large = [g for g in groups if size_of[g[0]] > 2 * PARTIAL_BLOCK]
+        groups = small + _split(large, file_digest, executor)
+
+    order = {path: index for index, path in enumerate(paths)}
+    for group in groups:
+        group.sort(key=order.__getitem__)
+    return sorted(groups, key=lambda group: order[group[0]])
+
+
+def link_or_copy(source, destination, hard_link: bool = False) -> str:
+    """
+    Reuse an existing output for a duplicate input.
+
+    Args:
+        source: File to reuse
+        destination: New path for it
+        hard_link: Try a hard link first (no extra disk space, but both
+                   names then refer to the same file)
+
+    Returns:
+        'link', 'reflink' or 'copy', depending on what was done
+    """
+    if hard_link:
+        try:
+            os.link(source, destination)
+            return 'link'
+        except OSError as e:
+            logger.debug(f"Hard link {source} -> {destination} failed, copying: {e}")
+    return copy_file(source, destination)
@@ -0,0 +1,1820 @@
+"""
+Image Reducer Module
+
+Provides image compression functionality using Pillow.
+Reduces JPG and PNG images to a target file size by adjusting quality and resolution.
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import logging
+import struct
+import threading
+import warnings
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image, PngImagePlugin, features
+
+from .writer import atomic_output
+from .dedupe import link_or_copy
+from .classify import classify_image, PALETTE_MAX_COLORS
+from .ratecache import KEEP_QUALITY, settings_key
+
+try:
+    from PIL import ImageCms
+    ICC_AVAILABLE = True
+except ImportError:  # Pillow built without littlecms
+    ImageCms = None
+    ICC_AVAILABLE = False
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _check_avif() -> bool:
+    """AVIF is built into Pillow 11.2+, or provided by the pillow-avif-plugin package."""
+    try:
+        if features.check('avif'):
+            return True
+    except ValueError:
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        return True
+    except ImportError:
+        return False
+
+
+WEBP_AVAILABLE = features.check('webp')
+AVIF_AVAILABLE = _check_avif()
+
+# Values accepted for ImageReducer(output_format=...); 'auto' keeps the
+# classic behaviour of JPEG, or PNG when transparency is preserved
+OUTPUT_FORMATS = ('auto', 'jpeg', 'png', 'webp', 'avif')
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'AVIF': '.avif'}
+
+# What to do with images that already meet the target: compress them anyway
+# ('off'), or use the file itself as the output, copied or hard-linked
+PASS_THROUGH_MODES = ('off', 'copy', 'link')
+
+# JPEG chroma subsampling: colour kept at full resolution (4:4:4), halved
+# horizontally (4:2:2) or in both directions (4:2:0, smallest). 'auto' uses
+# 4:4:4 for graphics, where halved colour smears coloured text and edges, and
+# 4:2:0 for photos
+SUBSAMPLING_MODES = ('auto', '4:4:4', '4:2:2', '4:2:0')
+
+# Encoder effort: fast settings for trial encodes during the size search,
+# thorough settings for the single final encode
+WEBP_TRIAL_METHOD = 4
+WEBP_FINAL_METHOD = 6
+AVIF_TRIAL_SPEED = 8
+AVIF_FINAL_SPEED = 6
+
+# JPEG trial encodes skip Huffman optimization (2-3x faster). A setting is
+# encoded in full once its trial size, scaled by the optimized/trial ratio,
+# fits the target. The ratio ranges from about 0.97 (noisy photos) to below
+# 0.5 (flat graphics) and drops with quality. It starts from a low guess (a
+# guess too low costs one full encode), then each full encode measures it for
+# the image, lowered by a margin for the next settings. Settings skipped on a
+# guess too high are checked again once one fits, so the result is the same as
+# with full encodes throughout
+JPEG_OPTIMIZED_RATIO = 0.5
+JPEG_RATIO_MARGIN = 0.05
+
+# A full encode this close to the target (size x factor fits) is followed by
+# a full encode of the next step, which usually fits, instead of a trial
+JPEG_NEAR_MISS = 0.85
+
+# Expected size change per step of the JPEG search, used to predict from the
+# sizes an earlier run recorded which setting fits a new target. Measured on
+# photos: a quality step of 5 saves 10-40% (more at high quality and on
+# smooth images), 4:2:0 saves 25-40% over 4:4:4, and a 10% resize step
+# 15-40%, more than the pixel count drops (size ~ pixels ** exponent).
+# Recorded sizes scale these to the image
+JPEG_QUALITY_STEP = 0.8
+JPEG_SUBSAMPLING_STEP = 0.65
+JPEG_RESIZE_EXPONENT = 1.5
+
+# Bytes per pixel Pillow uses internally for each mode (RGB is stored padded to 4)
+_MODE_BYTES = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16L': 2, 'I;16B': 2, 'I;16N': 2}
+
+# Images above this many pixels use the large-image path (reduced decode)
+DEFAULT_LARGE_IMAGE_PIXELS = 50_000_000
+
+# Most pixels ever decoded at once (~1 GB as RGBA). JPEGs are checked after
+# reduced decoding, so panoramas far larger than this still work.
+DEFAULT_MAX_IMAGE_PIXELS = 250_000_000
+
+# EXIF orientation -> transpose that shows the image upright (as ImageOps.exif_transpose)
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+_EXIF_HEADER = b'Exif\x00\x00'
+_ORIENTATION_TAG = 0x0112
+
+# JPEG stores XMP in one APP1 segment, which cannot exceed 64 KB
+_MAX_JPEG_XMP = 65000
+
+# ICC -> sRGB transforms, keyed by (profile digest, input mode, output mode).
+# None marks profiles that are sRGB already and need no conversion.
+_ICC_TRANSFORMS = {}
+_ICC_LOCK = threading.Lock()
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image would decode to more pixels than the configured limit."""
+
+
+def open_image(input_path) -> Image.Image:
+    """
+    Open an image lazily, without Pillow's decompression-bomb limit.
+
+    Pillow refuses to even read the header of images above ~179 megapixels.
+    ImageReducer applies its own, configurable limit to the pixels it actually
+    decodes, so headers of very large images must still be readable. Such
+    headers are read with the format plugins directly; Image.MAX_IMAGE_PIXELS
+    is left alone. Callers decoding the image must check img.size against
+    their own limit (max_image_pixels) first.
+
+    Args:
+        input_path: Path to the image file, or a seekable binary file object
+
+    Returns:
+        An opened (not yet decoded) PIL image
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            return Image.open(input_path)
+        except Image.DecompressionBombError:
+            pass
+
+    # Image.open() recognised the image; find the plugin it used, by the
+    # same prefix check, and open with it without the size check
+    Image.init()
+    if isinstance(input_path, (str, os.PathLike)):
+        with open(input_path, 'rb') as f:
+            prefix = f.read(16)
+    else:
+        input_path.seek(0)
+        prefix = input_path.read(16)
+    for format_id in Image.ID:
+        factory, accept = Image.OPEN[format_id]
+        if accept and accept(prefix) is not True:
+            continue
+        if not isinstance(input_path, (str, os.PathLike)):
+            input_path.seek(0)
+        try:
+            return factory(input_path)  # a path is opened (and closed) by the image
+        except (SyntaxError, IndexError, TypeError, struct.error):
+            continue
+    raise Image.UnidentifiedImageError(f"cannot identify image file {input_path!r}")
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over a bytes-like buffer.
+
+    Unlike io.BytesIO(memoryview), the buffer is not copied up front: reads
+    copy only the chunks the decoder asks for.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        count = max(0, min(len(b), len(self._view) - self._pos))
+        b[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def bytes_per_pixel(mode: str) -> int:
+    """
+    Return the number of bytes Pillow uses to store one pixel of the given mode.
+
+    Args:
+        mode: Pillow image mode (e.g. 'RGB', 'RGBA', 'L')
+
+    Returns:
+        Bytes per pixel in Pillow's in-memory representation
+    """
+    return _MODE_BYTES.get(mode, 4)
+
+
+def draft_scale(size: Tuple[int, int], requested: Tuple[int, int]) -> int:
+    """
+    Mirror the DCT scale JpegImageFile.draft() picks for a requested size.
+
+    Args:
+        size: JPEG dimensions (width, height)
+        requested: Smallest dimensions the decode must keep
+
+    Returns:
+        1, 2, 4 or 8: the JPEG is decoded at 1/scale of its size
+    """
+    scale = min(size[0] // max(requested[0], 1), size[1] // max(requested[1], 1))
+    for s in (8, 4, 2, 1):
+        if scale >= s:
+            return s
+    return 1
+
+
+def thumbnail_size(size: Tuple[int, int], max_width: int) -> Tuple[int, int]:
+    """
+    Dimensions thumbnail((max_width, max_width)) would produce.
+
+    Args:
+        size: Source dimensions (width, height)
+        max_width: Maximum output dimension
+
+    Returns:
+        Output dimensions; never larger than size
+    """
+    ratio = min(1.0, max_width / max(size[0], size[1], 1))
+    return max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio))
+
+
+def has_transparency(img: Image.Image) -> bool:
+    """
+    Whether an image carries an alpha channel or palette transparency.
+
+    Only the mode and header info are read, so a lazily opened image is not
+    decoded.
+    """
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _exif_orientation_offset(exif: bytes) -> Optional[Tuple[int, str]]:
+    """
+    Find the Orientation value in raw EXIF bytes by walking IFD0 only.
+
+    Returns:
+        Tuple of (byte offset of the value, struct byte order), or None
+    """
+    start = len(_EXIF_HEADER) if exif.startswith(_EXIF_HEADER) else 0
+    header = exif[start:start + 8]
+    if len(header) < 8 or header[:2] not in (b'II', b'MM'):
+        return None
+    order = '<' if header[:2] == b'II' else '>'
+    ifd = start + struct.unpack(order + 'I', header[4:8])[0]
+    if ifd + 2 > len(exif):
+        return None
+    count = struct.unpack(order + 'H', exif[ifd:ifd + 2])[0]
+    for i in range(count):
+        entry = ifd + 2 + i * 12
+        if entry + 12 > len(exif):
+            break
+        tag, field_type = struct.unpack(order + 'HH', exif[entry:entry + 4])
+        if tag == _ORIENTATION_TAG and field_type == 3:  # SHORT, stored inline
+            return entry + 8, order
+    return None
+
+
+def exif_orientation(exif: Optional[bytes]) -> int:
+    """
+    Read the EXIF Orientation tag (1-8) from raw EXIF bytes.
+
+    Args:
+        exif: Raw EXIF block, with or without the 'Exif\\0\\0' prefix
+
+    Returns:
+        Orientation value, or 1 if missing or invalid
+    """
+    if not exif:
+        return 1
+    found = _exif_orientation_offset(exif)
+    if not found:
+        return 1
+    offset, order = found
+    value = struct.unpack(order + 'H', exif[offset:offset + 2])[0]
+    return value if value in _ORIENTATION_TRANSPOSE else 1
+
+
+def _reset_orientation(exif: bytes) -> bytes:
+    """Return the EXIF bytes with Orientation patched to 1 in place."""
+    found = _exif_orientation_offset(exif)
+    if not found:
+        return exif
+    offset, order = found
+    patched = bytearray(exif)
+    patched[offset:offset + 2] = struct.pack(order + 'H', 1)
+    return bytes(patched)
+
+
+def _srgb_transform(icc_profile: bytes, mode: str, output_mode: str):
+    """
+    Return a cached ImageCms transform from an embedded profile to sRGB.
+
+    Transforms are expensive to build but reusable, and a batch from one
+    camera usually shares a single profile, so each unique profile is only
+    built once per process.
+
+    Returns:
+        An ImageCms transform, or None if the profile is sRGB already or unusable
+    """
+    key = (hashlib.sha1(icc_profile).digest(), mode, output_mode)
+    with _ICC_LOCK:
+        if key in _ICC_TRANSFORMS:
+            return _ICC_TRANSFORMS[key]
+        transform = None
+        try:
+            source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            description = ImageCms.getProfileDescription(source) or ''
+            if 'srgb' not in description.lower():
+                transform = ImageCms.buildTransform(
+                    source, ImageCms.createProfile('sRGB'), mode, output_mode,
+                    renderingIntent=ImageCms.Intent.PERCEPTUAL
+                )
+        except (ImageCms.PyCMSError, OSError, ValueError) as e:
+            logger.warning(f"Ignoring unusable ICC profile: {e}")
+        _ICC_TRANSFORMS[key] = transform
+        return transform
+
+
+# Quantization tables from the JPEG standard (Annex K), which libjpeg scales
+# for every quality setting
+_STD_LUMINANCE = (
+    16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99
+)
+_STD_CHROMINANCE = (
+    17, 18, 24, 47, 99, 99, 99, 99, 18, 21, 26, 66, 99, 99, 99, 99,
+    24, 26, 56, 99, 99, 99, 99, 99, 47, 66, 99, 99, 99, 99, 99, 99
+) + (99,) * 32
+
+
+def _scaled_table_sum(table, quality: int) -> int:
+    """Sum of a standard table as libjpeg scales it for a quality setting."""
+    scale = 5000 // quality if quality < 50 else 200 - 2 * quality
+    return sum(min(max((value * scale + 50) // 100, 1), 255) for value in table)
+
+
+# Table sums for qualities 1 - 100, to compare against a file's own tables
+_QUALITY_SUMS = [
+    (quality, _scaled_table_sum(_STD_LUMINANCE, quality), _scaled_table_sum(_STD_CHROMINANCE, quality))
+    for quality in range(1, 101)
+]
+
+
+def estimate_jpeg_quality(img: Image.Image) -> Optional[int]:
+    """
+    Estimate the quality setting a JPEG was saved with, from its header.
+
+    The file's quantization tables are compared with the standard tables as
+    scaled for each quality. This is exact for files written by libjpeg
+    (Pillow, most software) and close for cameras and editors with their own
+    tables.
+
+    Args:
+        img: Opened image (pixels need not be decoded)
+
+    Returns:
+        Quality 1 - 100, or None if the image is not a JPEG
+    """
+    tables = getattr(img, 'quantization', None)
+    if img.format != 'JPEG' or not tables:
+        return None
+    luminance = sum(tables.get(0, ()))
+    chrominance = sum(tables[1]) if 1 in tables else None
+
+    def distance(entry):
+        _, luminance_sum, chrominance_sum = entry
+        error = abs(luminance_sum - luminance)
+        if chrominance is not None:
+            error += abs(chrominance_sum - chrominance)
+        return error
+
+    return min(_QUALITY_SUMS, key=distance)[0]
+
+
+def estimate_peak_memory(
+    size: Tuple[int, int],
+    mode: str,
+    image_format: Optional[str] = None,
+    max_width: int = 1920,
+    preserve_alpha: bool = False,
+    large_image_pixels: Optional[int] = DEFAULT_LARGE_IMAGE_PIXELS
+) -> int:
+    """
+    Estimate the peak memory reduce_image() needs for one image.
+
+    Only header information is required, so the estimate can be made from a
+    lazily opened image without decoding any pixels. It counts the decoded
+    source, the full-size copies made while converting or resizing with alpha,
+    and the resized output.
+
+    Args:
+        size: Source dimensions (width, height)
+        mode: Source Pillow mode
+        image_format: Source format as reported by Pillow (e.g. 'JPEG', 'PNG')
+        max_width: Maximum output dimension
+        preserve_alpha: Whether the PNG/alpha path will be used
+        large_image_pixels: Pixel count above which the large-image path is used
+
+    Returns:
+        Estimated peak memory in bytes
+    """
+    width, height = size
+    target = thumbnail_size(size, max_width)
+    output = target[0] * target[1] * 4
+
+    if large_image_pixels and width * height > large_image_pixels:
+        # Large-image path: reduced decode, then every copy is made at ~2x target
+        scale = 1
+        if image_format == 'JPEG':
+            scale = draft_scale(size, (target[0] * 2, target[1] * 2))
+        decoded = ((width + scale - 1) // scale) * ((height + scale - 1) // scale)
+        peak = decoded * bytes_per_pixel(mode)
+        if mode == 'P':
+            peak += decoded * 4  # palette images must be expanded before reduce()
+        working = min(decoded, target[0] * target[1] * 4)
+        return peak + working * 4 * 3 + 2 * output
+
+    # thumbnail() lets the JPEG decoder scale down by 1/2, 1/4 or 1/8 when the
+    # source is untouched before resizing (no conversion step)
+    scale = 1
+    if image_format == 'JPEG' and not preserve_alpha and mode in ('RGB', 'L', 'CMYK'):
+        scale = draft_scale(size, (max_width * 2, max_width * 2))
+    decoded = ((width + scale - 1) // scale) * ((height + scale - 1) // scale)
+
+    peak = decoded * bytes_per_pixel(mode)
+    if preserve_alpha:
+        if mode not in ('RGBA', 'LA'):
+            peak += decoded * 4  # convert('RGBA')
+    elif mode in ('RGBA', 'LA', 'P'):
+        # Resizing premultiplies alpha in a full-size copy (palette images are
+        # expanded first); flattening then happens at the output size
+        peak += decoded * 4
+
+    # Resized output plus the copy made by each progressive resize step
+    return peak + 2 * output
+
+
+class ImageReducer:
+    """
+    A class to handle image compression using Pillow.
+
+    Attributes:
+        quality (int): Initial JPEG quality (60-95)
+        max_width (int): Maximum width/height in pixels
+        max_size_mb (float): Target file size in megabytes
+        preserve_transparency (bool): Keep alpha channel for PNG files
+        large_image_pixels (int): Images above this pixel count use reduced decoding
+        max_image_pixels (int): Most pixels that may be decoded at once
+        output_format (str): One of OUTPUT_FORMATS
+        keep_metadata (bool): Copy EXIF and XMP to the output
+        convert_to_srgb (bool): Convert images with an embedded ICC profile to sRGB
+        pass_through (str): One of PASS_THROUGH_MODES
+        analyze_content (bool): Choose the format and colour mode from the pixels
+        progressive (bool): Write progressive JPEGs
+        subsampling (str): One of SUBSAMPLING_MODES
+        rate_cache (RateCache): Encoded sizes from earlier runs, or None
+        supported_formats (tuple): Supported image file extensions
+    """
+
+    def __init__(
+        self,
+        quality: int = 85,
+        max_width: int = 1920,
+        max_size_mb: float = 1.0,
+        preserve_transparency: bool = False,
+        min_quality: int = 60,
+        min_width: int = 800,
+        large_image_pixels: Optional[int] = DEFAULT_LARGE_IMAGE_PIXELS,
+        max_image_pixels: int = DEFAULT_MAX_IMAGE_PIXELS,
+        output_format: str = 'auto',
+        keep_metadata: bool = False,
+        convert_to_srgb: bool = True,
+        pass_through: str = 'off',
+        analyze_content: bool = False,
+        progressive: bool = False,
+        subsampling: str = 'auto',
+        rate_cache=None
+    ):
+        """
+        Initialize ImageReducer with compression settings.
+
+        Args:
+            quality: Starting JPEG quality (default 85)
+            max_width: Maximum width/height in pixels (default 1920)
+            max_size_mb: Target file size in MB (default 1.0)
+            preserve_transparency: Keep PNG transparency instead of converting to JPEG
+            min_quality: Quality will not be lowered below this value
+            min_width: Images will not be shrunk below this size to meet the target
+            large_image_pixels: Images above this pixel count are decoded straight
+                down towards the target size instead of at full resolution
+                (None or 0: always at full resolution)
+            max_image_pixels: Images that would decode to more pixels than this
+                raise ImageTooLargeError instead of exhausting memory
+            output_format: 'auto' (JPEG, or PNG when keeping transparency),
+                'jpeg', 'png', 'webp' or 'avif'
+            keep_metadata: Copy EXIF and XMP to the output (KeepExifData in
+                config.ini). Orientation is always applied to the pixels.
+            convert_to_srgb: Convert images with an embedded ICC profile to
+                sRGB; otherwise the profile is embedded in the output
+            pass_through: 'copy' or 'link' to use images that already meet
+                the target as their own output, without decoding them;
+                'off' compresses every image
+            analyze_content: Classify each image's pixels (see classify.py).
+                Unused alpha is dropped, grey images are encoded in grayscale
+                and PNG output of graphics uses a palette. With 'auto' format,
+                encode_file() and compress_bytes() also pick JPEG for photos
+                and PNG for graphics
+            progressive: Write progressive JPEGs (usually a few percent
+                smaller, and shown in full at low detail while loading)
+            subsampling: JPEG chroma subsampling, '4:4:4', '4:2:2' or
+                '4:2:0'. 'auto' uses 4:4:4 for graphics found by content
+                analysis, if it fits the target, and 4:2:0 otherwise
+            rate_cache: RateCache (see ratecache.py). JPEG searches of files
+                start from the sizes it recorded in earlier runs, and record
+                the sizes they measure, so a run with another target skips
+                settings already known to be too big
+        """
+        output_format = output_format.lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{output_format}'. Supported: {OUTPUT_FORMATS}")
+        if output_format == 'webp' and not WEBP_AVAILABLE:
+            raise ValueError("WebP output needs Pillow built with WebP support")
+        if output_format == 'avif' and not AVIF_AVAILABLE:
+            raise ValueError("AVIF output needs Pillow 11.2+ or the pillow-avif-plugin package")
+        pass_through = pass_through.lower()
+        if pass_through not in PASS_THROUGH_MODES:
+            raise ValueError(f"Unsupported pass-through mode '{pass_through}'. Supported: {PASS_THROUGH_MODES}")
+        subsampling = subsampling.lower()
+        if subsampling not in SUBSAMPLING_MODES:
+            raise ValueError(f"Unsupported chroma subsampling '{subsampling}'. Supported: {SUBSAMPLING_MODES}")
+
+        self.quality = quality
+        self.max_width = max_width
+        self.max_size_mb = max_size_mb
+        self.preserve_transparency = preserve_transparency
+        self.min_quality = min_quality
+        self.min_width = min_width
+        self.large_image_pixels = large_image_pixels
+        self.max_image_pixels = max_image_pixels
+        self.output_format = output_format
+        self.keep_metadata = keep_metadata
+        self.convert_to_srgb = convert_to_srgb and ICC_AVAILABLE
+        self.pass_through = pass_through
+        self.analyze_content = analyze_content
+        self.progressive = progressive
+        self.subsampling = subsampling
+        self.rate_cache = rate_cache
+        self.supported_formats = ('.jpg', '.jpeg', '.png')
+
+    def is_supported(self, file_path: str) -> bool:
+        """
+        Check if the file format is supported.
+
+        Args:
+            file_path: Path to the image file
+
+        Returns:
+            True if the file format is supported, False otherwise
+        """
+        return Path(file_path).suffix.lower() in self.supported_formats
+
+    def get_file_size(self, file_path: str) -> int:
+        """
+        Get file size in bytes.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            File size in bytes
+        """
+        return os.path.getsize(file_path)
+
+    def has_alpha(self, input_path: str) -> bool:
+        """
+        Check whether an image carries transparency, reading only its header.
+
+        Args:
+            input_path: Path to the image file
+
+        Returns:
+            True if the image has an alpha channel or palette transparency
+        """
+        with open_image(input_path) as img:
+            return has_transparency(img)
+
+    def estimate_memory(self, source, preserve_alpha: bool = False) -> int:
+        """
+        Estimate the peak memory needed to reduce an image, without decoding it.
+
+        Args:
+            source: Path to the image file, or an already probed header
+                    (anything with size, mode and format, e.g. probe.ImageInfo)
+            preserve_alpha: Whether the PNG/alpha path will be used
+
+        Returns:
+            Estimated peak memory in bytes
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open_image(source) as img:
+                return estimate_peak_memory(
+                    img.size, img.mode, img.format, self.max_width, preserve_alpha, self.large_image_pixels
+                )
+        return estimate_peak_memory(
+            source.size, source.mode, source.format, self.max_width, preserve_alpha, self.large_image_pixels
+        )
+
+    def meets_target(self, input_path, preserve_alpha: bool = False) -> bool:
+        """
+        Check whether an image can be its own output, reading only its header.
+
+        True when the file is already within max_size_mb and max_width, in
+        the output format, upright, and would not lose metadata or need a
+        colour conversion. Compressing such a file costs a full decode and
+        encode and can even make it larger.
+
+        Args:
+            input_path: Path to the image file
+            preserve_alpha: Whether the image's transparency should be kept
+
+        Returns:
+            True if the file already meets the target
+        """
+        file_size = os.path.getsize(input_path)
+        if file_size > self.max_size_mb * 1024 * 1024:
+            return False
+        with open_image(input_path) as img:
+            return self._meets_target(img, file_size, preserve_alpha)
+
+    def _meets_target(self, img: Image.Image, file_size: int, preserve_alpha: bool) -> bool:
+        if file_size > self.max_size_mb * 1024 * 1024 or max(img.size) > self.max_width:
+            return False
+        if img.format != self.resolve_format(preserve_alpha):
+            return False
+        meta = self._read_metadata(img)
+        if meta['orientation'] != 1:
+            return False  # outputs are always upright
+        if not self.keep_metadata and (meta['exif'] or meta['xmp']):
+            return False  # would be stripped
+        # The same test as _apply_metadata(): CMYK (and YCCK, which Pillow
+        # decodes as CMYK) only becomes RGB through a profile; without one the
+        # encoder would keep it as CMYK too
+        if meta['icc_profile'] and self.convert_to_srgb and img.mode in ('RGB', 'RGBA', 'CMYK'):
+            output_mode = 'RGB' if img.mode == 'CMYK' else img.mode
+            if _srgb_transform(meta['icc_profile'], img.mode, output_mode) is not None:
+                return False  # not sRGB yet
+        return True
+
+    def pass_through_file(self, input_path, output_path, preserve_alpha: bool = False) -> Optional[str]:
+        """
+        Use an image that already meets the target as its output, undecoded.
+
+        Args:
+            input_path: Path to input image
+            output_path: Path to output image
+            preserve_alpha: Whether the image's transparency should be kept
+
+        Returns:
+            'link', 'reflink' or 'copy' if the file was passed through; None
+            if it needs compressing (or pass_through is 'off')
+        """
+        if self.pass_through == 'off' or not self.meets_target(input_path, preserve_alpha):
+            return None
+        return link_or_copy(input_path, output_path, hard_link=self.pass_through == 'link')
+
+    def _load_large(self, img: Image.Image, max_width: Optional[int] = None) -> Image.Image:
+        """
+        Decode a very large image straight down towards the target size.
+
+        JPEGs are decoded at 1/2, 1/4 or 1/8 scale by the decoder itself, so the
+        full-resolution raster never exists in memory. Other formats cannot be
+        partially decoded by Pillow; they are decoded once and box-reduced right
+        away so no conversion or alpha flattening happens at full size.
+
+        Args:
+            img: Lazily opened source image
+            max_width: Largest output dimension needed (defaults to self.max_width)
+
+        Returns:
+            Decoded image no smaller than twice the target size
+
+        Raises:
+            ImageTooLargeError: If the decode would exceed max_image_pixels
+        """
+        target = thumbnail_size(img.size, max_width or self.max_width)
+        requested = (target[0] * 2, target[1] * 2)
+
+        if img.format == 'JPEG':
+            img.draft(img.mode, requested)
+
+        decoded_pixels = img.width * img.height
+        if self.max_image_pixels and decoded_pixels > self.max_image_pixels:
+            raise ImageTooLargeError(
+                f"Image needs {decoded_pixels:,} pixels decoded, above the limit of "
+                f"{self.max_image_pixels:,} (MaxImagePixels in config.ini)"
+            )
+
+        img.load()
+        if img.mode == 'P':
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+
+        factor = min(img.width // requested[0], img.height // requested[1])
+        if factor > 1:
+            reduced = img.reduce(factor)
+            img.close()  # free the full-size raster now, not when the file closes
+            img = reduced
+        return img
+
+    def resolve_format(self, preserve_alpha: bool = False) -> str:
+        """
+        Return the Pillow format name used for an image.
+
+        Args:
+            preserve_alpha: Whether the image's transparency should be kept
+
+        Returns:
+            'JPEG', 'PNG', 'WEBP' or 'AVIF'
+        """
+        if self.output_format == 'auto':
+            return 'PNG' if preserve_alpha else 'JPEG'
+        return self.output_format.upper()
+
+    def output_extension(self, preserve_alpha: bool = False) -> str:
+        """
+        Return the file extension for an image's output.
+
+        Args:
+            preserve_alpha: Whether the image's transparency should be kept
+
+        Returns:
+            Extension including the dot (e.g. '.jpg', '.webp')
+        """
+        return FORMAT_EXTENSIONS[self.resolve_format(preserve_alpha)]
+
+    def reduce(self, input_path, output_path, preserve_alpha: bool = False):
+        """
+        Reduce image size while maintaining quality.
+
+        Args:
+            input_path: Path to input image
+            output_path: Path to output image
+            preserve_alpha: If True, keep transparency (PNG, WebP and AVIF output)
+
+        Returns:
+            Tuple of (final dimensions, final quality or PNG compress level)
+        """
+        with open_image(input_path) as img:
+            encoded = self._reduce_image(img, preserve_alpha, source=input_path)
+        with atomic_output(output_path) as temp_output:
+            temp_output.write_bytes(encoded['data'])
+        return encoded['dimensions'], encoded['quality']
+
+    def encode_file(self, input_path, preserve_alpha: bool = False) -> dict:
+        """
+        Reduce an image file in memory, letting its content pick the format.
+
+        Unlike reduce(), the output format is not fixed beforehand: with
+        analyze_content and 'auto' format, photos become JPEG and graphics
+        PNG. The caller names the output from the returned format.
+
+        Args:
+            input_path: Path to input image
+            preserve_alpha: If True, keep transparency (if the image uses any)
+
+        Returns:
+            Dictionary with:
+                - dimensions: tuple (width, height)
+                - quality: int (quality or PNG compress level)
+                - data: bytes (the encoded image)
+                - format: str ('JPEG', 'PNG', 'WEBP' or 'AVIF')
+                - content: dict (classify_image() result plus the chosen
+                  'format' and 'mode'), or None without analyze_content
+        """
+        with open_image(input_path) as img:
+            return self._reduce_image(img, preserve_alpha, route=True, source=input_path)
+
+    def _route(self, content: dict, preserve_alpha: bool, route: bool):
+        """
+        Choose the output format and colour mode for a classified image.
+
+        Returns:
+            Tuple of (format, preserve_alpha, mode). mode is 'P' (palette),
+            'L' (grayscale), 'RGB', or None for the usual conversion
+        """
+        # Without route the caller has named the output file already, so the
+        # format it was resolved for stays, even if the alpha is dropped
+        output_format = self.resolve_format(preserve_alpha)
+        if content['alpha'] != 'used':
+            preserve_alpha = False  # an alpha channel with nothing transparent
+        if route and self.output_format == 'auto':
+            output_format = 'PNG' if preserve_alpha or content['kind'] == 'graphic' else 'JPEG'
+
+        mode = None
+        if not preserve_alpha:
+            if output_format == 'PNG':
+                # A palette is only exact for graphics with few colours
+                if content['kind'] == 'graphic' and content['colors'] is not None:
+                    mode = 'P'
+                else:
+                    mode = 'L' if content['grayscale'] else 'RGB'
+            elif output_format == 'JPEG' and content['grayscale']:
+                mode = 'L'
+        return output_format, preserve_alpha, mode
+
+    def _reduce_image(self, img: Image.Image, preserve_alpha: bool, route: bool = False, source=None) -> dict:
+        """
+        Reduce an opened image in memory.
+
+        Args:
+            img: Opened image
+            preserve_alpha: Whether transparency should be kept
+            route: Let content analysis change the output format ('auto' only)
+            source: Path of the image file, for the rate cache
+
+        Returns:
+            Dictionary as for encode_file()
+        """
+        target_size_bytes = int(self.max_size_mb * 1024 * 1024)
+        output_format = self.resolve_format(preserve_alpha)
+
+        meta = self._read_metadata(img)
+        source_quality = estimate_jpeg_quality(img)
+        if self.large_image_pixels and img.width * img.height > self.large_image_pixels:
+            img = self._load_large(img)
+        elif self.max_image_pixels and img.width * img.height > self.max_image_pixels:
+            raise ImageTooLargeError(
+                f"Image has {img.width * img.height:,} pixels, above the limit of "
+                f"{self.max_image_pixels:,} (MaxImagePixels in config.ini)"
+            )
+
+        content = mode = None
+        if self.analyze_content:
+            if img.format == 'JPEG' and max(img.size) > self.max_width:
+                # Classifying decodes the image: pick the reduced DCT scale
+                # thumbnail() would, or the JPEG is decoded at full size
+                target = thumbnail_size(img.size, self.max_width)
+                img.draft(None, (target[0] * 2, target[1] * 2))
+            content = classify_image(img)
+            output_format, preserve_alpha, mode = self._route(content, preserve_alpha, route)
+            content.update(format=output_format, mode=mode)
+
+        if output_format == 'PNG':
+            dimensions, quality, data = self._reduce_png(img, target_size_bytes, meta, mode)
+        elif output_format == 'JPEG':
+            dimensions, quality, data = self._reduce_jpeg(
+                img, target_size_bytes, meta, source_quality, mode, content, source
+            )
+        else:
+            dimensions, quality, data = self._reduce_modern(img, target_size_bytes, output_format, preserve_alpha, meta)
+        return {
+            'dimensions': dimensions,
+            'quality': quality,
+            'data': data,
+            'format': output_format,
+            'content': content
+        }
+
+    def compress_bytes(self, source) -> dict:
+        """
+        Compress an image held in memory, without temporary files.
+
+        Args:
+            source: Encoded image as bytes, bytearray, memoryview, or a
+                    seekable binary file object
+
+        Returns:
+            Dictionary with the same results as compress(), plus:
+                - data: bytes (the compressed image)
+                - format: str ('JPEG', 'PNG', 'WEBP' or 'AVIF')
+                - passed_through: bool (the input already met the target and
+                  is returned unchanged; only with pass_through enabled)
+                - content: dict (content analysis and the encoding it chose;
+                  None unless analyze_content is enabled)
+        """
+        result = {
+            'success': False,
+            'input_size': 0,
+            'output_size': 0,
+            'reduction_percent': 0.0,
+            'dimensions': None,
+            'quality': None,
+            'format': None,
+            'data': None,
+            'passed_through': False,
+            'content': None,
+            'error': None
+        }
+
+        try:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                reader = BufferReader(source)
+                input_size = reader.seek(0, io.SEEK_END)
+                reader.seek(0)
+            else:
+                reader = source
+                position = reader.tell()
+                input_size = reader.seek(0, io.SEEK_END) - position
+                reader.seek(position)
+            result['input_size'] = input_size
+
+            with open_image(reader) as img:
+                if img.format not in ('JPEG', 'PNG'):
+                    raise ValueError(f"Unsupported image format {img.format}. Supported: JPEG, PNG")
+                preserve_alpha = self.preserve_transparency and img.format == 'PNG' and has_transparency(img)
+                if self.pass_through != 'off' and self._meets_target(img, input_size, preserve_alpha):
+                    # Already small enough: the input is the output
+                    reader.seek(0 if reader is not source else position)
+                    encoded = {
+                        'dimensions': img.size,
+                        'quality': None,
+                        'data': reader.read(input_size),
+                        'format': img.format,
+                        'content': None
+                    }
+                    result['passed_through'] = True
+                else:
+                    encoded = self._reduce_image(img, preserve_alpha, route=True)
+            if reader is not source:
+                reader.close()  # releases the caller's buffer
+
+            data = encoded['data']
+            result.update(encoded, output_size=len(data), success=True)
+            if input_size > 0:
+                result['reduction_percent'] = round((input_size - len(data)) / input_size * 100, 2)
+        except Exception as e:
+            result['error'] = f"Unexpected error: {str(e)}"
+            logger.error(result['error'])
+
+        return result
+
+    def _read_metadata(self, img: Image.Image) -> dict:
+        """
+        Collect the raw metadata blocks of an opened image.
+
+        Nothing is parsed here apart from the EXIF orientation; the blocks are
+        passed through to the encoder as bytes.
+        """
+        exif = img.info.get('exif')
+        if exif and not exif.startswith(_EXIF_HEADER):
+            exif = _EXIF_HEADER + exif
+        xmp = img.info.get('xmp') or img.info.get('XML:com.adobe.xmp')
+        if isinstance(xmp, str):
+            xmp = xmp.encode('utf-8')
+        return {
+            'orientation': exif_orientation(exif),
+            'exif': exif,
+            'xmp': xmp,
+            'icc_profile': img.info.get('icc_profile'),
+            'embed_icc': False
+        }
+
+    def _apply_metadata(self, img: Image.Image, meta: dict) -> Image.Image:
+        """
+        Apply EXIF orientation and the ICC -> sRGB conversion.
+
+        Called on the downscaled image, so rotating and colour converting
+        touch only the output pixels.
+        """
+        transpose = _ORIENTATION_TRANSPOSE.get(meta['orientation'])
+        if transpose is not None:
+            img = img.transpose(transpose)
+
+        icc_profile = meta['icc_profile']
+        meta['embed_icc'] = False
+        if icc_profile:
+            converted = False
+            if self.convert_to_srgb and img.mode in ('RGB', 'RGBA', 'CMYK'):
+                output_mode = 'RGB' if img.mode == 'CMYK' else img.mode
+                transform = _srgb_transform(icc_profile, img.mode, output_mode)
+                if transform is not None:
+                    img = ImageCms.applyTransform(img, transform)
+                # No transform means the profile is sRGB already (or unusable)
+                converted = True
+            # Keep a profile that was not converted, or colours shift
+            meta['embed_icc'] = not converted
+        return img
+
+    def _save_params(self, meta: Optional[dict], output_format: str) -> dict:
+        """Encoder keyword arguments that carry the metadata through."""
+        params = {}
+        if not meta:
+            return params
+        if meta['embed_icc']:
+            params['icc_profile'] = meta['icc_profile']
+        if self.keep_metadata:
+            if meta['exif']:
+                exif = meta['exif']
+                if meta['orientation'] != 1:
+                    exif = _reset_orientation(exif)  # pixels are already upright
+                params['exif'] = exif
+            xmp = meta['xmp']
+            if xmp:
+                if output_format == 'PNG':
+                    pnginfo = PngImagePlugin.PngInfo()
+                    pnginfo.add_itxt('XML:com.adobe.xmp', xmp.decode('utf-8', 'replace'))
+                    params['pnginfo'] = pnginfo
+                elif output_format != 'JPEG' or len(xmp) <= _MAX_JPEG_XMP:
+                    params['xmp'] = xmp
+        return params
+
+    @staticmethod
+    def _expand_palette(img: Image.Image) -> Image.Image:
+        """Palette images are resized with nearest neighbour only; expand them first."""
+        if img.mode == 'P':
+            return img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        return img
+
+    def _downscale(self, img: Image.Image, max_width: int, flatten: bool = False) -> Image.Image:
+        """
+        Resize to fit max_width as thumbnail() does, optionally flattening.
+
+        thumbnail() box-reduces by an integer factor down to about twice the
+        target, then resamples with LANCZOS. Pillow premultiplies alpha around
+        each of those steps; here it is done once. With flatten, transparency
+        is composited onto white right after the box reduce, so the background
+        and the LANCZOS pass only cover the reduced pixels, and the LANCZOS
+        pass has three channels instead of four.
+
+        Images without transparency are resized in place, so a JPEG source
+        keeps its format (see _reduce_jpeg).
+        """
+        img = self._expand_palette(img)
+        if img.mode not in ('RGBA', 'LA'):
+            if max(img.size) > max_width:
+                img.thumbnail((max_width, max_width), Image.Resampling.LANCZOS)
+            return img
+        target = thumbnail_size(img.size, max_width)
+        if target == img.size:
+            return self._flatten(img) if flatten else img
+
+        mode, premultiplied = img.mode, 'RGBa' if img.mode == 'RGBA' else 'La'
+        if not flatten:
+            resized = img.convert(premultiplied).resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            return resized.convert(mode)
+        factor = (max(int(img.width / target[0] / 2.0), 1), max(int(img.height / target[1] / 2.0), 1))
+        if factor != (1, 1):
+            img = img.convert(premultiplied).reduce(factor).convert(mode)
+        return self._flatten(img).resize(target, Image.Resampling.LANCZOS)
+
+    def _flatten(self, img: Image.Image) -> Image.Image:
+        """
+        Convert to RGB, compositing any transparency onto a white background.
+
+        A single compositing pass: paste() takes the alpha band of the image
+        itself as the mask, so no band is copied out with split().
+        """
+        img = self._expand_palette(img)
+        if img.mode in ('RGBA', 'LA'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img)
+            img = background
+        return img
+
+    def _convert_mode(self, img: Image.Image, mode: Optional[str], meta: Optional[dict] = None) -> Image.Image:
+        """
+        Convert to the colour mode content analysis chose.
+
+        Runs on the downscaled, upright, sRGB image. 'P' quantizes to a
+        palette, which is exact for images with up to 256 colours.
+        """
+        if mode is None or img.mode == mode:
+            return img
+        if mode == 'L' and meta and meta['embed_icc'] and img.mode != 'L':
+            mode = 'RGB'  # an embedded colour profile needs colour pixels
+        if mode == 'P':
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            return img.quantize(PALETTE_MAX_COLORS, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+        return img if img.mode == mode else img.convert(mode)
+
+    def _reduce_png(self, img: Image.Image, target_size_bytes: int, meta: Optional[dict] = None,
+                    mode: Optional[str] = None):
+        """
+        Lossless PNG: only resizing can bring the file under the target.
+
+        mode ('RGB', 'L' or 'P') is set by content analysis for images without
+        transparency; otherwise the image is stored as RGBA.
+        """
+        max_width = self.max_width
+
+        # Preserve transparency for PNG files (unless content analysis found
+        # none worth keeping: then it is flattened while resizing)
+        # Convert palette mode with transparency to RGBA
+        if mode is None and img.mode == 'P' and 'transparency' in img.info:
+            img = img.convert('RGBA')
+        elif mode is None and img.mode not in ('RGBA', 'LA'):
+            # If no alpha channel, still save as PNG but convert to RGBA for consistency
+            img = img.convert('RGBA')
+
+        # Resize if too large
+        img = self._downscale(img, max_width, flatten=mode is not None)
+        if meta:
+            img = self._apply_metadata(img, meta)
+        params = self._save_params(meta, 'PNG')
+
+        # Encode as PNG with optimization
+        # PNG compression level: 0-9, where 9 is maximum compression
+        compress_level = 9
+        data = self._encode(self._convert_mode(img, mode, meta), 'PNG', compress_level, params=params)
+
+        # If still too large, progressively resize (a palette is rebuilt from
+        # each resized image, not resized itself)
+        if len(data) > target_size_bytes:
+            scale_factor = 0.95
+            while len(data) > target_size_bytes and max(img.size) > self.min_width:
+                new_width = int(img.size[0] * scale_factor)
+                new_height = int(img.size[1] * scale_factor)
+                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                data = self._encode(self._convert_mode(img, mode, meta), 'PNG', compress_level, params=params)
+
+        return img.size, compress_level, data
+
+    def _reduce_jpeg(self, img: Image.Image, target_size_bytes: int, meta: Optional[dict] = None,
+                     source_quality: Optional[int] = None, mode: Optional[str] = None,
+                     content: Optional[dict] = None, source=None):
+        """
+        Standard JPEG compression: lower quality in steps of 5, then resize.
+
+        mode 'L' (from content analysis) encodes grey images with a single
+        channel. With 'auto' subsampling, graphics (content['kind']) start
+        at 4:4:4; if that does not fit, 4:2:0 is tried before any lower
+        quality, since it saves more bytes for less loss.
+
+        A JPEG source saved at a lower quality than self.quality starts at
+        its own quality: encoding higher only makes the file bigger, it
+        cannot bring back detail. If the image was at most resized (not
+        rotated or colour converted), the first encode reuses the source's
+        quantization tables (Pillow's quality='keep').
+
+        With a rate cache and the source file given, the search starts at
+        the first setting not already known to be too big, or later where
+        the recorded sizes predict the target fits (_predict_jpeg_start),
+        and every size it measures is recorded.
+        """
+        max_width = self.max_width
+        quality = self.quality
+        if source_quality is not None and source_quality < quality:
+            quality = source_quality
+
+        # Resize if too large, flattening transparency on the way (at the
+        # reduced size, not the source size)
+        img = self._downscale(img, max_width, flatten=True)
+        if meta:
+            img = self._apply_metadata(img, meta)
+        img = self._convert_mode(img, mode, meta)
+        subsampling = self._jpeg_subsampling(content)
+        params = self._save_params(meta, 'JPEG')
+
+        # Still the decoded source JPEG (thumbnail() resizes in place), so its
+        # own tables can be reused for the first setting
+        keep = source_quality is not None and source_quality <= self.quality and img.format == 'JPEG'
+        settings = self._jpeg_settings(quality, img.size, subsampling)
+        base = img
+        points = {}
+
+        def point(index: int):
+            setting_quality, size, setting_subsampling = settings[index]
+            return (KEEP_QUALITY if keep and index == 0 else setting_quality), size, setting_subsampling
+
+        def encode(index: int, final: bool) -> bytes:
+            nonlocal img
+            setting_quality, size, setting_subsampling = key = point(index)
+            if img.size != size:
+                img = base if size == base.size else base.resize(size, Image.Resampling.LANCZOS)
+            data = self._encode(img, 'JPEG', 'keep' if setting_quality == KEEP_QUALITY else setting_quality,
+                                final=final, params=dict(params, subsampling=setting_subsampling))
+            size, trial = points.get(key, (None, None))
+            points[key] = (len(data), trial) if final else (size, len(data))
+            return data
+
+        index = start = 0
+        cache = self.rate_cache if source is not None else None
+        if cache is not None:
+            cache_settings = settings_key(
+                format='JPEG', mode=img.mode, max_width=max_width, large_image_pixels=self.large_image_pixels,
+                keep_metadata=self.keep_metadata, convert_to_srgb=self.convert_to_srgb, progressive=self.progressive
+            )
+            # Start after the last setting known to be too big: settings get
+            # smaller down the list, so all before it are too big as well. As
+            # in the search, optimization saves at least as much as it did at
+            # a later setting, so a trial size can show a setting is too big
+            known_points = cache.points(source, cache_settings)
+            known = [known_points.get(point(candidate), (None, None)) for candidate in range(len(settings))]
+            later_ratio = None
+            for candidate in reversed(range(len(settings))):
+                size, trial = known[candidate]
+                if size is not None and size > target_size_bytes or (
+                        trial is not None and later_ratio is not None and trial * later_ratio > target_size_bytes):
+                    index = min(candidate + 1, len(settings) - 1)
+                    break
+                if size is not None and trial is not None:
+                    later_ratio = size / trial
+
+            # A target below the recorded sizes: predict where it fits from
+            # the full sizes, and the trial sizes times the optimization ratio
+            # measured nearest to them
+            pairs = [(candidate, size / trial) for candidate, (size, trial) in enumerate(known)
+                     if size is not None and trial is not None]
+            anchors = {}
+            for candidate, (size, trial) in enumerate(known):
+                if size is None and trial is not None and pairs:
+                    size = trial * min(pairs, key=lambda pair: abs(pair[0] - candidate))[1]
+                if size is not None:
+                    anchors[candidate] = size
+            start = self._predict_jpeg_start(settings, anchors, index, target_size_bytes)
+
+        ratio = JPEG_OPTIMIZED_RATIO
+        skipped = []  # (index, trial size or None) of settings predicted not to fit
+        if start > index:
+            # Jump to the predicted setting. The settings passed over count as
+            # skipped: once one fits, they are checked like any other
+            skipped = [(candidate, known[candidate][1]) for candidate in range(index, start)]
+            if pairs:
+                ratio = min(pairs, key=lambda pair: abs(pair[0] - start))[1] - JPEG_RATIO_MARGIN
+            index = start - 1
+            data, tried = None, True
+        else:
+            # Most images fit at the first setting, so it is encoded in full
+            # right away. Otherwise the search goes on down the settings. After
+            # a near miss the next setting is encoded in full; otherwise
+            # settings get fast trial encodes, and only one predicted to fit is
+            # encoded in full
+            data = encode(index, final=True)
+            tried = False  # data is a trial encode
+        while data is None or len(data) > target_size_bytes:
+            if index + 1 < len(settings):
+                index += 1
+                if not tried and len(data) * JPEG_NEAR_MISS <= target_size_bytes:
+                    data = encode(index, final=True)
+                    continue
+                trial = encode(index, final=False)
+                if len(trial) * min(ratio, 1.0) > target_size_bytes:
+                    skipped.append((index, len(trial)))
+                    data, tried = trial, True
+                    continue
+            elif tried:
+                # Nothing was predicted to fit: the smallest setting in full
+                trial = data
+                skipped.pop()
+            else:
+                break
+            data, tried = encode(index, final=True), False
+            ratio = len(data) / len(trial)
+            if len(data) <= target_size_bytes:
+                # Optimization saves at least as much at the settings skipped
+                # before this one, so any that may fit after all are encoded in full
+                while skipped:
+                    previous_index, previous_trial = skipped[-1]
+                    if previous_trial is None:
+                        previous_trial = len(encode(previous_index, final=False))
+                    if previous_trial * ratio > target_size_bytes:
+                        break
+                    skipped.pop()
+                    previous = encode(previous_index, final=True)
+                    if len(previous) > target_size_bytes:
+                        break
+                    index, data = previous_index, previous
+                    ratio = len(previous) / previous_trial
+            else:
+                skipped.clear()  # larger than this setting, which does not fit either
+            ratio -= JPEG_RATIO_MARGIN
+
+        if cache is not None:
+            cache.record(source, cache_settings, points)
+        quality, size, _ = settings[index]
+        return size, quality, data
+
+    def _jpeg_settings(self, quality: int, size: Tuple[int, int], subsampling: str) -> list:
+        """
+        Settings the JPEG search tries, in order.
+
+        Returns:
+            List of (quality, (width, height), subsampling): the start, then
+            4:2:0 for 'auto' subsampling starting at 4:4:4, then quality in
+            steps of 5 down to min_quality, then the size in steps of 10%
+            down to min_width
+        """
+        settings = [(quality, size, subsampling)]
+        if subsampling == '4:4:4' and self.subsampling == 'auto':
+            subsampling = '4:2:0'
+            settings.append((quality, size, subsampling))
+        while quality > self.min_quality:
+            quality -= 5
+            settings.append((quality, size, subsampling))
+        scale_factor = 0.9
+        while max(size) > self.min_width:
+            size = (int(size[0] * scale_factor), int(size[1] * scale_factor))
+            settings.append((quality, size, subsampling))
+        return settings
+
+    @staticmethod
+    def _predict_jpeg_start(settings: list, anchors: dict, start: int, target_size_bytes: int) -> int:
+        """
+        First setting from start on predicted to fit, from recorded sizes.
+
+        Each step down the settings is expected to change the size by a
+        fixed factor (JPEG_QUALITY_STEP and so on). Between two recorded
+        settings the steps are scaled to match both sizes (interpolation);
+        beyond them, from the nearest recorded size, steps of a kind seen
+        between the nearest two are scaled the same way (extrapolation).
+
+        Args:
+            settings: _jpeg_settings() list
+            anchors: Dictionary of setting index -> full encode size in bytes
+            start: First setting not known to be too big
+            target_size_bytes: Target size
+
+        Returns:
+            Setting index; start if nothing is recorded
+        """
+        if not anchors:
+            return start
+        # (kind, expected log size change) of the step after each setting
+        steps = []
+        for (_, size, subsampling), (_, next_size, next_subsampling) in zip(settings, settings[1:]):
+            if next_size != size:
+                pixels = next_size[0] * next_size[1] / (size[0] * size[1])
+                steps.append(('resize', JPEG_RESIZE_EXPONENT * math.log(pixels)))
+            elif next_subsampling != subsampling:
+                steps.append(('subsampling', math.log(JPEG_SUBSAMPLING_STEP)))
+            else:
+                steps.append(('quality', math.log(JPEG_QUALITY_STEP)))
+        points = sorted((index, math.log(size)) for index, size in anchors.items())
+
+        def change(a: int, b: int, factor: float, kinds: set) -> float:
+            # Predicted log size change from setting a to setting b
+            total = sum(step * (factor if kind in kinds else 1.0) for kind, step in steps[min(a, b):max(a, b)])
+            return total if b >= a else -total
+
+        def fit(a: tuple, b: tuple):
+            # Scale of the steps between two recorded sizes, and their kinds
+            expected = change(a[0], b[0], 1.0, set())
+            if not expected:
+                return 1.0, set()
+            factor = min(max((b[1] - a[1]) / expected, 0.25), 4.0)
+            return factor, {kind for kind, _ in steps[a[0]:b[0]]}
+
+        limit = math.log(target_size_bytes)
+        for index in range(start, len(settings)):
+            earlier = [point for point in points if point[0] <= index]
+            later = [point for point in points if point[0] >= index]
+            if earlier and later:
+                anchor, (factor, kinds) = earlier[-1], fit(earlier[-1], later[0])
+            elif len(points) < 2:
+                anchor, (factor, kinds) = points[0], (1.0, set())
+            elif earlier:
+                anchor, (factor, kinds) = earlier[-1], fit(*points[-2:])
+            else:
+                anchor, (factor, kinds) = later[0], fit(*points[:2])
+            if anchor[1] + change(anchor[0], index, factor, kinds) <= limit:
+                return index
+        return len(settings) - 1
+
+    def _jpeg_subsampling(self, content: Optional[dict] = None) -> str:
+        """Chroma subsampling to start a JPEG encode with."""
+        if self.subsampling != 'auto':
+            return self.subsampling
+        graphic = content and content['kind'] == 'graphic' and not content['grayscale']
+        return '4:4:4' if graphic else '4:2:0'
+
+    def _encode(self, img: Image.Image, output_format: str, quality,
+                final: bool = False, lossless: bool = False, params: Optional[dict] = None) -> bytes:
+        """
+        Encode an image in memory.
+
+        Trial encodes use the encoder's fast effort setting; the final encode
+        uses the thorough one (for JPEG: optimized Huffman tables, and
+        progressive if enabled). params holds metadata from _save_params(), so
+        trial sizes include it. For JPEG sources, quality may be 'keep'.
+        """
+        params = params or {}
+        buffer = io.BytesIO()
+        if output_format == 'WEBP':
+            method = WEBP_FINAL_METHOD if final else WEBP_TRIAL_METHOD
+            img.save(buffer, 'WEBP', quality=quality, method=method, lossless=lossless, **params)
+        elif output_format == 'AVIF':
+            speed = AVIF_FINAL_SPEED if final else AVIF_TRIAL_SPEED
+            img.save(buffer, 'AVIF', quality=quality, speed=speed, **params)
+        elif output_format == 'JPEG':
+            img.save(buffer, 'JPEG', quality=quality, optimize=final, progressive=final and self.progressive, **params)
+        else:
+            img.save(buffer, 'PNG', optimize=True, compress_level=9, **params)
+        return buffer.getvalue()
+
+    def _search_quality(self, img: Image.Image, output_format: str, target_size_bytes: int,
+                        params: Optional[dict] = None):
+        """
+        Binary search the highest quality whose trial encode fits the target.
+
+        Returns:
+            Tuple of (quality, encoded bytes), or (None, bytes at min quality)
+            if even the minimum quality is too large
+        """
+        data = self._encode(img, output_format, self.quality, params=params)
+        if len(data) <= target_size_bytes:
+            return self.quality, data
+
+        low, high = self.min_quality, self.quality - 1
+        best = None
+        smallest = data
+        while low <= high:
+            quality = (low + high) // 2
+            data = self._encode(img, output_format, quality, params=params)
+            if len(data) <= target_size_bytes:
+                best = (quality, data)
+                low = quality + 1
+            else:
+                smallest = data
+                high = quality - 1
+        return best if best else (None, smallest)
+
+    def _reduce_modern(self, img: Image.Image, target_size_bytes: int,
+                       output_format: str, preserve_alpha: bool, meta: Optional[dict] = None):
+        """
+        WebP/AVIF compression.
+
+        Quality is found by binary search over fast trial encodes held in
+        memory; only the chosen setting is re-encoded at full effort.
+        Transparent WebP images are tried losslessly first.
+        """
+        if preserve_alpha and img.mode != 'RGBA':
+            img = img.convert('RGBA')
+
+        # Transparency that is not kept is flattened while resizing
+        img = self._downscale(img, self.max_width, flatten=not preserve_alpha)
+        if meta:
+            img = self._apply_metadata(img, meta)
+        if img.mode not in ('RGB', 'RGBA', 'L'):
+            img = img.convert('RGB')  # e.g. CMYK without a usable profile
+        params = self._save_params(meta, output_format)
+
+        if output_format == 'WEBP' and preserve_alpha:
+            data = self._encode(img, output_format, 100, lossless=True, params=params)
+            if len(data) <= target_size_bytes:
+                return img.size, 100, data
+
+        while True:
+            quality, data = self._search_quality(img, output_format, target_size_bytes, params)
+            if quality is not None:
+                final = self._encode(img, output_format, quality, final=True, params=params)
+                # The thorough encode is almost always smaller, but never
+                # trade a fitting trial result for an oversized one
+                if len(final) <= target_size_bytes:
+                    data = final
+                break
+            if max(img.size) <= self.min_width:
+                quality = self.min_quality
+                break
+            # Encoded size scales roughly with pixel count, so jump straight to
+            # the estimated scale instead of creeping down in fixed steps
+            scale_factor = min(0.9, max(0.5, math.sqrt(target_size_bytes / len(data)) * 0.95))
+            new_width = max(int(img.size[0] * scale_factor), 1)
+            new_height = max(int(img.size[1] * scale_factor), 1)
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+        return img.size, quality, data
+
+    def renditions(self, input_path, output_dir, widths, formats=None, preserve_alpha: bool = False) -> dict:
+        """
+        Write several widths and formats of one image from a single decode.
+
+        The source is decoded once (at reduced scale for very large JPEGs) and
+        a resize pyramid is built by successive LANCZOS downscales, each from
+        the previous, larger level. Every width x format combination is then
+        encoded at the configured quality. Quality is only lowered when a
+        rendition exceeds max_size_mb; widths are never changed. A JSON
+        manifest describing all files is written next to them.
+
+        Args:
+            input_path: Path to input image
+            output_dir: Folder for the renditions and manifest
+            widths: Output widths in pixels (larger than the source are skipped)
+            formats: Output formats ('jpeg', 'png', 'webp', 'avif'); defaults to
+                     this reducer's output format
+            preserve_alpha: Keep transparency for formats that support it
+
+        Returns:
+            The manifest dictionary
+        """
+        input_path = Path(input_path)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        target_size_bytes = int(self.max_size_mb * 1024 * 1024)
+
+        output_formats = []
+        for name in (formats or [self.output_format]):
+            name = name.lower()
+            if name not in OUTPUT_FORMATS:
+                raise ValueError(f"Unsupported output format '{name}'. Supported: {OUTPUT_FORMATS}")
+            if name == 'auto':
+                name = self.resolve_format(preserve_alpha).lower()
+            if name not in output_formats:
+                output_formats.append(name)
+
+        with open_image(input_path) as img:
+            meta = self._read_metadata(img)
+            # Rotated EXIF orientations swap the displayed width and height
+            swap = meta['orientation'] in (5, 6, 7, 8)
+            source_size = img.size[::-1] if swap else img.size
+            largest = max(widths)
+            # Largest dimension of the widest rendition, for reduced decoding
+            box = max(largest, round(largest * source_size[1] / max(source_size[0], 1)))
+            if self.large_image_pixels and img.width * img.height > self.large_image_pixels:
+                img = self._load_large(img, box)
+            elif self.max_image_pixels and img.width * img.height > self.max_image_pixels:
+                raise ImageTooLargeError(
+                    f"Image has {img.width * img.height:,} pixels, above the limit of "
+                    f"{self.max_image_pixels:,} (MaxImagePixels in config.ini)"
+                )
+
+            # Transparency is kept through resizing; renditions that need it
+            # flattened are flattened at their own size
+            has_alpha = has_transparency(img)
+            if has_alpha:
+                base = img.convert('RGBA') if img.mode != 'RGBA' else img
+            else:
+                base = self._flatten(img)
+                if base.mode not in ('RGB', 'L', 'CMYK'):
+                    base = base.convert('RGB')
+
+            # Widths no larger than the source; the source width if all are larger
+            level_widths = sorted({w for w in widths if w <= source_size[0]}, reverse=True) or [source_size[0]]
+
+            manifest = {
+                'source': input_path.name,
+                'width': source_size[0],
+                'height': source_size[1],
+                'renditions': []
+            }
+
+            level = base
+            for width in level_widths:
+                height = max(1, round(source_size[1] * width / source_size[0]))
+                stored = (height, width) if swap else (width, height)
+                if level.size != stored:
+                    level = level.resize(stored, Image.Resampling.LANCZOS, reducing_gap=3.0)
+                upright = self._apply_metadata(level, meta)
+                if upright.mode == 'CMYK':
+                    upright = upright.convert('RGB')  # no usable profile
+
+                flattened = None
+                for name in output_formats:
+                    output_format = name.upper()
+                    rendition = upright
+                    if output_format == 'JPEG' or not preserve_alpha:
+                        if flattened is None:
+                            flattened = self._flatten(upright)
+                        rendition = flattened
+                    params = self._save_params(meta, output_format)
+                    if output_format == 'JPEG':
+                        params['subsampling'] = self._jpeg_subsampling()
+
+                    quality = self.quality
+                    data = self._encode(rendition, output_format, quality, final=True, params=params)
+                    if len(data) > target_size_bytes and output_format != 'PNG':
+                        found, trial = self._search_quality(rendition, output_format, target_size_bytes, params)
+                        quality = found if found is not None else self.min_quality
+                        data = self._encode(rendition, output_format, quality, final=True, params=params)
+                        if len(data) > len(trial):
+                            data = trial
+
+                    filename = f"{input_path.stem}_{width}w{FORMAT_EXTENSIONS[output_format]}"
+                    with atomic_output(output_dir / filename) as temp_output:
+                        temp_output.write_bytes(data)
+
+                    manifest['renditions'].append({
+                        'file': filename,
+                        'format': name,
+                        'width': width,
+                        'height': height,
+                        'bytes': len(data),
+                        'quality': None if output_format == 'PNG' else quality
+                    })
+
+        # srcset strings ready for <img>/<source> tags, one per format
+        manifest['srcset'] = {
+            name: ", ".join(
+                f"{r['file']} {r['width']}w"
+                for r in sorted(manifest['renditions'], key=lambda r: r['width'])
+                if r['format'] == name
+            )
+            for name in output_formats
+        }
+
+        with atomic_output(output_dir / f"{input_path.stem}_manifest.json") as temp_output:
+            with open(temp_output, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+
+        return manifest
+
+    def compress(self, input_path: str, output_path: str) -> dict:
+        """
+        Compress an image file.
+
+        Args:
+            input_path: Path to input image file
+            output_path: Path to output image file
+
+        Returns:
+            Dictionary with compression results including:
+                - success: bool
+                - input_size: int (bytes)
+                - output_size: int (bytes)
+                - reduction_percent: float
+                - dimensions: tuple (width, height)
+                - quality: int
+                - passed_through: str ('link', 'reflink' or 'copy' if the input
+                  already met the target and was used unchanged, else None)
+                - error: str (if failed)
+        """
+        result = {
+            'success': False,
+            'input_size': 0,
+            'output_size': 0,
+            'reduction_percent': 0.0,
+            'dimensions': None,
+            'quality': None,
+            'passed_through': None,
+            'error': None
+        }
+
+        try:
+            # Validate input file
+            if not os.path.exists(input_path):
+                result['error'] = f"Input file not found: {input_path}"
+                logger.error(result['error'])
+                return result
+
+            if not self.is_supported(input_path):
+                result['error'] = f"Unsupported file format. Supported: {self.supported_formats}"
+                logger.error(result['error'])
+                return result
+
+            input_size = self.get_file_size(input_path)
+            result['input_size'] = input_size
+
+            # Create output directory if needed
+            output_dir = os.path.dirname(output_path)
+            if output_dir and not os.path.exists(output_dir):
+                os.makedirs(output_dir, exist_ok=True)
+
+            preserve_alpha = (
+                self.preserve_transparency
+                and Path(input_path).suffix.lower() == '.png'
+                and self.has_alpha(input_path)
+            )
+
+            # Written under a temporary name, so a crash never leaves a truncated file
+            with atomic_output(output_path) as temp_output:
+                how = self.pass_through_file(input_path, temp_output, preserve_alpha)
+                if how is None:
+                    dimensions, quality = self.reduce(input_path, temp_output, preserve_alpha)
+                else:
+                    with open_image(input_path) as img:
+                        dimensions, quality = img.size, None
+            result['passed_through'] = how
+            result['dimensions'] = dimensions
+            result['quality'] = quality
+
+            output_size = self.get_file_size(output_path)
+            result['output_size'] = output_size
+            if input_size > 0:
+                reduction = ((input_size - output_size) / input_size) * 100
+                result['reduction_percent'] = round(reduction, 2)
+
+            result['success'] = True
+            logger.info(f"Compressed {input_path}: {input_size / (1024*1024):.2f} MB → "
+                        f"{output_size / (1024*1024):.2f} MB")
+        except Exception as e:
+            result['error'] = f"Unexpected error: {str(e)}"
+            logger.error(result['error'])
+
+        return result
+
+
+def reduce_image(input_path, output_path, initial_quality=85, max_width=1920, max_size_mb=1.0, preserve_alpha=False):
+    """
+    Reduce image size while maintaining quality.
+
+    Args:
+        input_path: Path to input image
+        output_path: Path to output image
+        initial_quality: Starting quality level
+        max_width: Maximum width in pixels
+        max_size_mb: Target file size in MB
+        preserve_alpha: If True, preserve PNG transparency (PNG output only)
+
+    Returns:
+        Tuple of (final dimensions, final quality or PNG compress level)
+    """
+    reducer = ImageReducer(quality=initial_quality, max_width=max_width, max_size_mb=max_size_mb)
+    return reducer.reduce(input_path, output_path, preserve_alpha)
+
+
+def compress_bytes(
+    data,
+    quality: int = 85,
+    max_width: int = 1920,
+    max_size_mb: float = 1.0,
+    preserve_transparency: bool = False,
+    output_format: str = 'auto'
+) -> dict:
+    """
+    Convenience function to compress an image held in memory.
+
+    Args:
+        data: Encoded image as bytes, bytearray, memoryview, or a seekable binary file object
+        quality: Initial JPEG quality (default 85)
+        max_width: Maximum width/height in pixels (default 1920)
+        max_size_mb: Target file size in MB (default 1.0)
+        preserve_transparency: Keep PNG transparency (default False)
+        output_format: 'auto', 'jpeg', 'png', 'webp' or 'avif' (default 'auto')
+
+    Returns:
+        Dictionary with compression results; the compressed image is in 'data'
+
+    Example:
+        >>> result = compress_bytes(upload, output_format='webp')
+        >>> if result['success']:
+        ...     send(result['data'])
+    """
+    reducer = ImageReducer(
+        quality=quality,
+        max_width=max_width,
+        max_size_mb=max_size_mb,
+        preserve_transparency=preserve_transparency,
+        output_format=output_format
+    )
+    return reducer.compress_bytes(data)
+
+
+def compress_image(
+    input_file: str,
+    output_file: str,
+    quality: int = 85,
+    max_width: int = 1920,
+    max_size_mb: float = 1.0,
+    preserve_transparency: bool = False,
+    output_format: str = 'auto'
+) -> dict:
+    """
+    Convenience function to compress an image file.
+
+    Args:
+        input_file: Path to input image file
+        output_file: Path to output image file
+        quality: Initial JPEG quality (default 85)
+        max_width: Maximum width/height in pixels (default 1920)
+        max_size_mb: Target file size in MB (default 1.0)
+        preserve_transparency: Keep PNG transparency (default False)
+        output_format: 'auto', 'jpeg', 'png', 'webp' or 'avif' (default 'auto')
+
+    Returns:
+        Dictionary with compression results
+
+    Example:
+        >>> result = compress_image("photo.jpg", "photo_small.jpg", max_size_mb=0.5)
+        >>> if result['success']:
+        ...     print(f"Reduced by {result['reduction_percent']}%")
+    """
+    reducer = ImageReducer(
+        quality=quality,
+        max_width=max_width,
+        max_size_mb=max_size_mb,
+        preserve_transparency=preserve_transparency,
+        output_format=output_format
+    )
+    return reducer.compress(input_file, output_file)
@@ -0,0 +1,200 @@
+"""
+Journal Module
+
+Write-ahead record of a batch, so an interrupted run can be resumed. Every
+file is recorded when its output name is chosen (planned), when a worker
+starts it (running) and when it finishes (done or failed), together with its
+output path and sizes. The journal is a SQLite database in WAL mode inside
+the output folder: each update is a small append, readers never block
+writers, and a crash at any point leaves a consistent record.
+
+On resume, a file is skipped only if its source is unchanged and its output
+still exists with the recorded size. Everything else runs again, writing to
+the output name recorded for it instead of a new _1 name.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILENAME = ".imagereducer-journal.db"
+
+PLANNED = 'planned'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    source TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    state TEXT NOT NULL,
+    source_size INTEGER,
+    source_mtime_ns INTEGER,
+    output_size INTEGER,
+    error TEXT,
+    updated REAL
+)
+"""
+
+
+def _key(source) -> str:
+    return os.path.abspath(source)
+
+
+def _signature(source) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class BatchJournal:
+    """
+    Journal of one batch's files, their outputs and their progress.
+
+    Thread-safe: workers may record starts while the main thread records
+    results.
+
+    Attributes:
+        path (Path): Journal database file
+    """
+
+    def __init__(self, path, resume: bool = False):
+        """
+        Open the journal.
+
+        Args:
+            path: Journal file, normally JOURNAL_FILENAME in the output folder
+            resume: Keep the records of the previous run; otherwise they are
+                    cleared and a new batch starts
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        # WAL: appends instead of rewriting pages; NORMAL only syncs at
+        # checkpoints, and a lost tail just means those files run again
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        if not resume:
+            self._db.execute("DELETE FROM jobs")
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def plan(self, jobs: Iterable[Tuple[object, object]]):
+        """
+        Record files and their chosen output paths, in one transaction.
+
+        Args:
+            jobs: (source path, output path) pairs
+        """
+        now = time.time()
+        rows = [(_key(source), str(output), PLANNED, *_signature(source), now) for source, output in jobs]
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO jobs (source, output, state, source_size, source_mtime_ns, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def start(self, source):
+        """Record that a worker started a file."""
+        self._execute("UPDATE jobs SET state = ?, updated = ? WHERE source = ?", (RUNNING, time.time(), _key(source)))
+
+    def finish(self, source, output_size: Optional[int] = None, output=None):
+        """
+        Record that a file's output is complete.
+
+        Args:
+            source: Source file
+            output_size: Size of the output (default: read from disk)
+            output: Output path, if it differs from the planned one (e.g. the
+                    format was chosen from the image's content)
+        """
+        key = _key(source)
+        if output is None:
+            row = self._execute("SELECT output FROM jobs WHERE source = ?", (key,)).fetchone()
+            output = row[0] if row else None
+        if output_size is None and output is not None:
+            output_size = os.path.getsize(output)
+        self._execute(
+            "UPDATE jobs SET state = ?, output = COALESCE(?, output), output_size = ?, error = NULL, updated = ? "
+            "WHERE source = ?",
+            (DONE, str(output) if output is not None else None, output_size, time.time(), key)
+        )
+
+    def fail(self, source, error):
+        """Record that a file failed."""
+        self._execute(
+            "UPDATE jobs SET state = ?, error = ?, updated = ? WHERE source = ?",
+            (FAILED, str(error), time.time(), _key(source))
+        )
+
+    def outputs(self) -> Dict[str, Path]:
+        """
+        Output path recorded for every file, keyed by absolute source path.
+
+        A resumed run writes to these paths again, so unfinished files do not
+        get new (_1) names.
+        """
+        rows = self._execute("SELECT source, output FROM jobs").fetchall()
+        return {source: Path(output) for source, output in rows}
+
+    def _verified(self, row) -> bool:
+        source, output, source_size, source_mtime_ns, output_size = row
+        if _signature(source) != (source_size, source_mtime_ns):
+            return False  # source changed (or gone) since it was compressed
+        try:
+            return os.path.getsize(output) == output_size
+        except OSError:
+            return False
+
+    def completed(self) -> Set[str]:
+        """
+        Files that are done, with the source unchanged and the output present.
+
+        Returns:
+            Absolute source paths that can be skipped
+        """
+        rows = self._execute(
+            "SELECT source, output, source_size, source_mtime_ns, output_size FROM jobs WHERE state = ?", (DONE,)
+        ).fetchall()
+        return {row[0] for row in rows if self._verified(row)}
+
+    def is_complete(self, source) -> bool:
+        """Whether one file is done, as for completed()."""
+        row = self._execute(
+            "SELECT source, output, source_size, source_mtime_ns, output_size FROM jobs WHERE source = ? AND state = ?",
+            (_key(source), DONE)
+        ).fetchone()
+        return row is not None and self._verified(row)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of files per state."""
+        return dict(self._execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        """Close the database (checkpointing the WAL into it)."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,291 @@
+"""
+Perceptual Module
+
+Finds near-duplicate images (burst shots, re-exports at another size or
+quality) with perceptual hashes and a BK-tree for Hamming-radius queries.
+Hashes are computed from a reduced decode, so even large JPEGs cost only a
+1/8-scale decode. Other formats are decoded in full (within the same pixel
+limit as ImageReducer) and box-reduced before hashing.
+"""
+
+import math
+import logging
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from .image_reducer import (
+    DEFAULT_MAX_IMAGE_PIXELS, ImageTooLargeError, bytes_per_pixel, draft_scale, open_image
+)
+from .scheduler import MemoryBudget, run_jobs
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the pure-Python DCT is only 8x32 rows
+    np = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+HASH_METHODS = ('dhash', 'phash')
+
+# Default Hamming distance (of 64 bits) below which two images count as the same
+DEFAULT_MAX_DISTANCE = 6
+
+# Largest per-channel difference of the average colour between matches.
+# Hashes only see structure, so flat images of different colours hash alike.
+MAX_COLOUR_DIFFERENCE = 24
+
+_PHASH_SIZE = 32
+_PHASH_BITS = 8
+
+# Images are reduced to no less than this before hashing (twice the phash size)
+_HASH_DECODE = (2 * _PHASH_SIZE, 2 * _PHASH_SIZE)
+
+# Modes Image.reduce() handles; others are converted to RGB first
+_REDUCE_MODES = ('L', 'LA', 'RGB', 'RGBA')
+
+# DCT-II basis for the 8 lowest frequencies of a 32-sample signal
+_DCT = [
+    [math.cos(math.pi * (2 * x + 1) * u / (2 * _PHASH_SIZE)) for x in range(_PHASH_SIZE)]
+    for u in range(_PHASH_BITS)
+]
+
+
+def _bits_to_int(bits) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | bool(bit)
+    return value
+
+
+def dhash(img: Image.Image) -> int:
+    """
+    Difference hash: 64 bits comparing horizontally adjacent pixels of a 9x8 thumbnail.
+
+    Args:
+        img: Image (any mode)
+
+    Returns:
+        64-bit hash
+    """
+    small = img.convert('L').resize((9, 8), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    return _bits_to_int(
+        pixels[row * 9 + col] > pixels[row * 9 + col + 1]
+        for row in range(8) for col in range(8)
+    )
+
+
+def phash(img: Image.Image) -> int:
+    """
+    DCT hash: 64 bits comparing the lowest 8x8 DCT frequencies of a 32x32 thumbnail to their median.
+
+    More robust than dhash against gamma and contrast changes, slightly slower.
+
+    Args:
+        img: Image (any mode)
+
+    Returns:
+        64-bit hash
+    """
+    small = img.convert('L').resize((_PHASH_SIZE, _PHASH_SIZE), Image.Resampling.BOX)
+    pixels = small.tobytes()
+
+    if np is not None:
+        basis = np.array(_DCT)
+        matrix = np.frombuffer(pixels, dtype=np.uint8).reshape(_PHASH_SIZE, _PHASH_SIZE).astype(float)
+        coefficients = (basis @ matrix @ basis.T).flatten().tolist()
+    else:
+        rows = [pixels[y * _PHASH_SIZE:(y + 1) * _PHASH_SIZE] for y in range(_PHASH_SIZE)]
+        # Separable DCT: along rows, then along columns, low frequencies only
+        row_dct = [[sum(c * p for c, p in zip(basis, row)) for basis in _DCT] for row in rows]
+        coefficients = [
+            sum(_DCT[v][y] * row_dct[y][u] for y in range(_PHASH_SIZE))
+            for v in range(_PHASH_BITS) for u in range(_PHASH_BITS)
+        ]
+
+    # The DC term only reflects overall brightness; leave it out of the median
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    return _bits_to_int(c > median for c in coefficients)
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')  # int.bit_count() needs Python 3.10
+
+
+def image_hash(path, method: str = 'dhash',
+               max_image_pixels: Optional[int] = DEFAULT_MAX_IMAGE_PIXELS) -> Tuple[int, Tuple[int, int], Tuple[int, int, int]]:
+    """
+    Hash an image file from a reduced decode.
+
+    Args:
+        path: Path to the image file
+        method: 'dhash' or 'phash'
+        max_image_pixels: Most pixels that may be decoded (None for no limit)
+
+    Returns:
+        Tuple of (hash, original (width, height), average (R, G, B))
+
+    Raises:
+        ImageTooLargeError: If the decode would exceed max_image_pixels
+    """
+    with open_image(path) as img:
+        size = img.size
+        if img.format == 'JPEG':
+            img.draft('RGB', _HASH_DECODE)  # up to 1/8-scale decode
+        if max_image_pixels and img.width * img.height > max_image_pixels:
+            raise ImageTooLargeError(
+                f"Image needs {img.width * img.height:,} pixels decoded, above the limit of {max_image_pixels:,}"
+            )
+        small = img if img.mode in _REDUCE_MODES else img.convert('RGB')
+        factor = min(small.width // _HASH_DECODE[0], small.height // _HASH_DECODE[1])
+        if factor > 1:
+            small = small.reduce(factor)  # box average, as the hash resize below
+        rgb = small.convert('RGB')
+        colour = rgb.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+        func = phash if method == 'phash' else dhash
+        return func(rgb), size, colour
+
+
+def hash_memory(path) -> int:
+    """
+    Estimate the peak memory image_hash() needs, from the header only.
+
+    Args:
+        path: Path to the image file
+
+    Returns:
+        Estimated peak memory in bytes
+    """
+    with open_image(path) as img:
+        scale = draft_scale(img.size, _HASH_DECODE) if img.format == 'JPEG' else 1
+        decoded = ((img.width + scale - 1) // scale) * ((img.height + scale - 1) // scale)
+        if img.format == 'JPEG' or img.mode in _REDUCE_MODES:
+            return decoded * bytes_per_pixel(img.mode)
+        return decoded * (bytes_per_pixel(img.mode) + 4)  # converted to RGB before reducing
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+
+    A radius query only visits children whose edge distance is within radius
+    of the query's distance to the node (triangle inequality), so lookups touch
+    a small fraction of a large index.
+    """
+
+    def __init__(self):
+        self._root = None  # (hash, item, {distance: child})
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item=None):
+        """
+        Insert a hash.
+
+        Args:
+            value: 64-bit hash
+            item: Payload returned by search (e.g. the file path)
+        """
+        self._size += 1
+        node = (value, item, {})
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, object]]:
+        """
+        Find all entries within a Hamming radius.
+
+        Args:
+            value: Hash to look up
+            radius: Maximum Hamming distance
+
+        Returns:
+            List of (distance, item), nearest first
+        """
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                found.append((distance, item))
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        found.sort(key=lambda match: match[0])
+        return found
+
+
+def find_near_duplicates(paths: Iterable, max_distance: int = DEFAULT_MAX_DISTANCE,
+                         method: str = 'dhash', max_workers: int = 4,
+                         max_image_pixels: Optional[int] = DEFAULT_MAX_IMAGE_PIXELS,
+                         budget: Optional[MemoryBudget] = None) -> List[List[Path]]:
+    """
+    Group visually identical images.
+
+    Args:
+        paths: Image file paths
+        max_distance: Largest Hamming distance (of 64 bits) still counted as a match
+        method: 'dhash' or 'phash'
+        max_workers: Number of hashing threads
+        max_image_pixels: Images needing more pixels decoded are left out
+        budget: Optional MemoryBudget the decodes are admitted by (hash_memory)
+
+    Returns:
+        Groups of two or more matching images. The first image of each group
+        has the highest resolution (the best source to keep); the rest
+        follow in input order. Unreadable images are left out.
+    """
+    if method not in HASH_METHODS:
+        raise ValueError(f"Unsupported hash method '{method}'. Supported: {HASH_METHODS}")
+    paths = [Path(p) for p in paths]
+
+    results = {}
+    for path, result, error in run_jobs(
+            paths, lambda path: image_hash(path, method, max_image_pixels),
+            max_workers=max_workers, budget=budget, estimate=hash_memory):
+        if error is not None:
+            logger.warning(f"Could not hash {path}: {error}")
+        results[path] = result
+    hashes = [results[path] for path in paths]
+
+    entries = [(index, path, result) for index, (path, result) in enumerate(zip(paths, hashes)) if result]
+    # Largest first, so each group is anchored on its best source
+    entries.sort(key=lambda entry: (-entry[2][1][0] * entry[2][1][1], entry[0]))
+    colours = {path: result[2] for _, path, result in entries}
+
+    tree = BKTree()
+    groups = {}
+    for index, path, (value, _, colour) in entries:
+        matches = [
+            anchor for _, anchor in tree.search(value, max_distance)
+            if max(abs(a - b) for a, b in zip(colour, colours[anchor])) <= MAX_COLOUR_DIFFERENCE
+        ]
+        if matches:
+            groups[matches[0]].append((index, path))
+        else:
+            tree.add(value, path)
+            groups[path] = []
+
+    order = {path: index for index, path in enumerate(paths)}
+    return sorted(
+        ([anchor] + [path for _, path in sorted(members)] for anchor, members in groups.items() if members),
+        key=lambda group: order[group[0]]
+    )
@@ -0,0 +1,152 @@
+"""
+Progress Module
+
+Batch progress that stays cheap at any batch size. Workers update a few
+counters; the UI reads one snapshot per refresh (done, throughput, ETA)
+instead of receiving a message per file. The full per-file log goes to a
+report file rather than into the UI.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+REPORT_FILENAME = "compression_report.txt"
+
+# Throughput is measured over this many recent seconds, so the ETA follows
+# changes in speed (e.g. a run of large files) instead of the whole-run average
+RATE_WINDOW_SECONDS = 15.0
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Format seconds as H:MM:SS or M:SS; '--:--' when unknown."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class ProgressTracker:
+    """
+    Thread-safe batch counters with throughput and ETA.
+
+    Attributes:
+        total (int): Files in the batch
+    """
+
+    def __init__(self, total: int = 0, window_seconds: float = RATE_WINDOW_SECONDS):
+        """
+        Start tracking a batch.
+
+        Args:
+            total: Number of files in the batch
+            window_seconds: Period over which throughput is measured
+        """
+        self.total = total
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._done = 0
+        self._failed = 0
+        self._input_bytes = 0
+        self._output_bytes = 0
+        # (time, done) samples taken by snapshot(), for the windowed rate
+        self._samples = deque([(self._started, 0)])
+
+    def advance(self, count: int = 1, input_bytes: int = 0, output_bytes: int = 0, failed: bool = False):
+        """
+        Record finished files.
+
+        Args:
+            count: Files finished (e.g. an original plus its duplicates)
+            input_bytes: Their combined original size
+            output_bytes: Their combined compressed size
+            failed: Whether they failed
+        """
+        with self._lock:
+            self._done += count
+            if failed:
+                self._failed += count
+            self._input_bytes += input_bytes
+            self._output_bytes += output_bytes
+
+    def snapshot(self) -> dict:
+        """
+        Current progress, for one UI refresh.
+
+        Returns:
+            Dictionary with total, done, failed, percent, input_bytes,
+            output_bytes, elapsed (s), rate (files/s) and eta (s, or None)
+        """
+        now = time.monotonic()
+        with self._lock:
+            done, failed = self._done, self._failed
+            input_bytes, output_bytes = self._input_bytes, self._output_bytes
+            self._samples.append((now, done))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self.window_seconds:
+                self._samples.popleft()
+            first_time, first_done = self._samples[0]
+
+        rate = (done - first_done) / (now - first_time) if now > first_time else 0.0
+        remaining = max(self.total - done, 0)
+        eta = remaining / rate if rate > 0 else (0.0 if remaining == 0 else None)
+        return {
+            'total': self.total,
+            'done': done,
+            'failed': failed,
+            'percent': done / self.total * 100 if self.total else 100.0,
+            'input_bytes': input_bytes,
+            'output_bytes': output_bytes,
+            'elapsed': now - self._started,
+            'rate': rate,
+            'eta': eta,
+        }
+
+
+class ProgressReport:
+    """
+    Full per-file log of a batch, written to a text file.
+
+    Thread-safe. Lines are buffered and the file is flushed on close().
+    """
+
+    def __init__(self, path, append: bool = False):
+        """
+        Create (or replace) the report file.
+
+        Args:
+            path: Report file path
+            append: Add to an existing report instead (e.g. a resumed batch)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, message: str):
+        """Append a message (one or more lines)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.write(message.rstrip('\n') + '\n')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
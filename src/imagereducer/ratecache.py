@@ -0,0 +1,185 @@
+"""
+Rate Cache Module
+
+Remembers, per source file, the encoded size of every setting the JPEG size
+search tried: quality, dimensions and chroma subsampling. These points trace
+the image's rate-distortion curve. When the same folder runs again with
+another target size or preset, the search can skip every setting already
+known to be too big and start at the first one that fits, which is then
+usually the only encode.
+
+A target smaller than every recorded size is predicted instead: the image
+reducer interpolates or extrapolates the recorded points along the settings
+to choose the first setting to try. That is only an estimate. A setting
+predicted too early costs one trial encode per step forward, one predicted
+too late a trial and a full encode per step back, and the settings before
+the result are always checked, so the written file is the same as without
+the cache. The fewer points recorded (a run that fitted at once leaves one),
+the rougher the prediction. Only JPEG output is cached.
+
+Each point keeps the size of the full encode and of the fast trial encode,
+as far as the search made them; their ratio tells how much optimization
+saves for this image. The cache is a SQLite database in WAL mode, like the
+batch journal. A source file whose size or modification time changed has its
+points dropped.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+RATE_CACHE_FILENAME = ".imagereducer-ratecache.db"
+
+# Quality recorded for an encode that reused the source JPEG's own tables
+# (Pillow's quality='keep')
+KEEP_QUALITY = 0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    source TEXT NOT NULL,
+    source_size INTEGER NOT NULL,
+    source_mtime_ns INTEGER NOT NULL,
+    settings TEXT NOT NULL,
+    quality INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    subsampling TEXT NOT NULL,
+    size INTEGER,
+    trial INTEGER,
+    PRIMARY KEY (source, settings, quality, width, height, subsampling)
+)
+"""
+
+# A point is (quality, (width, height), subsampling). Its sizes are
+# (full encode, trial encode) in bytes, None where not encoded
+Point = Tuple[int, Tuple[int, int], str]
+Sizes = Tuple[Optional[int], Optional[int]]
+
+
+def _key(source) -> str:
+    return os.path.abspath(source)
+
+
+def _signature(source) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def settings_key(**settings) -> str:
+    """
+    Key for the options that change the bytes of an encode at a given point.
+
+    Points are only reused for the same key. Options that only change which
+    points are searched (start quality, minimum quality and width, target
+    size) are left out, so every preset shares the points it has in common.
+    """
+    return json.dumps(settings, sort_keys=True)
+
+
+class RateCache:
+    """
+    Persistent encoded sizes per source file and encoder settings.
+
+    Thread-safe: workers share one cache.
+
+    Attributes:
+        path (Path): Cache database file
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the cache.
+
+        Args:
+            path: Cache file, normally RATE_CACHE_FILENAME in the output folder
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    def points(self, source, settings: str) -> Dict[Point, Sizes]:
+        """
+        Sizes recorded for a source file.
+
+        Args:
+            source: Source file
+            settings: settings_key() of the encoder options
+
+        Returns:
+            Dictionary of point -> (full size, trial size). Empty if nothing
+            is recorded or the file changed since
+        """
+        key = _key(source)
+        signature = _signature(source)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT source_size, source_mtime_ns, quality, width, height, subsampling, size, trial "
+                "FROM points WHERE source = ? AND settings = ?",
+                (key, settings)
+            ).fetchall()
+            if any(tuple(row[:2]) != signature for row in rows):
+                # The file was replaced or edited: its old points are wrong
+                self._db.execute("DELETE FROM points WHERE source = ?", (key,))
+                return {}
+        return {(quality, (width, height), subsampling): (size, trial)
+                for _, _, quality, width, height, subsampling, size, trial in rows}
+
+    def record(self, source, settings: str, points: Dict[Point, Sizes]):
+        """
+        Record sizes for a source file, in one transaction.
+
+        Sizes given as None keep what was recorded before.
+
+        Args:
+            source: Source file
+            settings: settings_key() of the encoder options
+            points: Dictionary of point -> (full size, trial size)
+        """
+        source_size, source_mtime_ns = _signature(source)
+        if source_size is None or not points:
+            return
+        key = _key(source)
+        rows = [
+            (key, source_size, source_mtime_ns, settings, quality, width, height, subsampling, size, trial)
+            for (quality, (width, height), subsampling), (size, trial) in points.items()
+        ]
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "DELETE FROM points WHERE source = ? AND (source_size != ? OR source_mtime_ns != ?)",
+                    (key, source_size, source_mtime_ns)
+                )
+                self._db.executemany(
+                    "INSERT INTO points (source, source_size, source_mtime_ns, settings, quality, width, height, "
+                    "subsampling, size, trial) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (source, settings, quality, width, height, subsampling) DO UPDATE SET "
+                    "size = COALESCE(excluded.size, size), trial = COALESCE(excluded.trial, trial)",
+                    rows
+                )
+
+    def close(self):
+        """Close the database (checkpointing the WAL into it)."""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
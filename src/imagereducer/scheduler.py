@@ -0,0 +1,159 @@
+"""
+Scheduler Module
+
+Runs compression jobs on a pool of worker threads while keeping the estimated
+memory of all running jobs inside a configurable RAM budget.
+"""
+
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET_MB = 1024
+
+_DONE = object()
+
+
+class MemoryBudget:
+    """
+    Admission control for memory-hungry jobs.
+
+    Jobs reserve their estimated peak memory before running and release it
+    when they finish. Reservations are granted in FIFO order so a large job
+    is not starved by a stream of small ones. A job larger than the whole
+    budget is clamped to the budget, which lets it run alone instead of
+    blocking forever.
+
+    Attributes:
+        limit (int): Budget in bytes
+        in_use (int): Bytes currently reserved by running jobs
+    """
+
+    def __init__(self, limit_bytes: int):
+        """
+        Initialize the budget.
+
+        Args:
+            limit_bytes: Total bytes that may be reserved at once
+        """
+        self.limit = max(int(limit_bytes), 1)
+        self.in_use = 0
+        self._cond = threading.Condition()
+        self._waiting = deque()
+
+    def acquire(self, nbytes: int) -> int:
+        """
+        Block until nbytes can be reserved, then reserve them.
+
+        Args:
+            nbytes: Estimated memory of the job
+
+        Returns:
+            The number of bytes actually reserved (pass this to release())
+        """
+        nbytes = min(max(int(nbytes), 0), self.limit)
+        ticket = object()
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while self._waiting[0] is not ticket or self.in_use + nbytes > self.limit:
+                    self._cond.wait()
+            finally:
+                self._waiting.remove(ticket)
+            self.in_use += nbytes
+            self._cond.notify_all()
+        return nbytes
+
+    def release(self, nbytes: int):
+        """
+        Return a reservation made by acquire().
+
+        Args:
+            nbytes: Value returned by acquire()
+        """
+        with self._cond:
+            self.in_use -= nbytes
+            self._cond.notify_all()
+
+
+def run_jobs(
+    jobs: Iterable[Any],
+    func: Callable[[Any], Any],
+    max_workers: int = 4,
+    budget: Optional[MemoryBudget] = None,
+    estimate: Optional[Callable[[Any], int]] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Run func(job) for every job on a thread pool, yielding results as they complete.
+
+    Each worker pulls the next job, estimates its memory (lazily, right before
+    admission) and waits for the budget to admit it. Pillow releases the GIL
+    while decoding, resizing and encoding, so threads scale across cores.
+
+    Args:
+        jobs: Jobs to run, consumed in order
+        func: Callable run for each job
+        max_workers: Number of worker threads
+        budget: Optional MemoryBudget limiting concurrent memory use
+        estimate: Callable returning a job's estimated memory in bytes
+        should_stop: Callable polled before each job; True stops new work
+
+    Yields:
+        Tuples of (job, result, error) where error is the raised exception or None
+    """
+    job_iter = iter(jobs)
+    job_lock = threading.Lock()
+    results = queue.Queue()
+    stop_event = threading.Event()
+
+    def worker():
+        try:
+            while not stop_event.is_set() and not (should_stop and should_stop()):
+                with job_lock:
+                    job = next(job_iter, _DONE)
+                if job is _DONE:
+                    break
+
+                reserved = 0
+                if budget is not None:
+                    try:
+                        needed = estimate(job) if estimate else 0
+                    except Exception as e:
+                        # Unreadable header: let func() report the real error
+                        logger.debug(f"Memory estimate failed for {job}: {e}")
+                        needed = 0
+                    reserved = budget.acquire(needed)
+
+                try:
+                    results.put((job, func(job), None))
+                except Exception as e:
+                    results.put((job, None, e))
+                finally:
+                    if budget is not None:
+                        budget.release(reserved)
+        finally:
+            results.put(_DONE)
+
+    workers = max(1, int(max_workers))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="imagereducer")
+    for _ in range(workers):
+        executor.submit(worker)
+
+    try:
+        finished = 0
+        while finished < workers:
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            yield item
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False)
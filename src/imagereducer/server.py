@@ -0,0 +1,400 @@
+"""
+Server Module
+
+A small HTTP service so other programs can compress files without shelling out
+to main.py. Uploads are queued onto one warm worker pool (scheduler.run_jobs,
+the same engine as batch runs), under the usual memory budget. A full queue,
+too many open requests or an oversized body are refused straight away, so a
+burst of uploads cannot exhaust memory or disk.
+
+    POST /compress?format=webp&quality=80   body: the image or video bytes
+    GET  /health
+
+The compressed file is returned as the response body, with its statistics as
+JSON in the X-ImageReducer-Stats header.
+"""
+
+import json
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from .image_reducer import ImageReducer, DEFAULT_LARGE_IMAGE_PIXELS, DEFAULT_MAX_IMAGE_PIXELS
+from .scheduler import MemoryBudget, run_jobs, DEFAULT_MEMORY_BUDGET_MB
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_REQUESTS = 8
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_MAX_BODY_MB = 100
+
+STATS_HEADER = 'X-ImageReducer-Stats'
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mpeg', '.avi', '.mkv')
+_CHUNK_SIZE = 1024 * 1024
+
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.avif': 'image/avif',
+    '.mp4': 'video/mp4',
+}
+
+# Upload formats recognised without a file name
+_SNIFFED_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png'}
+
+
+class RequestError(Exception):
+    """A request that cannot be served; carries the HTTP status to answer with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _Job:
+    """One upload waiting for, or running on, the worker pool."""
+
+    def __init__(self, input_path: Path, output_path: Path, reducer, preserve_alpha: bool = False):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.reducer = reducer
+        self.preserve_alpha = preserve_alpha
+        self.submitted = time.monotonic()
+        self.started = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def is_video(self) -> bool:
+        return not isinstance(self.reducer, ImageReducer)
+
+
+class CompressionService:
+    """
+    Warm worker pool shared by all requests.
+
+    Attributes:
+        max_workers (int): Compression threads
+        queue_size (int): Jobs that may wait for a worker before submit() refuses more
+    """
+
+    def __init__(self, max_workers: int = 4, memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Start the worker pool.
+
+        Args:
+            max_workers: Compression threads
+            memory_budget_mb: Estimated decoded memory allowed across running jobs
+            queue_size: Jobs that may wait for a worker
+        """
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(1, queue_size)
+        self._jobs = queue.Queue(maxsize=self.queue_size)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._budget = MemoryBudget(memory_budget_mb * 1024 * 1024)
+        self._thread = threading.Thread(target=self._run, name="imagereducer-service", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Workers block on the queue between requests, so the pool stays warm
+        completed = run_jobs(
+            iter(self._jobs.get, None),
+            self._process,
+            max_workers=self.max_workers,
+            budget=self._budget,
+            estimate=lambda job: 0 if job.is_video else job.reducer.estimate_memory(job.input_path, job.preserve_alpha)
+        )
+        for job, result, error in completed:
+            job.result, job.error = result, error
+            job.done.set()
+
+    def _process(self, job: _Job):
+        job.started = time.monotonic()
+        with self._lock:
+            self._active += 1
+        try:
+            if job.is_video:
+                result = job.reducer.compress(str(job.input_path), str(job.output_path))
+                if not result['success']:
+                    raise RuntimeError(result['error'])
+                return {}
+            dimensions, quality = job.reducer.reduce(job.input_path, job.output_path, job.preserve_alpha)
+            return {'dimensions': list(dimensions), 'quality': quality}
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def submit(self, job: _Job) -> bool:
+        """Queue a job; returns False when the queue is full."""
+        try:
+            self._jobs.put_nowait(job)
+            return True
+        except queue.Full:
+            return False
+
+    def status(self) -> dict:
+        with self._lock:
+            active = self._active
+        return {
+            'workers': self.max_workers,
+            'active': active,
+            'queued': self._jobs.qsize(),
+            'queue_size': self.queue_size,
+        }
+
+    def close(self):
+        """Let the workers finish their current jobs and exit."""
+        self._jobs.put(None)
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def _param(query: dict, name: str, convert, default=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return convert(values[-1])
+    except ValueError:
+        raise RequestError(400, f"Invalid value for {name}: {values[-1]!r}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'ImageReducer'
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        status = self.server.service.status()
+        status.update(status='ok', requests=self.server.open_requests, video=self.server.video_available)
+        self._send_json(200, status)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/compress':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        # Refuse rather than queue without bound: callers should retry later
+        if not self.server.request_slots.acquire(blocking=False):
+            self._send_json(503, {'error': 'Too many requests'}, {'Retry-After': '1'})
+            return
+        try:
+            self.server.count_request(1)
+            with tempfile.TemporaryDirectory(prefix='imagereducer-') as workdir:
+                self._compress(Path(workdir))
+        except RequestError as e:
+            self._send_json(e.status, {'error': str(e)}, {'Retry-After': '1'} if e.status == 503 else None)
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            self._send_json(500, {'error': str(e)})
+        finally:
+            self.server.count_request(-1)
+            self.server.request_slots.release()
+
+    def _read_body(self, path: Path) -> int:
+        """Stream the request body to path without holding it in memory."""
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise RequestError(411, "Content-Length required")
+        try:
+            length = int(length)
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length <= 0:
+            raise RequestError(400, "Empty body")
+        if length > self.server.max_body_bytes:
+            raise RequestError(413, f"Body larger than {self.server.max_body_bytes // (1024 * 1024)} MB")
+        remaining = length
+        with open(path, 'wb') as f:
+            while remaining:
+                chunk = self.rfile.read(min(_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise RequestError(400, "Body shorter than Content-Length")
+                f.write(chunk)
+                remaining -= len(chunk)
+        return length
+
+    def _input_extension(self, query: dict, path: Path) -> str:
+        """Extension from the file name if given, otherwise from the file's header."""
+        name = _param(query, 'filename', str) or self.headers.get('X-Filename')
+        if name:
+            return Path(name).suffix.lower()
+        try:
+            with Image.open(path) as img:
+                return _SNIFFED_EXTENSIONS.get(img.format, '')
+        except Exception:
+            return ''
+
+    def _make_reducer(self, query: dict, is_video: bool):
+        if is_video:
+            if not self.server.video_available:
+                raise RequestError(415, "Video compression needs FFmpeg on the server")
+            from .video_reducer import VideoReducer
+            return VideoReducer(
+                crf=_param(query, 'crf', int, 28),
+                preset=_param(query, 'preset', str, 'medium')
+            )
+        try:
+            return ImageReducer(
+                quality=_param(query, 'quality', int, 85),
+                max_width=_param(query, 'max_width', int, 1920),
+                max_size_mb=_param(query, 'target_size', float, 1.0),
+                preserve_transparency=_param(query, 'preserve_transparency', _flag, False),
+                output_format=_param(query, 'format', str, 'auto'),
+                keep_metadata=_param(query, 'keep_metadata', _flag, False),
+                progressive=_param(query, 'progressive', _flag, False),
+                subsampling=_param(query, 'subsampling', str, 'auto'),
+                large_image_pixels=self.server.large_image_pixels,
+                max_image_pixels=self.server.max_image_pixels
+            )
+        except ValueError as e:
+            raise RequestError(400, str(e))
+
+    def _compress(self, workdir: Path):
+        query = parse_qs(urlsplit(self.path).query)
+        upload = workdir / 'upload'
+        input_size = self._read_body(upload)
+
+        ext = self._input_extension(query, upload)
+        is_video = ext in VIDEO_EXTENSIONS
+        if not is_video and ext not in ('.jpg', '.jpeg', '.png'):
+            raise RequestError(415, "Unsupported file type; send a JPEG, PNG or video with ?filename=")
+        input_path = upload.rename(workdir / f"input{ext}")
+
+        reducer = self._make_reducer(query, is_video)
+        preserve_alpha = False
+        if is_video:
+            output_ext = '.mp4'
+        else:
+            preserve_alpha = reducer.preserve_transparency and ext == '.png' and reducer.has_alpha(input_path)
+            output_ext = reducer.output_extension(preserve_alpha)
+        job = _Job(input_path, workdir / f"output{output_ext}", reducer, preserve_alpha)
+
+        if not self.server.service.submit(job):
+            raise RequestError(503, "Server busy, queue is full")
+        job.done.wait()
+        if job.error is not None:
+            raise RequestError(422, f"Compression failed: {job.error}")
+
+        output_size = job.output_path.stat().st_size
+        stats = {
+            'input_size': input_size,
+            'output_size': output_size,
+            'reduction_percent': round((input_size - output_size) / input_size * 100, 2),
+            'format': output_ext.lstrip('.'),
+            'queued_ms': round((job.started - job.submitted) * 1000),
+            'elapsed_ms': round((time.monotonic() - job.started) * 1000),
+        }
+        stats.update(job.result)
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES.get(output_ext, 'application/octet-stream'))
+        self.send_header('Content-Length', str(output_size))
+        self.send_header(STATS_HEADER, json.dumps(stats))
+        self.end_headers()
+        with open(job.output_path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, _CHUNK_SIZE)
+
+
+class CompressionServer(ThreadingHTTPServer):
+    """
+    HTTP front end of a CompressionService.
+
+    Attributes:
+        service (CompressionService): Worker pool running the compressions
+        max_body_bytes (int): Largest accepted upload
+        video_available (bool): Whether FFmpeg is available for video uploads
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, max_workers: int = 4,
+                 memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB, max_requests: int = DEFAULT_MAX_REQUESTS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, max_body_mb: float = DEFAULT_MAX_BODY_MB,
+                 large_image_pixels: int = DEFAULT_LARGE_IMAGE_PIXELS,
+                 max_image_pixels: int = DEFAULT_MAX_IMAGE_PIXELS):
+        """
+        Bind the server and start its worker pool.
+
+        Args:
+            host: Address to listen on (default: localhost only)
+            port: Port to listen on; 0 picks a free one (see server_address)
+            max_workers: Compression threads
+            memory_budget_mb: Estimated decoded memory allowed across running jobs
+            max_requests: Requests handled at once (uploading, queued or running);
+                          more are refused with 503
+            queue_size: Uploads that may wait for a worker; more are refused with 503
+            max_body_mb: Largest upload in MB; larger ones are refused with 413
+            large_image_pixels: See ImageReducer
+            max_image_pixels: See ImageReducer
+        """
+        super().__init__((host, port), _Handler)
+        self.service = CompressionService(max_workers, memory_budget_mb, queue_size)
+        self.request_slots = threading.BoundedSemaphore(max(1, max_requests))
+        self.open_requests = 0
+        self._requests_lock = threading.Lock()
+        self.max_body_bytes = int(max_body_mb * 1024 * 1024)
+        self.large_image_pixels = large_image_pixels
+        self.max_image_pixels = max_image_pixels
+        try:
+            from .video_reducer import check_ffmpeg_installed
+            self.video_available = check_ffmpeg_installed()
+        except ImportError:
+            self.video_available = False
+
+    def count_request(self, delta: int):
+        with self._requests_lock:
+            self.open_requests += delta
+
+    def server_close(self):
+        super().server_close()
+        self.service.close()
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, **kwargs):
+    """
+    Run a CompressionServer until interrupted.
+
+    Args:
+        host: Address to listen on
+        port: Port to listen on
+        **kwargs: Other CompressionServer settings
+    """
+    with CompressionServer(host, port, **kwargs) as server:
+        host, port = server.server_address[:2]
+        logger.info(f"Serving on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
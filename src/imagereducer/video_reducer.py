@@ -3,18 +3,46 @@ Video Reducer Module
 
 Provides video compression functionality using FFmpeg.
 Supports MP4, MOV, and MPEG formats with configurable quality settings.
+Videos can also be streamed through FFmpeg's stdin and stdout, producing
+fragmented MP4 without touching the disk.
 """
 
 import os
 import logging
 import shutil
+import subprocess
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import ffmpeg
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Bytes moved per pipe read or write when streaming
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Fragmented MP4 can be written front to back, so it works on a pipe:
+# the moov box comes first and media follows in self-contained fragments
+FRAGMENTED_MP4_FLAGS = 'frag_keyframe+empty_moov+default_base_moof'
+
+
+def _iter_chunks(source, chunk_size: int):
+    """Yield chunks from bytes-like data, a readable file object or an iterable of chunks."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source).cast('B')
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield from source
+
 
 def check_ffmpeg_installed() -> bool:
     """
@@ -73,6 +101,193 @@ class VideoReducer:
         """
         return os.path.getsize(file_path)
     
+    def _output_stream(
+        self,
+        input_path: str,
+        output_path: str,
+        resolution: Optional[Tuple[int, int]] = None,
+        crf: Optional[int] = None,
+        preset: Optional[str] = None,
+        fragmented: bool = False
+    ):
+        """Build the FFmpeg graph for one compression."""
+        # Use provided or default settings
+        crf_value = crf if crf is not None else self.crf
+        preset_value = preset if preset is not None else self.preset
+        logger.info(f"Settings - CRF: {crf_value}, Preset: {preset_value}")
+        
+        stream = ffmpeg.input(input_path)
+        
+        # Ensure output is MP4 format for compatibility
+        # Extract audio stream to handle transcoding
+        video = stream['v']
+        audio = stream['a']
+        
+        # Apply resolution filter if specified (to the video stream only)
+        if resolution:
+            width, height = resolution
+            logger.info(f"Resizing to: {width}x{height}")
+            video = video.filter('scale', width, height)
+        
+        # Output with compression settings
+        # Use explicit format specification and handle audio properly
+        options = {}
+        if fragmented:
+            options['movflags'] = FRAGMENTED_MP4_FLAGS
+        return ffmpeg.output(
+            video,
+            audio,
+            output_path,
+            vcodec='libx264',
+            crf=crf_value,
+            preset=preset_value,
+            acodec='aac',
+            audio_bitrate='128k',
+            f='mp4',  # Explicitly set output format to MP4
+            **options
+        )
+    
+    def ffmpeg_args(
+        self,
+        input_path: str,
+        output_path: str,
+        resolution: Optional[Tuple[int, int]] = None,
+        crf: Optional[int] = None,
+        preset: Optional[str] = None,
+        fragmented: bool = False
+    ) -> List[str]:
+        """
+        Return the FFmpeg command line compress() runs, for running it elsewhere
+        (e.g. with asyncio.create_subprocess_exec).
+        
+        Args:
+            input_path: Path to input video file
+            output_path: Path to output video file (overwritten)
+            resolution: Optional tuple (width, height) to resize video
+            crf: Override default CRF value
+            preset: Override default preset value
+            fragmented: Write fragmented MP4, which needs no seeking (for pipes)
+            
+        Returns:
+            Argument list, starting with 'ffmpeg'
+        """
+        stream = self._output_stream(input_path, output_path, resolution, crf, preset, fragmented)
+        return stream.compile(overwrite_output=True)
+    
+    def compress_stream(
+        self,
+        source,
+        destination,
+        resolution: Optional[Tuple[int, int]] = None,
+        crf: Optional[int] = None,
+        preset: Optional[str] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> dict:
+        """
+        Compress a video from a stream to a stream, as fragmented MP4.
+        
+        Input is fed to FFmpeg's stdin and output read from its stdout, one
+        chunk at a time, so neither is ever held whole on disk or in memory.
+        Writes block while FFmpeg is busy and FFmpeg blocks while destination
+        is slow, so a fast producer cannot run ahead of the encoder.
+        
+        The input must be readable front to back: MPEG-TS, MKV/WebM, or MP4 and
+        MOV with the moov box first ("faststart"). MP4s with the index at the
+        end need a seekable file; use compress() for those.
+        
+        Args:
+            source: Input as bytes-like data, a readable file object, or an
+                    iterable of byte chunks (e.g. message-queue payloads)
+            destination: Writable file object for the fragmented MP4 output
+            resolution: Optional tuple (width, height) to resize video
+            crf: Override default CRF value
+            preset: Override default preset value
+            chunk_size: Bytes per pipe read and write
+            
+        Returns:
+            Dictionary with compression results including:
+                - success: bool
+                - input_size: int (bytes read from source)
+                - output_size: int (bytes written to destination)
+                - reduction_percent: float
+                - error: str (if failed)
+        """
+        result = {
+            'success': False,
+            'input_size': 0,
+            'output_size': 0,
+            'reduction_percent': 0.0,
+            'error': None
+        }
+        
+        args = self.ffmpeg_args('pipe:0', 'pipe:1', resolution, crf, preset, fragmented=True)
+        try:
+            process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            result['error'] = "FFmpeg not found. Please install FFmpeg and add it to your system PATH. Download from: https://ffmpeg.org/download.html"
+            logger.error(result['error'])
+            return result
+        
+        feed_errors = []
+        stderr_tail = deque(maxlen=20)  # last lines, for the error message
+        
+        def feed():
+            try:
+                for chunk in _iter_chunks(source, chunk_size):
+                    process.stdin.write(chunk)  # blocks while FFmpeg's pipe is full
+                    result['input_size'] += len(chunk)
+            except (BrokenPipeError, ValueError):
+                pass  # FFmpeg exited early; its own error is reported
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+        
+        def drain_stderr():
+            for line in process.stderr:
+                stderr_tail.append(line)
+        
+        feeder = threading.Thread(target=feed, name="ffmpeg-stdin", daemon=True)
+        reader = threading.Thread(target=drain_stderr, name="ffmpeg-stderr", daemon=True)
+        feeder.start()
+        reader.start()
+        try:
+            while True:
+                chunk = process.stdout.read1(chunk_size)
+                if not chunk:
+                    break
+                destination.write(chunk)
+                result['output_size'] += len(chunk)
+            process.wait()
+            feeder.join()
+            reader.join()
+            
+            if feed_errors:
+                result['error'] = f"Could not read input: {feed_errors[0]}"
+            elif process.returncode != 0:
+                message = b''.join(stderr_tail).decode('utf-8', errors='replace').strip()
+                result['error'] = f"FFmpeg error: {message}"
+            else:
+                result['success'] = True
+                if result['input_size'] > 0:
+                    reduction = (result['input_size'] - result['output_size']) / result['input_size'] * 100
+                    result['reduction_percent'] = round(reduction, 2)
+        except Exception as e:
+            result['error'] = f"Unexpected error: {str(e)}"
+        finally:
+            # Never leave FFmpeg running, e.g. when destination.write() failed
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        
+        if result['error']:
+            logger.error(result['error'])
+        return result
+    
     def compress(
         self, 
         input_path: str, 
@@ -128,41 +343,9 @@ class VideoReducer:
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir, exist_ok=True)
             
-            # Use provided or default settings
-            crf_value = crf if crf is not None else self.crf
-            preset_value = preset if preset is not None else self.preset
-            
             # Build FFmpeg stream
             logger.info(f"Compressing video: {input_path}")
-            logger.info(f"Settings - CRF: {crf_value}, Preset: {preset_value}")
-            
-            stream = ffmpeg.input(input_path)
-            
-            # Apply resolution filter if specified
-            if resolution:
-                width, height = resolution
-                logger.info(f"Resizing to: {width}x{height}")
-                stream = stream.filter('scale', width, height)
-            
-            # Ensure output is MP4 format for compatibility
-            # Extract audio stream to handle transcoding
-            video = stream['v']
-            audio = stream['a']
-            
-            # Output with compression settings
-            # Use explicit format specification and handle audio properly
-            output_file = ffmpeg.output(
-                video,
-                audio,
-                output_path,
-                vcodec='libx264',
-                crf=crf_value,
-                preset=preset_value,
-                acodec='aac',
-                audio_bitrate='128k',
-                f='mp4'  # Explicitly set output format to MP4
-            )
-            stream = output_file
+            stream = self._output_stream(input_path, output_path, resolution, crf, preset)
             
             # Run FFmpeg (overwrite output file if exists)
             ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
@@ -0,0 +1,316 @@
+"""
+Watcher Module
+
+Watches a folder tree for new or changed media files and hands them out once
+they have stopped growing. On Linux, inotify reports changes as they happen.
+Elsewhere, an index of directory modification times is polled, so only
+folders whose entries changed are listed again.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Polling cannot see files rewritten in place (their folder's mtime does not
+# change), so the whole tree is listed again this often
+DEFAULT_RESCAN_INTERVAL = 300.0
+
+# inotify constants (linux/inotify.h)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Minimal inotify binding through ctypes (Linux only)."""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._ctypes = ctypes
+        self._dirs: Dict[int, str] = {}
+
+    def add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._dirs[wd] = path
+
+    def read(self, timeout: float):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns:
+            List of (directory, name, mask) tuples
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & _IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            events.append((self._dirs.get(wd), name, mask))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+
+class FolderWatcher:
+    """
+    Reports new or changed files under a folder once they are complete.
+
+    A file counts as complete once its size and modification time have not
+    changed for settle_seconds. Each file is reported again only when its
+    size or modification time changes.
+
+    Attributes:
+        root (Path): Folder being watched
+        extensions (set): Lower-case extensions to report (e.g. {'.jpg', '.mp4'})
+        settle_seconds (float): How long a file must be unchanged
+        uses_inotify (bool): True when inotify is used instead of polling
+    """
+
+    def __init__(
+        self,
+        root,
+        extensions: Iterable[str],
+        exclude: Iterable = (),
+        settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        rescan_interval: float = DEFAULT_RESCAN_INTERVAL,
+        include_existing: bool = False,
+        use_inotify: Optional[bool] = None
+    ):
+        """
+        Index the folder tree.
+
+        Args:
+            root: Folder to watch (recursively)
+            extensions: File extensions to report, including the dot
+            exclude: Folders to ignore, e.g. the output folder inside root
+            settle_seconds: Seconds a file must stay unchanged before it is reported
+            poll_interval: Seconds between checks
+            rescan_interval: Seconds between full listings when polling
+            include_existing: Also report files present at start-up
+            use_inotify: Force (True) or disable (False) inotify; default: use it when available
+        """
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise NotADirectoryError(f"Not a folder: {self.root}")
+        self.extensions = {ext.lower() for ext in extensions}
+        self._exclude = {os.path.abspath(p) for p in exclude}
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self._stop = threading.Event()
+
+        # Last reported (size, mtime_ns) per file, and folder mtimes
+        self._known: Dict[str, Tuple[int, int]] = {}
+        self._dirs: Dict[str, int] = {}
+        # Files waiting to settle: path -> ((size, mtime_ns), unchanged since)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+
+        self._inotify = None
+        if use_inotify or (use_inotify is None and sys.platform.startswith('linux')):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                if use_inotify:
+                    raise
+                logger.info(f"inotify unavailable, polling instead: {e}")
+        self.uses_inotify = self._inotify is not None
+
+        self._scan_tree(str(self.root), report=include_existing)
+        self._last_rescan = time.monotonic()
+
+    def stop(self):
+        """Make changes() return within poll_interval; it then releases inotify."""
+        self._stop.set()
+
+    def close(self):
+        """Stop watching and release the inotify descriptor (not while changes() runs)."""
+        self.stop()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _wanted(self, name: str) -> bool:
+        # Hidden names include our own temporary outputs
+        return not name.startswith('.') and os.path.splitext(name)[1].lower() in self.extensions
+
+    def _add_dir(self, path: str, mtime_ns: int) -> bool:
+        """Register a folder; returns False if it is excluded."""
+        if os.path.abspath(path) in self._exclude:
+            return False
+        if path not in self._dirs and self._inotify is not None:
+            try:
+                self._inotify.add_watch(path)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logger.warning("inotify watch limit reached (fs.inotify.max_user_watches); "
+                                   f"{path} is only seen by periodic rescans")
+                else:
+                    logger.warning(f"Cannot watch {path}: {e}")
+        self._dirs[path] = mtime_ns
+        return True
+
+    def _scan_tree(self, top: str, report: bool = True):
+        """List top and every folder below it, recording or reporting files."""
+        try:
+            top_mtime = os.stat(top).st_mtime_ns
+        except OSError:
+            return
+        if not self._add_dir(top, top_mtime):
+            return
+        stack = [top]
+        while stack:
+            for subfolder in self._scan_dir(stack.pop(), report):
+                stack.append(subfolder)
+
+    def _scan_dir(self, folder: str, report: bool = True):
+        """List one folder; returns new subfolders that still need listing."""
+        new_dirs = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in self._dirs and \
+                                    self._add_dir(entry.path, entry.stat(follow_symlinks=False).st_mtime_ns):
+                                new_dirs.append(entry.path)
+                        elif entry.is_file() and self._wanted(entry.name):
+                            stat = entry.stat()
+                            self._consider(entry.path, (stat.st_size, stat.st_mtime_ns), report)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.debug(f"Cannot list {folder}: {e}")
+            self._dirs.pop(folder, None)
+        return new_dirs
+
+    def _consider(self, path: str, signature: Tuple[int, int], report: bool = True):
+        """Queue a file to settle if it is new or changed since last reported."""
+        if not report:
+            self._known[path] = signature
+        elif self._known.get(path) != signature and path not in self._pending:
+            self._pending[path] = (signature, time.monotonic())
+
+    def _poll(self):
+        """Find changes by polling folder mtimes (fallback when inotify is unavailable)."""
+        if time.monotonic() - self._last_rescan >= self.rescan_interval:
+            self._last_rescan = time.monotonic()
+            for folder in list(self._dirs):
+                self._scan_dir(folder)
+            return
+        for folder, mtime_ns in list(self._dirs.items()):
+            try:
+                current = os.stat(folder).st_mtime_ns
+            except OSError:
+                self._dirs.pop(folder, None)
+                continue
+            if current != mtime_ns:
+                self._dirs[folder] = current
+                for subfolder in self._scan_dir(folder):
+                    self._scan_tree(subfolder)
+
+    def _read_events(self, timeout: float):
+        """Apply inotify events."""
+        for folder, name, mask in self._inotify.read(timeout):
+            if mask & _IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflow, rescanning")
+                for known in list(self._dirs):
+                    self._scan_dir(known)
+                continue
+            if folder is None:
+                continue
+            path = os.path.join(folder, name)
+            if mask & _IN_ISDIR:
+                # Files may already exist in it before the watch was added
+                self._scan_tree(path)
+            elif self._wanted(name):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                self._consider(path, (stat.st_size, stat.st_mtime_ns))
+
+    def _settled(self) -> Iterator[Path]:
+        """Yield pending files that stayed unchanged for settle_seconds."""
+        now = time.monotonic()
+        for path, (signature, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._pending[path]  # deleted or moved away before it settled
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != signature:
+                self._pending[path] = (current, now)  # still being written
+            elif now - since >= self.settle_seconds:
+                del self._pending[path]
+                self._known[path] = current
+                yield Path(path)
+
+    def changes(self) -> Iterator[Path]:
+        """
+        Yield complete new or changed files until stop() is called.
+
+        Blocks between changes. Designed to be consumed as the job source of
+        scheduler.run_jobs(), which keeps a persistent worker pool fed.
+
+        Yields:
+            Paths of files ready to process
+        """
+        try:
+            while not self._stop.is_set():
+                yield from self._settled()
+                if self._stop.is_set():
+                    break
+                # Poll faster while files are settling, so they are not held back
+                timeout = self.poll_interval
+                if self._pending:
+                    timeout = min(timeout, max(self.settle_seconds / 4, 0.05))
+                if self._inotify is not None:
+                    self._read_events(timeout)
+                else:
+                    self._stop.wait(timeout)
+                    self._poll()
+        finally:
+            # Closed here, by the thread using it, never under a blocked select()
+            self.close()
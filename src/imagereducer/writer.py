@@ -0,0 +1,337 @@
+"""
+Writer Module
+
+Collision-free, crash-safe output files. Names are reserved against an
+in-memory index of the output folders, so parallel workers never pick the same
+name and no stat() loop is needed. Every file is written to a temporary name
+in the same folder and renamed into place, so an interrupted run never leaves
+a truncated image behind.
+
+Outputs can be spread over subfolders (mirroring the source tree, or sharded
+by name hash or date) so very large batches never produce one huge folder.
+"""
+
+import os
+import sys
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Directory fsyncs are batched: one per this many files renamed into place
+DEFAULT_FSYNC_BATCH = 32
+
+# Windows and macOS file systems are case-insensitive by default
+_CASE_INSENSITIVE = sys.platform in ('win32', 'darwin')
+
+# Linux ioctl making a copy-on-write clone of a whole file (btrfs, XFS, bcachefs)
+_FICLONE = 0x40049409
+
+# Output layouts:
+#   flat   - every output directly in the output folder
+#   mirror - same subfolders as the source tree
+#   hash   - 256 subfolders per level, from a hash of the file name (00/ .. ff/)
+#   date   - one subfolder per day the source was last modified (2025-10-16/)
+OUTPUT_LAYOUTS = ('flat', 'mirror', 'hash', 'date')
+
+
+def layout_subfolder(layout: str, source=None, source_root=None, shard_levels: int = 1) -> Path:
+    """
+    Return the subfolder (relative to the output folder) for one source file.
+
+    Args:
+        layout: One of OUTPUT_LAYOUTS
+        source: Source file path (required by every layout but 'flat')
+        source_root: Folder the batch was started from ('mirror' layout)
+        shard_levels: Nesting depth of the 'hash' layout
+
+    Returns:
+        Relative path; Path('.') for the output folder itself
+    """
+    if layout == 'flat' or source is None:
+        return Path('.')
+    source = Path(source)
+    if layout == 'mirror':
+        try:
+            return source.parent.relative_to(source_root)
+        except (TypeError, ValueError):
+            return Path('.')
+    if layout == 'hash':
+        digest = hashlib.blake2b(source.stem.encode('utf-8'), digest_size=8).hexdigest()
+        return Path(*(digest[2 * i:2 * i + 2] for i in range(max(1, shard_levels))))
+    if layout == 'date':
+        return Path(datetime.fromtimestamp(os.stat(source).st_mtime).strftime('%Y-%m-%d'))
+    raise ValueError(f"Unsupported output layout '{layout}'. Supported: {OUTPUT_LAYOUTS}")
+
+
+def _fsync_file(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(folder):
+    """Make renames in a folder durable (not possible, nor needed, on Windows)."""
+    if os.name == 'nt':
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def temp_path(path) -> Path:
+    """
+    Return a unique temporary path next to path.
+
+    The temporary file is hidden and keeps the real extension, so tools such
+    as FFmpeg still pick the right container.
+    """
+    path = Path(path)
+    return path.with_name(f".{path.stem}.{uuid.uuid4().hex[:8]}.tmp{path.suffix}")
+
+
+def _reflink(src, dst) -> bool:
+    try:
+        import fcntl
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        return True
+    except (ImportError, OSError):
+        return False
+
+
+def _copy_range(src, dst) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    remaining = os.fstat(src.fileno()).st_size
+    try:
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    except OSError:
+        return False
+    return remaining == 0
+
+
+def copy_file(source, destination) -> str:
+    """
+    Copy a file as cheaply as the file system allows.
+
+    A reflink (copy-on-write clone) shares the data blocks, so it costs no
+    time or space whatever the size. Otherwise copy_file_range() copies
+    inside the kernel (server-side on network shares), and as a last resort
+    the data is copied through user space.
+
+    Args:
+        source: File to copy
+        destination: Path of the copy (replaced if it exists)
+
+    Returns:
+        'reflink' or 'copy'
+    """
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        if _reflink(src, dst):
+            return 'reflink'
+        if _copy_range(src, dst):
+            return 'copy'
+    shutil.copyfile(source, destination)
+    return 'copy'
+
+
+@contextmanager
+def atomic_output(path, fsync: bool = False, sync_folder: bool = True):
+    """
+    Write a file under a temporary name and rename it into place on success.
+
+    Args:
+        path: Final output path
+        fsync: Flush the file to disk before it is renamed into place
+        sync_folder: With fsync, also flush the folder so the rename itself
+                     is durable
+
+    Yields:
+        Temporary path to write to. On an exception it is deleted and the
+        final path is left untouched.
+
+    Example:
+        >>> with atomic_output("out.jpg") as tmp:
+        ...     img.save(tmp, "JPEG")
+    """
+    path = Path(path)
+    tmp = temp_path(path)
+    try:
+        yield tmp
+        if fsync:
+            _fsync_file(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if fsync and sync_folder:
+        _fsync_dir(path.parent)
+
+
+class OutputWriter:
+    """
+    Hands out unique output names and writes files atomically.
+
+    Attributes:
+        folder (Path): Output folder
+        layout (str): One of OUTPUT_LAYOUTS
+        source_root (Path): Folder the sources are mirrored from ('mirror' layout)
+        shard_levels (int): Nesting depth of the 'hash' layout
+        fsync (bool): Flush files to disk before they are renamed into place
+        fsync_batch (int): Renames per directory fsync
+    """
+
+    def __init__(self, folder, fsync: bool = False, fsync_batch: int = DEFAULT_FSYNC_BATCH,
+                 layout: str = 'flat', source_root=None, shard_levels: int = 1):
+        """
+        Create the output folder and index its contents.
+
+        Args:
+            folder: Output folder (created if missing)
+            fsync: Flush every file to disk before renaming it into place. The
+                   folders themselves are flushed once per fsync_batch files
+                   and on close().
+            fsync_batch: Files renamed between folder flushes
+            layout: 'flat', 'mirror', 'hash' or 'date' (see OUTPUT_LAYOUTS)
+            source_root: Folder the batch was started from, for 'mirror'
+            shard_levels: Nesting depth of the 'hash' layout (256 folders per level)
+        """
+        if layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"Unsupported output layout '{layout}'. Supported: {OUTPUT_LAYOUTS}")
+        self.folder = Path(folder)
+        self.layout = layout
+        self.source_root = Path(source_root) if source_root is not None else None
+        self.shard_levels = shard_levels
+        self.fsync = fsync
+        self.fsync_batch = max(1, fsync_batch)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._dirty = set()
+        # Names taken per output folder. Each folder is created and listed once
+        # (one scandir instead of an exists() call per candidate name).
+        self._taken = {}
+        self._index(self.folder)
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return name.casefold() if _CASE_INSENSITIVE else name
+
+    def _index(self, folder: Path) -> set:
+        """Names in folder, creating and listing it on first use. Call with the lock held."""
+        taken = self._taken.get(folder)
+        if taken is None:
+            folder.mkdir(parents=True, exist_ok=True)
+            with os.scandir(folder) as entries:
+                taken = {self._key(entry.name) for entry in entries}
+            self._taken[folder] = taken
+        return taken
+
+    def reserve(self, stem: str, ext: str, source=None) -> Path:
+        """
+        Reserve a free name, adding _1, _2, ... to the stem if needed.
+
+        Thread-safe: concurrent callers always get different names.
+
+        Args:
+            stem: Desired file name without extension
+            ext: Extension including the dot
+            source: Source file, to place the output according to the layout
+
+        Returns:
+            Path of the reserved name
+        """
+        subfolder = layout_subfolder(self.layout, source, self.source_root, self.shard_levels)
+        folder = self.folder / subfolder if subfolder != Path('.') else self.folder
+        with self._lock:
+            taken = self._index(folder)
+            name = f"{stem}{ext}"
+            counter = 1
+            while self._key(name) in taken:
+                name = f"{stem}_{counter}{ext}"
+                counter += 1
+            taken.add(self._key(name))
+        return folder / name
+
+    def claim(self, path) -> Path:
+        """
+        Take a given name, whether or not the file exists yet.
+
+        Used when resuming a batch: files keep the output names recorded by
+        the interrupted run, and reserve() no longer hands those names out.
+
+        Args:
+            path: Output path, inside the output folder
+
+        Returns:
+            The path
+        """
+        path = Path(path)
+        with self._lock:
+            self._index(path.parent).add(self._key(path.name))
+        return path
+
+    def release(self, path):
+        """Return a reserved name that was never written."""
+        path = Path(path)
+        with self._lock:
+            taken = self._taken.get(path.parent)
+            if taken is not None:
+                taken.discard(self._key(path.name))
+
+    @contextmanager
+    def atomic(self, path):
+        """
+        Write one output atomically; see atomic_output().
+
+        Yields:
+            Temporary path in the output folder to write to
+        """
+        with atomic_output(path, self.fsync, sync_folder=False) as tmp:
+            yield tmp
+        if self.fsync:
+            with self._lock:
+                self._pending += 1
+                self._dirty.add(Path(path).parent)
+                flush = None
+                if self._pending >= self.fsync_batch:
+                    flush, self._dirty, self._pending = self._dirty, set(), 0
+            for folder in flush or ():
+                _fsync_dir(folder)
+
+    def write_bytes(self, path, data: bytes):
+        """Atomically write an encoded file."""
+        with self.atomic(path) as tmp:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+
+    def close(self):
+        """Flush outstanding renames to disk (only when fsync is enabled)."""
+        with self._lock:
+            dirty, self._dirty, self._pending = self._dirty, set(), 0
+        for folder in dirty:
+            _fsync_dir(folder)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -9,6 +9,7 @@ Usage:
     python main.py                                    # Launch GUI application
     python main.py --help                             # Show help information
     python main.py --video INPUT [OPTIONS]            # Compress video via CLI
+    python main.py --image INPUT [OPTIONS]            # Compress image via CLI
     
 Video Compression Options:
     --video INPUT                                     # Input video file
@@ -16,12 +17,43 @@ Video Compression Options:
     --crf CRF                                        # Quality (0-51, default 28, lower=better)
     --preset PRESET                                  # Speed preset (default 'medium')
     --resolution WIDTHxHEIGHT                        # Resize video (e.g., 1280x720)
+
+Image Compression Options:
+    --image INPUT                                     # Input image file
+    --output OUTPUT                                   # Output file or directory
+    --format FORMAT                                   # auto, jpeg, png, webp or avif (default auto)
+    --target-size MB                                  # Target file size (default 1.0)
+    --quality QUALITY                                 # Initial quality (default 85)
+    --max-width PIXELS                                # Maximum width/height (default 1920)
+    --preserve-transparency                           # Keep PNG alpha (PNG, WebP, AVIF output)
+    --widths W1,W2,...                                # Responsive renditions from one decode (e.g., 480,960,1920)
+    --formats F1,F2,...                               # Rendition formats (default: --format)
+
+Archive Options:
+    --archive ARCHIVE                                 # Compress the images in a .zip or .tar(.gz) archive
+    --output OUTPUT                                   # Output .zip or .tar (default ARCHIVE_reduced.zip)
+    (image options above apply)
+
+Watch Folder Options:
+    --watch DIR                                       # Compress new and changed files in DIR until Ctrl+C
+    --output OUTPUT                                   # Output folder (default DIR/Reduced)
+    --settle SECONDS                                  # Wait until files stop growing (default 2)
+    --include-existing                                # Also compress files already in DIR at start
+    --resume                                          # Continue an interrupted run: compress the files in DIR
+                                                      # not already done, then keep watching
+    (image and video options above apply)
+
+Server Options:
+    --serve                                           # Run the HTTP compression service ([Server] in config.ini)
+    --host HOST                                       # Address to listen on (default 127.0.0.1)
+    --port PORT                                       # Port to listen on (default 8765)
 """
 
 import sys
 import os
 import argparse
 import logging
+import threading
 from pathlib import Path
 
 # Add src to path if running from project root
@@ -102,6 +134,399 @@ def compress_video_cli(args):
         return 1
 
 
+def compress_image_cli(args):
+    """Handle image compression from CLI arguments"""
+    try:
+        from imagereducer.image_reducer import ImageReducer
+        
+        input_path = Path(args.image)
+        
+        try:
+            reducer = ImageReducer(
+                quality=args.quality,
+                max_width=args.max_width,
+                max_size_mb=args.target_size,
+                preserve_transparency=args.preserve_transparency,
+                output_format=args.format,
+                keep_metadata=args.keep_metadata,
+                progressive=args.progressive,
+                subsampling=args.subsampling
+            )
+        except ValueError as e:
+            logger.error(str(e))
+            return 1
+        
+        # Output extension depends on the format and on whether alpha is kept
+        preserve_alpha = False
+        if args.preserve_transparency and input_path.suffix.lower() == '.png' and input_path.exists():
+            preserve_alpha = reducer.has_alpha(str(input_path))
+        
+        if args.widths:
+            return renditions_cli(args, reducer, input_path, preserve_alpha)
+        
+        output_ext = reducer.output_extension(preserve_alpha)
+        
+        # Determine output path
+        if args.output:
+            output_file = args.output
+            # If output is a directory, create output filename
+            if os.path.isdir(output_file):
+                output_file = os.path.join(output_file, f"{input_path.stem}_compressed{output_ext}")
+        else:
+            # Default: add _compressed to filename
+            output_file = str(input_path.parent / f"{input_path.stem}_compressed{output_ext}")
+        
+        logger.info(f"Compressing: {input_path}")
+        logger.info(f"Output: {output_file}")
+        
+        result = reducer.compress(str(input_path), output_file)
+        
+        if result['success']:
+            width, height = result['dimensions']
+            print("\n✅ Image compression successful!")
+            print(f"Input size:  {result['input_size'] / (1024*1024):.2f} MB")
+            print(f"Output size: {result['output_size'] / (1024*1024):.2f} MB")
+            print(f"Reduction:   {result['reduction_percent']:.2f}%")
+            print(f"Dimensions:  {width}x{height}, quality {result['quality']}")
+            print(f"Output file: {output_file}")
+            return 0
+        else:
+            print(f"\n❌ Image compression failed: {result['error']}")
+            return 1
+            
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return 1
+
+
+def renditions_cli(args, reducer, input_path, preserve_alpha):
+    """Write responsive renditions of one image from CLI arguments"""
+    try:
+        widths = [int(w) for w in args.widths.split(',') if w.strip()]
+    except ValueError:
+        logger.error("Invalid widths. Use comma-separated pixels (e.g., 480,960,1920)")
+        return 1
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()] if args.formats else None
+    output_dir = Path(args.output) if args.output else input_path.parent / f"{input_path.stem}_renditions"
+    
+    try:
+        manifest = reducer.renditions(input_path, output_dir, widths, formats, preserve_alpha)
+    except Exception as e:
+        print(f"\n❌ Renditions failed: {e}")
+        return 1
+    
+    print(f"\n✅ Created {len(manifest['renditions'])} rendition(s) of {input_path.name}")
+    for rendition in manifest['renditions']:
+        print(f"   {rendition['file']:<40} {rendition['width']}x{rendition['height']}  "
+              f"{rendition['bytes'] / 1024:.0f} KB")
+    print(f"Manifest: {output_dir / (input_path.stem + '_manifest.json')}")
+    return 0
+
+
+def archive_cli(args):
+    """Compress the images in an archive into a new archive, without extracting it"""
+    from imagereducer.archive import compress_archive
+    from imagereducer.config import load_config
+    from imagereducer.image_reducer import ImageReducer, DEFAULT_LARGE_IMAGE_PIXELS, DEFAULT_MAX_IMAGE_PIXELS
+    from imagereducer.scheduler import MemoryBudget, DEFAULT_MEMORY_BUDGET_MB
+    
+    input_path = Path(args.archive)
+    if not input_path.is_file():
+        logger.error(f"Archive not found: {input_path}")
+        return 1
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        base = input_path.name
+        for suffix in ('.tar.gz', '.tar.bz2', '.tar.xz'):
+            if base.lower().endswith(suffix):
+                base = base[:-len(suffix)]
+                break
+        else:
+            base = input_path.stem
+        output_path = input_path.with_name(f"{base}_reduced.zip")
+    
+    config = load_config()
+    try:
+        reducer = ImageReducer(
+            quality=args.quality,
+            max_width=args.max_width,
+            max_size_mb=args.target_size,
+            preserve_transparency=args.preserve_transparency,
+            output_format=args.format,
+            keep_metadata=args.keep_metadata,
+            progressive=args.progressive,
+            subsampling=args.subsampling,
+            large_image_pixels=config.getint('Advanced', 'LargeImagePixels', fallback=DEFAULT_LARGE_IMAGE_PIXELS),
+            max_image_pixels=config.getint('Advanced', 'MaxImagePixels', fallback=DEFAULT_MAX_IMAGE_PIXELS)
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    
+    def report(name, result):
+        if result['success']:
+            print(f"✅ {name}: {result['input_size'] / 1024:.0f} KB → {result['output_size'] / 1024:.0f} KB")
+        else:
+            print(f"❌ {name}: {result['error']}")
+    
+    print(f"📦 {input_path} → {output_path}")
+    summary = compress_archive(
+        input_path,
+        output_path,
+        reducer,
+        max_workers=max(1, config.getint('Advanced', 'MaxThreads', fallback=4)),
+        budget=MemoryBudget(config.getint('Advanced', 'MemoryBudgetMB', fallback=DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024),
+        on_result=report
+    )
+    if not summary['success']:
+        print(f"\n❌ {summary['error']}")
+        return 1
+    
+    saved_mb = (summary['input_size'] - summary['output_size']) / (1024 * 1024)
+    print(f"\n✅ Compressed {summary['processed']} image(s), saved {saved_mb:.2f} MB")
+    if summary['copied']:
+        print(f"📄 Copied unchanged: {summary['copied']} (other files, and images that failed)")
+    if summary['failed']:
+        print(f"❌ Failed: {len(summary['failed'])}")
+    print(f"Output archive: {output_path}")
+    return 0 if not summary['failed'] else 1
+
+
+def watch_cli(args):
+    """Compress new and changed files in a folder as they arrive, until Ctrl+C"""
+    from imagereducer.config import load_config
+    from imagereducer.image_reducer import ImageReducer, DEFAULT_LARGE_IMAGE_PIXELS, DEFAULT_MAX_IMAGE_PIXELS
+    from imagereducer.journal import BatchJournal, JOURNAL_FILENAME
+    from imagereducer.ratecache import RateCache, RATE_CACHE_FILENAME
+    from imagereducer.scheduler import MemoryBudget, run_jobs, DEFAULT_MEMORY_BUDGET_MB
+    from imagereducer.watcher import FolderWatcher
+    from imagereducer.writer import OutputWriter
+    
+    root = Path(args.watch)
+    if not root.is_dir():
+        logger.error(f"Not a folder: {root}")
+        return 1
+    output_folder = Path(args.output) if args.output else root / 'Reduced'
+    
+    config = load_config()
+    if config.getboolean('Advanced', 'MultiThreading', fallback=True):
+        max_threads = max(1, config.getint('Advanced', 'MaxThreads', fallback=4))
+    else:
+        max_threads = 1
+    
+    # Sizes measured by earlier runs into this folder shorten the JPEG search
+    rate_cache = None
+    if config.getboolean('Advanced', 'RateCache', fallback=True):
+        rate_cache = RateCache(output_folder / RATE_CACHE_FILENAME)
+    
+    try:
+        reducer = ImageReducer(
+            quality=args.quality,
+            max_width=args.max_width,
+            max_size_mb=args.target_size,
+            preserve_transparency=args.preserve_transparency,
+            output_format=args.format,
+            keep_metadata=args.keep_metadata,
+            progressive=args.progressive,
+            subsampling=args.subsampling,
+            large_image_pixels=config.getint('Advanced', 'LargeImagePixels', fallback=DEFAULT_LARGE_IMAGE_PIXELS),
+            max_image_pixels=config.getint('Advanced', 'MaxImagePixels', fallback=DEFAULT_MAX_IMAGE_PIXELS),
+            rate_cache=rate_cache
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        if rate_cache is not None:
+            rate_cache.close()
+        return 1
+    
+    # Videos are watched too when FFmpeg is available
+    video_reducer = None
+    video_extensions = {'.mp4', '.mov', '.mpeg', '.avi', '.mkv'}
+    try:
+        from imagereducer.video_reducer import VideoReducer, check_ffmpeg_installed
+        if check_ffmpeg_installed():
+            video_reducer = VideoReducer(crf=args.crf, preset=args.preset)
+    except ImportError:
+        pass
+    if video_reducer is None:
+        logger.info("FFmpeg not available, watching images only")
+        video_extensions = set()
+    
+    watcher = FolderWatcher(
+        root,
+        set(reducer.supported_formats) | video_extensions,
+        exclude=[output_folder],
+        settle_seconds=args.settle,
+        include_existing=args.include_existing or args.resume
+    )
+    writer = OutputWriter(
+        output_folder,
+        fsync=config.getboolean('Advanced', 'FsyncOutputs', fallback=False),
+        layout='mirror',
+        source_root=root
+    )
+    # A changed file replaces its earlier output instead of getting a new name
+    outputs = {}
+    # Only one job runs per file: a file that changes again while it is being
+    # compressed is compressed once more by that job, not by a second worker
+    outputs_lock = threading.Lock()
+    running = set()
+    changed_again = set()
+    
+    # The journal records every file's output and progress; --resume skips
+    # files completed by an earlier run and reuses the output names it chose
+    journal = BatchJournal(output_folder / JOURNAL_FILENAME, resume=args.resume)
+    if args.resume:
+        for source, output in journal.outputs().items():
+            outputs[source] = writer.claim(output)
+    
+    def unfinished(paths):
+        for path in paths:
+            if args.resume and journal.is_complete(path):
+                continue
+            yield path
+    
+    def compress(path):
+        is_video = path.suffix.lower() in video_extensions
+        preserve_alpha = (
+            not is_video and args.preserve_transparency
+            and path.suffix.lower() == '.png' and reducer.has_alpha(path)
+        )
+        ext = ".mp4" if is_video else reducer.output_extension(preserve_alpha)
+        key = os.path.abspath(path)
+        with outputs_lock:
+            previous = output_path = outputs.get(key)
+            if output_path is None or output_path.suffix != ext:
+                stem = f"{path.stem}_compressed" if is_video else path.stem
+                output_path = writer.reserve(stem, ext, source=path)
+        journal.plan([(path, output_path)])
+        journal.start(path)
+        
+        try:
+            with writer.atomic(output_path) as temp_output:
+                if is_video:
+                    result = video_reducer.compress(str(path), str(temp_output))
+                    if not result['success']:
+                        raise RuntimeError(result['error'])
+                else:
+                    reducer.reduce(path, temp_output, preserve_alpha)
+        except BaseException:
+            if output_path != previous:
+                writer.release(output_path)
+            raise
+        if previous is not None and previous != output_path:
+            # The extension changed (e.g. transparency was added): the old
+            # output would be left behind
+            try:
+                previous.unlink()
+            except OSError:
+                pass
+            writer.release(previous)
+        with outputs_lock:
+            outputs[key] = output_path
+        return output_path
+    
+    def process(path):
+        key = os.path.abspath(path)
+        with outputs_lock:
+            if key in running:
+                changed_again.add(key)
+                return None  # the running job compresses it again
+            running.add(key)
+        while True:
+            try:
+                output_path, error = compress(path), None
+            except Exception as e:
+                output_path, error = None, e
+            with outputs_lock:
+                if key not in changed_again:
+                    running.discard(key)
+                    if error is not None:
+                        raise error
+                    return output_path
+                changed_again.discard(key)
+    
+    def estimate(path):
+        return 0 if path.suffix.lower() in video_extensions else reducer.estimate_memory(path)
+    
+    mode = "inotify" if watcher.uses_inotify else "polling"
+    print(f"👀 Watching {root} ({mode}), output: {output_folder}")
+    print("   Press Ctrl+C to stop.")
+    
+    # One persistent pool: workers pull files from the watcher as they settle
+    completed = run_jobs(
+        unfinished(watcher.changes()),
+        process,
+        max_workers=max_threads,
+        budget=MemoryBudget(config.getint('Advanced', 'MemoryBudgetMB', fallback=DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024),
+        estimate=estimate
+    )
+    try:
+        for path, output_path, error in completed:
+            if error is not None:
+                journal.fail(path, error)
+                print(f"❌ {path.name}: {error}")
+                continue
+            if output_path is None:
+                continue  # handed to the job already running for this file
+            journal.finish(path)
+            original_size_mb = os.path.getsize(path) / (1024 * 1024)
+            final_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+            print(f"✅ {path.name}: {original_size_mb:.2f} MB → {final_size_mb:.2f} MB ({output_path.relative_to(output_folder)})")
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        watcher.stop()
+        completed.close()
+        writer.close()
+        journal.close()
+        if rate_cache is not None:
+            rate_cache.close()
+    return 0
+
+
+def serve_cli(args):
+    """Run the HTTP compression service until Ctrl+C"""
+    from imagereducer.config import load_config
+    from imagereducer.image_reducer import DEFAULT_LARGE_IMAGE_PIXELS, DEFAULT_MAX_IMAGE_PIXELS
+    from imagereducer.scheduler import DEFAULT_MEMORY_BUDGET_MB
+    from imagereducer.server import (
+        CompressionServer, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MAX_REQUESTS, DEFAULT_QUEUE_SIZE, DEFAULT_MAX_BODY_MB
+    )
+    
+    config = load_config()
+    host = args.host or config.get('Server', 'Host', fallback=DEFAULT_HOST)
+    port = args.port if args.port is not None else config.getint('Server', 'Port', fallback=DEFAULT_PORT)
+    try:
+        server = CompressionServer(
+            host,
+            port,
+            max_workers=max(1, config.getint('Advanced', 'MaxThreads', fallback=4)),
+            memory_budget_mb=config.getint('Advanced', 'MemoryBudgetMB', fallback=DEFAULT_MEMORY_BUDGET_MB),
+            max_requests=config.getint('Server', 'MaxConcurrentRequests', fallback=DEFAULT_MAX_REQUESTS),
+            queue_size=config.getint('Server', 'QueueSize', fallback=DEFAULT_QUEUE_SIZE),
+            max_body_mb=config.getfloat('Server', 'MaxBodyMB', fallback=DEFAULT_MAX_BODY_MB),
+            large_image_pixels=config.getint('Advanced', 'LargeImagePixels', fallback=DEFAULT_LARGE_IMAGE_PIXELS),
+            max_image_pixels=config.getint('Advanced', 'MaxImagePixels', fallback=DEFAULT_MAX_IMAGE_PIXELS)
+        )
+    except OSError as e:
+        logger.error(f"Cannot listen on {host}:{port}: {e}")
+        return 1
+    
+    host, port = server.server_address[:2]
+    print(f"🌐 Serving on http://{host}:{port}")
+    print("   POST /compress?format=webp&quality=80 with the file as body, GET /health")
+    print("   Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        server.server_close()
+    return 0
+
+
 def main():
     """Main entry point for the application"""
     
@@ -122,6 +547,25 @@ Examples:
   
   # Resize and compress
   python main.py --video sample.mpeg --resolution 1280x720 --output output.mp4
+  
+  # Compress an image to WebP under 500 KB
+  python main.py --image photo.jpg --format webp --target-size 0.5
+  
+  # Responsive renditions for a CDN, decoded once
+  python main.py --image photo.jpg --widths 480,960,1920 --formats webp,jpeg --output cdn/
+  
+  # Compress the photos in a ZIP into a new ZIP, without unpacking
+  python main.py --archive photos.zip --output photos_small.zip
+  
+  # Compress everything dropped into a hot folder
+  python main.py --watch incoming/ --output compressed/ --format webp
+  
+  # Continue after a crash or reboot, skipping files already compressed
+  python main.py --watch incoming/ --output compressed/ --format webp --resume
+  
+  # Compression service for other programs on this machine
+  python main.py --serve --port 8765
+  curl --data-binary @photo.jpg "http://127.0.0.1:8765/compress?format=webp" -o photo.webp
 """
     )
     
@@ -134,6 +578,39 @@ Examples:
                                'medium', 'slow', 'slower', 'veryslow'],
                        help='Encoding speed preset (default=medium)')
     parser.add_argument('--resolution', type=str, help='Resize video (e.g., 1280x720)')
+    parser.add_argument('--image', type=str, help='Image file to compress')
+    parser.add_argument('--format', type=str, default='auto',
+                       choices=['auto', 'jpeg', 'png', 'webp', 'avif'],
+                       help='Image output format (default=auto: JPEG, or PNG when keeping transparency)')
+    parser.add_argument('--target-size', type=float, default=1.0, help='Target image size in MB (default=1.0)')
+    parser.add_argument('--quality', type=int, default=85, help='Initial image quality (60-95, default=85)')
+    parser.add_argument('--max-width', type=int, default=1920, help='Maximum image width/height in pixels (default=1920)')
+    parser.add_argument('--preserve-transparency', action='store_true',
+                       help='Keep PNG transparency (PNG, WebP or AVIF output)')
+    parser.add_argument('--keep-metadata', action='store_true',
+                        help='Copy EXIF and XMP metadata to the output image')
+    parser.add_argument('--progressive', action='store_true',
+                        help='Write progressive JPEGs (a few percent smaller, load in full sooner)')
+    parser.add_argument('--subsampling', type=str, default='auto',
+                        choices=['auto', '4:4:4', '4:2:2', '4:2:0'],
+                        help='JPEG chroma subsampling (default=auto: 4:4:4 for graphics, 4:2:0 for photos)')
+    parser.add_argument('--widths', type=str,
+                       help='Comma-separated rendition widths, e.g. 480,960,1920 (decodes the image once)')
+    parser.add_argument('--formats', type=str,
+                       help='Comma-separated rendition formats, e.g. webp,jpeg (default: --format)')
+    parser.add_argument('--archive', type=str,
+                       help='ZIP or TAR archive of images to compress into a new archive')
+    parser.add_argument('--watch', type=str, metavar='DIR',
+                       help='Watch a folder and compress new or changed files as they arrive')
+    parser.add_argument('--settle', type=float, default=2.0, metavar='SECONDS',
+                       help='Seconds a watched file must stop growing before it is compressed (default=2)')
+    parser.add_argument('--include-existing', action='store_true',
+                       help='With --watch, also compress files already in the folder')
+    parser.add_argument('--resume', action='store_true',
+                       help='With --watch, continue an interrupted run: compress the files not already done')
+    parser.add_argument('--serve', action='store_true', help='Run the HTTP compression service')
+    parser.add_argument('--host', type=str, help='Address for --serve to listen on (default=127.0.0.1)')
+    parser.add_argument('--port', type=int, help='Port for --serve to listen on (default=8765)')
     
     args = parser.parse_args()
     
@@ -150,6 +627,22 @@ Examples:
     if args.video:
         return compress_video_cli(args)
     
+    # Handle archives
+    if args.archive:
+        return archive_cli(args)
+    
+    # Handle HTTP service
+    if args.serve:
+        return serve_cli(args)
+    
+    # Handle watch folder
+    if args.watch:
+        return watch_cli(args)
+    
+    # Handle image compression
+    if args.image:
+        return compress_image_cli(args)
+    
     # Default: Launch GUI
     try:
         from image_compressor_gui import main as gui_main
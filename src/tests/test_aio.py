@@ -0,0 +1,176 @@
+"""
+Unit tests for aio module
+
+Tests the asyncio API: executor offloading, concurrent batches and cancellation.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import pytest
+from pathlib import Path
+from PIL import Image
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer import aio, image_reducer
+
+try:
+    from imagereducer.video_reducer import VideoReducer
+    VIDEO_AVAILABLE = True
+except ImportError:
+    VIDEO_AVAILABLE = False
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """Create a handful of test photos"""
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"photo{i}.jpg"
+        Image.radial_gradient('L').resize((1600 + i, 1200)).convert('RGB').save(path, quality=95)
+        paths.append(path)
+    return paths
+
+
+async def collect(iterator):
+    return [result async for result in iterator]
+
+
+class TestCompressImage:
+    """Test cases for aio.compress_image"""
+
+    def test_runs_off_the_loop(self, tmp_path, photos):
+        """Test that the event loop keeps running while an image is compressed"""
+        output = tmp_path / "out" / "photo.jpg"
+
+        async def main():
+            ticks = 0
+            task = asyncio.ensure_future(aio.compress_image(photos[0], output, max_width=800))
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.001)
+            return await task, ticks
+
+        result, ticks = asyncio.run(main())
+        assert result['success'] is True
+        assert result['dimensions'] == (800, 600)
+        assert output.exists()
+        assert ticks > 1
+
+    def test_bytes(self, photos):
+        """Test that in-memory images can be compressed from async code"""
+        result = asyncio.run(aio.compress_bytes(photos[0].read_bytes(), output_format='webp', max_width=400))
+        assert result['success'] is True
+        assert result['data'][8:12] == b"WEBP"
+
+
+class TestCompressMany:
+    """Test cases for aio.compress_many"""
+
+    def test_all_results_and_concurrency_limit(self, tmp_path, photos, monkeypatch):
+        """Test that every file is reported and no more than max_concurrency run at once"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+        original = image_reducer.compress_image
+
+        def tracked(*args, **kwargs):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            try:
+                time.sleep(0.05)
+                return original(*args, **kwargs)
+            finally:
+                with lock:
+                    running.pop()
+
+        monkeypatch.setattr(image_reducer, 'compress_image', tracked)
+        files = [(p, tmp_path / "out" / f"{p.stem}.webp") for p in photos]
+        results = asyncio.run(collect(aio.compress_many(files, max_concurrency=2,
+                                                        image_options={'output_format': 'webp'})))
+        assert sorted(r['input_path'] for r in results) == sorted(str(p) for p in photos)
+        assert all(r['success'] for r in results)
+        assert max(peak) == 2
+
+    def test_queued_work_cancelled(self):
+        """Test that closing the batch cancels image work that has not started"""
+        executor = aio._TrackingExecutor(max_workers=1)
+        release = threading.Event()
+        running = executor.submit(release.wait)
+        queued = executor.submit(time.sleep, 0)
+        executor.cancel_queued()
+        release.set()
+        executor.shutdown(wait=True)
+        assert queued.cancelled()
+        assert running.result() is True
+
+    def test_inputs_consumed_lazily(self, tmp_path, photos):
+        """Test that breaking out early stops taking new files"""
+        taken = []
+
+        def files():
+            for p in photos:
+                taken.append(p)
+                yield p, tmp_path / "out" / p.name
+
+        async def main():
+            async for _ in aio.compress_many(files(), max_concurrency=2):
+                break
+
+        asyncio.run(main())
+        assert len(taken) <= 3
+
+
+@pytest.mark.skipif(not VIDEO_AVAILABLE, reason="ffmpeg-python not installed")
+class TestCompressVideo:
+    """Test cases for aio.compress_video subprocess handling"""
+
+    def test_cancel_kills_ffmpeg(self, tmp_path, monkeypatch):
+        """Test that cancelling stops the subprocess and leaves no output"""
+        source = tmp_path / "clip.mp4"
+        source.write_bytes(b"video")
+        pid_file = tmp_path / "pid"
+        script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(30)"
+        monkeypatch.setattr(VideoReducer, 'ffmpeg_args', lambda self, *a, **k: [sys.executable, '-c', script])
+
+        async def main():
+            task = asyncio.ensure_future(aio.compress_video(source, tmp_path / "out.mp4"))
+            while not pid_file.exists() or not pid_file.read_text():
+                await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        started = time.monotonic()
+        asyncio.run(main())
+        assert time.monotonic() - started < 20
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_file.read_text()), 0)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["clip.mp4", "pid"]
+
+    def test_failure_reported(self, tmp_path, monkeypatch):
+        """Test that a failing FFmpeg run returns an error result"""
+        source = tmp_path / "clip.mov"
+        source.write_bytes(b"video")
+        script = "import sys; sys.stderr.write('Invalid data'); sys.exit(1)"
+        monkeypatch.setattr(VideoReducer, 'ffmpeg_args', lambda self, *a, **k: [sys.executable, '-c', script])
+        result = asyncio.run(aio.compress_video(source, tmp_path / "out.mp4"))
+        assert result['success'] is False
+        assert 'Invalid data' in result['error']
+        assert not (tmp_path / "out.mp4").exists()
+
+    def test_missing_input(self, tmp_path):
+        """Test that a missing input is reported without starting FFmpeg"""
+        result = asyncio.run(aio.compress_video(tmp_path / "missing.mp4", tmp_path / "out.mp4"))
+        assert result['success'] is False
+        assert 'not found' in result['error']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
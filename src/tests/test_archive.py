@@ -0,0 +1,139 @@
+"""
+Unit tests for archive module
+
+Tests compressing images from ZIP and TAR archives into new archives.
+"""
+
+import io
+import sys
+import tarfile
+import zipfile
+import pytest
+from pathlib import Path
+from PIL import Image
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.archive import compress_archive, is_archive
+from imagereducer.image_reducer import ImageReducer
+from imagereducer.scheduler import MemoryBudget
+
+
+def image_bytes(fmt='JPEG', size=(2400, 1600), transparent=False):
+    buffer = io.BytesIO()
+    img = Image.radial_gradient('L').resize(size).convert('RGB')
+    if transparent:
+        img.putalpha(128)
+    img.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+MEMBERS = {
+    'trip/day1.jpg': image_bytes(),
+    'trip/day2.JPG': image_bytes(size=(1000, 800)),
+    'trip/logo.png': image_bytes('PNG', (600, 400), transparent=True),
+    'trip/notes.txt': b"not an image",
+    '__MACOSX/trip/._day1.jpg': b"finder metadata",
+    'broken.jpg': b"truncated",
+}
+
+
+@pytest.fixture
+def photo_zip(tmp_path):
+    """Create a deflated ZIP of photos, non-images and a broken image"""
+    path = tmp_path / "photos.zip"
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+    return path
+
+
+@pytest.fixture
+def photo_tgz(tmp_path):
+    """Create a gzipped TAR with the same members"""
+    path = tmp_path / "photos.tar.gz"
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+class TestCompressArchive:
+    """Test cases for compress_archive"""
+
+    def test_zip_to_zip(self, photo_zip, tmp_path):
+        """Test that images are compressed into a stored ZIP, keeping their folders"""
+        output = tmp_path / "out.zip"
+        summary = compress_archive(photo_zip, output, ImageReducer(max_width=800), max_workers=3)
+        assert summary['success'] is True
+        assert summary['processed'] == 3
+        assert summary['copied'] == 3
+        assert [name for name, _ in summary['failed']] == ['broken.jpg']
+        assert summary['output_size'] < summary['input_size']
+
+        with zipfile.ZipFile(output) as archive:
+            infos = {info.filename: info for info in archive.infolist()}
+            assert set(infos) == {'trip/day1.jpg', 'trip/day2.jpg', 'trip/logo.jpg', 'trip/notes.txt',
+                                  '__MACOSX/trip/._day1.jpg', 'broken.jpg'}
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in infos.values())
+            with Image.open(archive.open('trip/day1.jpg')) as img:
+                assert img.size == (800, 533)
+        assert list(tmp_path.glob(".*")) == []  # no temporary files left
+
+    def test_tar_to_tar(self, photo_tgz, tmp_path):
+        """Test that a compressed TAR is read sequentially and written as TAR"""
+        output = tmp_path / "out.tar"
+        reducer = ImageReducer(output_format='webp', preserve_transparency=True)
+        summary = compress_archive(photo_tgz, output, reducer, budget=MemoryBudget(256 * 1024 * 1024))
+        assert summary['processed'] == 3
+        with tarfile.open(output) as archive:
+            assert sorted(archive.getnames()) == ['__MACOSX/trip/._day1.jpg', 'broken.jpg', 'trip/day1.webp',
+                                                  'trip/day2.webp', 'trip/logo.webp', 'trip/notes.txt']
+            with Image.open(archive.extractfile('trip/logo.webp')) as img:
+                assert img.mode == 'RGBA'
+
+    def test_other_members_copied_unchanged(self, photo_zip, tmp_path):
+        """Test that non-images and images that fail are kept byte for byte"""
+        output = tmp_path / "out.zip"
+        compress_archive(photo_zip, output, ImageReducer())
+        with zipfile.ZipFile(output) as archive:
+            for name in ('trip/notes.txt', '__MACOSX/trip/._day1.jpg', 'broken.jpg'):
+                assert archive.read(name) == MEMBERS[name]
+
+    def test_cancel_writes_nothing(self, photo_zip, tmp_path):
+        """Test that a cancelled run leaves no partial archive behind"""
+        output = tmp_path / "out.zip"
+        output.write_bytes(b"earlier output")
+        summary = compress_archive(photo_zip, output, ImageReducer(), max_workers=1, should_stop=lambda: True)
+        assert summary['success'] is False
+        assert summary['cancelled'] is True
+        assert output.read_bytes() == b"earlier output"
+        assert list(tmp_path.glob(".*")) == []
+
+    def test_name_collisions(self, tmp_path):
+        """Test that members mapping to the same output name are kept apart"""
+        source = tmp_path / "in.zip"
+        with zipfile.ZipFile(source, 'w') as archive:
+            archive.writestr('a.jpg', image_bytes(size=(100, 100)))
+            archive.writestr('a.png', image_bytes('PNG', (100, 100)))
+        compress_archive(source, tmp_path / "out.zip", ImageReducer())
+        with zipfile.ZipFile(tmp_path / "out.zip") as archive:
+            assert sorted(archive.namelist()) == ['a.jpg', 'a_1.jpg']
+
+    def test_rejects_unknown_formats(self, photo_zip, tmp_path):
+        """Test that unsupported input or output archive types are reported"""
+        assert is_archive("x.tar.xz") and not is_archive("x.rar")
+        assert compress_archive(photo_zip, tmp_path / "out.7z", ImageReducer())['success'] is False
+        bad = tmp_path / "bad.zip"
+        bad.write_bytes(b"not a zip")
+        summary = compress_archive(bad, tmp_path / "out.zip", ImageReducer())
+        assert summary['success'] is False
+        assert not (tmp_path / "out.zip").exists()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
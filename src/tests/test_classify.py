@@ -0,0 +1,91 @@
+"""
+Unit tests for classify module
+
+Tests telling photos from graphics, alpha and grayscale detection, and the
+decision summaries.
+"""
+
+import sys
+import pytest
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.classify import classify_image, describe_content, describe_encoding
+
+
+def _photo(size=(900, 600)):
+    """Noise in every channel, like a detailed photo"""
+    noise = [Image.effect_noise(size, 64) for _ in range(3)]
+    return Image.merge('RGB', (noise[0], noise[1].transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise[2]))
+
+
+def _graphic(size=(900, 600)):
+    """Flat coloured shapes on white, like a chart or logo"""
+    img = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(img)
+    for i in range(10):
+        draw.rectangle([i * 60, i * 40, i * 60 + 150, i * 40 + 80], fill=(i * 25, 120, 255 - i * 20))
+    return img
+
+
+class TestClassifyImage:
+    """Test content measurements"""
+
+    def test_photo(self):
+        """Detailed images with many colours are photos"""
+        content = classify_image(_photo())
+        assert content['kind'] == 'photo'
+        assert content['colors'] is None
+        assert content['entropy'] > 6
+        assert not content['grayscale']
+
+    def test_graphic(self):
+        """Flat images with few colours are graphics"""
+        content = classify_image(_graphic())
+        assert content['kind'] == 'graphic'
+        assert content['colors'] == 11
+        assert content['entropy'] < 5
+
+    def test_grayscale_rgb(self):
+        """RGB images with equal channels are grayscale"""
+        gray = Image.effect_noise((600, 400), 64).convert('RGB')
+        assert classify_image(gray)['grayscale']
+        assert classify_image(gray.convert('L'))['grayscale']
+
+    def test_alpha(self):
+        """Alpha channels are told apart by whether anything is transparent"""
+        img = _photo().convert('RGBA')
+        assert classify_image(img)['alpha'] == 'opaque'
+        img.putpixel((5, 5), (0, 0, 0, 254))
+        assert classify_image(img)['alpha'] == 'used'
+        assert classify_image(_photo())['alpha'] == 'none'
+
+    def test_palette_transparency(self):
+        """Palette images with a transparent index use alpha"""
+        img = _graphic().quantize(16)
+        assert classify_image(img)['alpha'] == 'none'
+        img.info['transparency'] = 0
+        assert classify_image(img)['alpha'] == 'used'
+
+
+class TestDescribe:
+    """Test decision summaries"""
+
+    def test_describe(self):
+        """The summary names the content and the chosen encoding"""
+        content = classify_image(_graphic())
+        content.update(format='PNG', mode='P')
+        assert describe_encoding(content) == 'palette PNG'
+        assert describe_content(content) == 'graphic, 11 colours → palette PNG'
+
+    def test_describe_none(self):
+        """No analysis, no summary"""
+        assert describe_content(None) == ""
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,108 @@
+"""
+Unit tests for dedupe module
+
+Tests staged duplicate detection and output reuse.
+"""
+
+import os
+import sys
+import pytest
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+import imagereducer.dedupe as dedupe
+from imagereducer.dedupe import PARTIAL_BLOCK, file_digest, find_duplicates, link_or_copy
+
+
+@pytest.fixture
+def files(tmp_path):
+    """Create identical, same-size and distinct files"""
+    big = os.urandom(3 * PARTIAL_BLOCK)
+    # Same size, same first and last block, different middle
+    middle = big[:PARTIAL_BLOCK] + os.urandom(PARTIAL_BLOCK) + big[-PARTIAL_BLOCK:]
+    contents = {
+        'a.jpg': big,
+        'b.jpg': os.urandom(1000),
+        'a_copy.jpg': big,
+        'middle.jpg': middle,
+        'small.jpg': b'x' * 100,
+        'small_copy.jpg': b'x' * 100,
+    }
+    for name, data in contents.items():
+        (tmp_path / name).write_bytes(data)
+    return tmp_path
+
+
+class TestFindDuplicates:
+    """Test cases for find_duplicates"""
+
+    def test_groups_identical_files(self, files):
+        """Test that only byte-identical files are grouped, in input order"""
+        paths = [files / name for name in ('a.jpg', 'b.jpg', 'a_copy.jpg', 'middle.jpg', 'small.jpg', 'small_copy.jpg')]
+        groups = find_duplicates(paths)
+        assert groups == [
+            [files / 'a.jpg', files / 'a_copy.jpg'],
+            [files / 'small.jpg', files / 'small_copy.jpg'],
+        ]
+
+    def test_unique_sizes_are_never_read(self, files, monkeypatch):
+        """Test that files with a unique size are not hashed"""
+        hashed = []
+        original = dedupe.file_digest
+
+        def recording_digest(path, partial=False):
+            hashed.append(Path(path).name)
+            return original(path, partial)
+
+        monkeypatch.setattr(dedupe, 'file_digest', recording_digest)
+        find_duplicates([files / 'a.jpg', files / 'b.jpg', files / 'small.jpg'])
+        assert hashed == []
+
+    def test_full_hash_only_after_partial_match(self, files, monkeypatch):
+        """Test that the full hash separates files the partial hash cannot"""
+        full = []
+        original = dedupe.file_digest
+
+        def recording_digest(path, partial=False):
+            if not partial:
+                full.append(Path(path).name)
+            return original(path, partial)
+
+        monkeypatch.setattr(dedupe, 'file_digest', recording_digest)
+        groups = find_duplicates([files / 'a.jpg', files / 'middle.jpg', files / 'small.jpg', files / 'small_copy.jpg'])
+        assert groups == [[files / 'small.jpg', files / 'small_copy.jpg']]
+        assert sorted(full) == ['a.jpg', 'middle.jpg']
+
+    def test_missing_files_ignored(self, files):
+        """Test that unreadable paths are never reported"""
+        assert find_duplicates([files / 'a.jpg', files / 'missing.jpg']) == []
+
+    def test_streamed_digest_matches_partial_for_small_files(self, files):
+        """Test that small files are fully covered by the partial hash"""
+        assert file_digest(files / 'small.jpg', partial=True) == file_digest(files / 'small.jpg')
+
+
+class TestLinkOrCopy:
+    """Test cases for link_or_copy"""
+
+    def test_copy(self, files, tmp_path):
+        """Test that copies are independent files"""
+        destination = tmp_path / 'copy.jpg'
+        assert link_or_copy(files / 'b.jpg', destination) in ('reflink', 'copy')
+        assert destination.read_bytes() == (files / 'b.jpg').read_bytes()
+        assert not os.path.samefile(files / 'b.jpg', destination)
+
+    def test_hard_link(self, files, tmp_path):
+        """Test that hard links share the source file"""
+        destination = tmp_path / 'link.jpg'
+        how = link_or_copy(files / 'b.jpg', destination, hard_link=True)
+        assert destination.read_bytes() == (files / 'b.jpg').read_bytes()
+        if how == 'link':
+            assert os.path.samefile(files / 'b.jpg', destination)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,894 @@
+"""
+Unit tests for image_reducer module
+
+Tests the ImageReducer class, compress_image function and memory estimates.
+"""
+
+import io
+import os
+import sys
+import pytest
+from pathlib import Path
+from PIL import Image, ImageChops, ImageDraw, JpegImagePlugin
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.image_reducer import (
+    BufferReader, ImageReducer, ImageTooLargeError, compress_bytes, compress_image, estimate_jpeg_quality,
+    estimate_peak_memory, exif_orientation, has_transparency, open_image, AVIF_AVAILABLE, ICC_AVAILABLE, WEBP_AVAILABLE
+)
+from imagereducer import image_reducer
+from imagereducer.ratecache import RateCache
+
+
+@pytest.fixture
+def photo(tmp_path):
+    """Create a noisy RGB JPEG that does not compress trivially"""
+    img_path = tmp_path / "photo.jpg"
+    img = Image.effect_noise((2400, 1600), 64).convert('RGB')
+    img.save(img_path, 'JPEG', quality=95)
+    return img_path
+
+
+@pytest.fixture
+def transparent_png(tmp_path):
+    """Create a PNG with an alpha channel"""
+    img_path = tmp_path / "logo.png"
+    img = Image.new('RGBA', (1200, 800), color=(255, 0, 0, 128))
+    img.save(img_path, 'PNG')
+    return img_path
+
+
+class TestImageReducer:
+    """Test cases for ImageReducer class"""
+
+    def test_init_default_values(self):
+        """Test ImageReducer initialization with default values"""
+        reducer = ImageReducer()
+        assert reducer.quality == 85
+        assert reducer.max_width == 1920
+        assert reducer.max_size_mb == 1.0
+        assert reducer.preserve_transparency is False
+
+    def test_is_supported(self):
+        """Test is_supported with image and non-image files"""
+        reducer = ImageReducer()
+        assert reducer.is_supported("photo.JPG") is True
+        assert reducer.is_supported("logo.png") is True
+        assert reducer.is_supported("clip.mp4") is False
+
+    def test_reduce_meets_target(self, photo, tmp_path):
+        """Test that reduce() resizes and compresses below the target"""
+        output_path = tmp_path / "out.jpg"
+        reducer = ImageReducer(max_width=1920, max_size_mb=0.5)
+        size, quality = reducer.reduce(photo, output_path)
+
+        assert max(size) <= 1920
+        assert 60 <= quality <= 85
+        assert os.path.getsize(output_path) <= 0.5 * 1024 * 1024
+
+    def test_compress_preserves_transparency(self, transparent_png, tmp_path):
+        """Test that PNG alpha is kept when requested"""
+        output_path = tmp_path / "out.png"
+        result = compress_image(str(transparent_png), str(output_path), preserve_transparency=True)
+
+        assert result['success'] is True
+        with Image.open(output_path) as img:
+            assert img.format == 'PNG'
+            assert img.mode == 'RGBA'
+
+    @pytest.mark.parametrize('mode, color', [('RGBA', (255, 0, 0, 128)), ('LA', (0, 128))])
+    def test_transparency_flattened_on_white(self, tmp_path, mode, color):
+        """Test that half-transparent pixels are composited onto white after resizing"""
+        path = tmp_path / "half.png"
+        Image.new(mode, (3000, 2000), color).save(path)
+        output_path = tmp_path / "out.jpg"
+        size, _ = ImageReducer(max_width=1000).reduce(path, output_path)
+
+        assert size == (1000, 667)
+        with Image.open(output_path) as img:
+            expected = (255, 127, 127) if mode == 'RGBA' else (127, 127, 127)
+            assert all(abs(a - b) <= 3 for a, b in zip(img.getpixel((500, 300)), expected))
+
+    def test_has_transparency(self, transparent_png, photo):
+        """Test detecting alpha channels and palette transparency from the header"""
+        with open_image(transparent_png) as img:
+            assert has_transparency(img) is True
+        with open_image(photo) as img:
+            assert has_transparency(img) is False
+        palette = Image.new('P', (10, 10))
+        palette.info['transparency'] = 0
+        assert has_transparency(palette) is True
+        assert has_transparency(Image.new('P', (10, 10))) is False
+
+    def test_failed_write_keeps_previous_output(self, photo, tmp_path, monkeypatch):
+        """Test that reduce() and renditions() never leave a truncated file behind"""
+        output_path = tmp_path / "out" / "photo.jpg"
+        output_path.parent.mkdir()
+        output_path.write_bytes(b"previous")
+
+        def write_half(path, data):
+            with open(path, 'wb') as f:
+                f.write(data[:len(data) // 2])
+            raise OSError("disk full")
+
+        monkeypatch.setattr(Path, 'write_bytes', write_half)
+        with pytest.raises(OSError):
+            ImageReducer().reduce(photo, output_path)
+        with pytest.raises(OSError):
+            ImageReducer().renditions(photo, output_path.parent, [480], ['jpeg'])
+        assert sorted(p.name for p in output_path.parent.iterdir()) == ["photo.jpg"]
+        assert output_path.read_bytes() == b"previous"
+
+    def test_compress_nonexistent_file(self, tmp_path):
+        """Test compression with non-existent input file"""
+        result = compress_image("nonexistent.jpg", str(tmp_path / "out.jpg"))
+        assert result['success'] is False
+        assert 'not found' in result['error'].lower()
+
+
+class TestMemoryEstimate:
+    """Test cases for estimate_peak_memory"""
+
+    def test_alpha_flatten_costs_more(self):
+        """Test that RGBA counts the premultiplied copy made while resizing"""
+        rgb = estimate_peak_memory((4000, 3000), 'RGB', 'PNG')
+        rgba = estimate_peak_memory((4000, 3000), 'RGBA', 'PNG')
+        assert rgba > rgb
+        assert rgb >= 4000 * 3000 * 4
+
+    def test_jpeg_draft_reduces_estimate(self):
+        """Test that reduced JPEG decoding is reflected in the estimate"""
+        png = estimate_peak_memory((16000, 12000), 'RGB', 'PNG', max_width=1920)
+        jpeg = estimate_peak_memory((16000, 12000), 'RGB', 'JPEG', max_width=1920)
+        assert jpeg < png
+
+    def test_estimate_from_header(self, photo):
+        """Test estimating memory from a file without decoding it"""
+        reducer = ImageReducer()
+        assert reducer.estimate_memory(photo) >= 2400 * 1600 * 4
+
+
+class TestLargeImages:
+    """Test cases for the large-image path and pixel limits"""
+
+    def test_reduced_decode_for_large_jpeg(self, photo, tmp_path):
+        """Test that large JPEGs are decoded at reduced scale and still meet the target"""
+        output_path = tmp_path / "out.jpg"
+        reducer = ImageReducer(max_width=600, max_size_mb=0.5, large_image_pixels=1_000_000)
+        size, _ = reducer.reduce(photo, output_path)
+
+        assert max(size) == 600
+        assert os.path.getsize(output_path) <= 0.5 * 1024 * 1024
+
+    def test_jpeg_limit_applies_after_reduced_decode(self, photo, tmp_path):
+        """Test that a JPEG above the pixel limit works when reduced decoding fits it"""
+        reducer = ImageReducer(max_width=300, large_image_pixels=1_000_000, max_image_pixels=250_000)
+        size, _ = reducer.reduce(photo, tmp_path / "out.jpg")
+        assert max(size) == 300
+
+    @pytest.mark.parametrize('large_image_pixels', [None, 0])
+    def test_large_image_path_disabled(self, photo, tmp_path, large_image_pixels):
+        """Test that None or 0 decodes every image at full resolution"""
+        reducer = ImageReducer(max_width=600, large_image_pixels=large_image_pixels)
+        size, _ = reducer.reduce(photo, tmp_path / "out.jpg")
+        assert max(size) == 600
+        assert len(reducer.renditions(photo, tmp_path, [300], ['jpeg'])['renditions']) == 1
+
+    def test_pixel_limit_raises(self, transparent_png, tmp_path):
+        """Test that images above the pixel limit raise a clear error"""
+        reducer = ImageReducer(max_image_pixels=100_000)
+        with pytest.raises(ImageTooLargeError):
+            reducer.reduce(transparent_png, tmp_path / "out.jpg")
+
+    def test_open_image_bypasses_pillow_guard(self, photo, monkeypatch):
+        """Test that headers beyond Pillow's decompression-bomb limit are readable"""
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        with pytest.raises(Image.DecompressionBombError):
+            Image.open(photo)
+        with open_image(photo) as img:
+            assert img.size == (2400, 1600)
+        assert Image.MAX_IMAGE_PIXELS == 1000
+
+    def test_open_image_file_object_past_guard(self, transparent_png, monkeypatch):
+        """Test that file objects past Pillow's limit open and decode, and the limit still applies elsewhere"""
+        monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+        with open(transparent_png, 'rb') as f:
+            with open_image(BufferReader(f.read())) as img:
+                assert (img.format, img.size) == ('PNG', (1200, 800))
+                assert img.getpixel((0, 0)) == (255, 0, 0, 128)
+        with pytest.raises(ImageTooLargeError):
+            ImageReducer(max_image_pixels=100_000).reduce(transparent_png, transparent_png.with_suffix('.jpg'))
+
+
+class TestOutputFormats:
+    """Test cases for WebP and AVIF output"""
+
+    def test_output_extension(self):
+        """Test that the extension follows the format and transparency"""
+        assert ImageReducer().output_extension() == '.jpg'
+        assert ImageReducer().output_extension(preserve_alpha=True) == '.png'
+        assert ImageReducer(output_format='jpeg').output_extension(preserve_alpha=True) == '.jpg'
+
+    def test_invalid_format(self):
+        """Test that unknown formats are rejected"""
+        with pytest.raises(ValueError):
+            ImageReducer(output_format='bmp')
+
+    @pytest.mark.skipif(not WEBP_AVAILABLE, reason="Pillow built without WebP")
+    def test_webp_meets_target(self, photo, tmp_path):
+        """Test that the WebP quality search meets the target size"""
+        output_path = tmp_path / "out.webp"
+        result = compress_image(str(photo), str(output_path), max_width=1024, max_size_mb=0.2, output_format='webp')
+
+        assert result['success'] is True
+        assert result['output_size'] <= 0.2 * 1024 * 1024
+        with Image.open(output_path) as img:
+            assert img.format == 'WEBP'
+
+    @pytest.mark.skipif(not WEBP_AVAILABLE, reason="Pillow built without WebP")
+    def test_webp_keeps_alpha(self, transparent_png, tmp_path):
+        """Test that transparent images keep alpha in WebP"""
+        output_path = tmp_path / "out.webp"
+        reducer = ImageReducer(output_format='webp')
+        reducer.reduce(transparent_png, output_path, preserve_alpha=True)
+
+        with Image.open(output_path) as img:
+            assert img.mode == 'RGBA'
+
+    @pytest.mark.skipif(not AVIF_AVAILABLE, reason="Pillow built without AVIF")
+    def test_avif_meets_target(self, photo, tmp_path):
+        """Test that the AVIF quality search meets the target size"""
+        output_path = tmp_path / "out.avif"
+        reducer = ImageReducer(max_width=1024, max_size_mb=0.2, output_format='avif')
+        reducer.reduce(photo, output_path)
+
+        assert os.path.getsize(output_path) <= 0.2 * 1024 * 1024
+        with Image.open(output_path) as img:
+            assert img.format == 'AVIF'
+
+
+@pytest.fixture
+def rotated_photo(tmp_path):
+    """Create a landscape JPEG tagged to be displayed rotated 90 degrees"""
+    img_path = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'TestCam'
+    Image.effect_noise((1200, 800), 64).convert('RGB').save(
+        img_path, 'JPEG', exif=exif.tobytes(), xmp=b'<x:xmpmeta>test</x:xmpmeta>'
+    )
+    return img_path
+
+
+class TestMetadata:
+    """Test cases for EXIF orientation, metadata pass-through and ICC handling"""
+
+    def test_orientation_applied_after_downscale(self, rotated_photo, tmp_path, monkeypatch):
+        """Test that the image is rotated upright, at output size only"""
+        sizes = []
+        original = Image.Image.transpose
+
+        def recording_transpose(self, method):
+            sizes.append(self.size)
+            return original(self, method)
+
+        monkeypatch.setattr(Image.Image, 'transpose', recording_transpose)
+        size, _ = ImageReducer(max_width=600).reduce(rotated_photo, tmp_path / "out.jpg")
+
+        assert size == (400, 600)
+        assert sizes == [(600, 400)]
+
+    def test_metadata_dropped_by_default(self, rotated_photo, tmp_path):
+        """Test that EXIF is not copied unless requested"""
+        output_path = tmp_path / "out.jpg"
+        ImageReducer(max_width=600).reduce(rotated_photo, output_path)
+        with Image.open(output_path) as img:
+            assert 'exif' not in img.info
+
+    def test_keep_metadata(self, rotated_photo, tmp_path):
+        """Test that EXIF and XMP are copied with orientation reset to normal"""
+        output_path = tmp_path / "out.jpg"
+        ImageReducer(max_width=600, keep_metadata=True).reduce(rotated_photo, output_path)
+        with Image.open(output_path) as img:
+            assert img.size == (400, 600)
+            assert img.getexif()[0x010F] == 'TestCam'
+            assert exif_orientation(img.info['exif']) == 1
+            assert b'test' in img.info['xmp']
+
+    def test_exif_orientation_invalid_data(self):
+        """Test that missing or malformed EXIF reads as normal orientation"""
+        assert exif_orientation(None) == 1
+        assert exif_orientation(b'Exif\x00\x00garbage') == 1
+
+    def test_renditions_are_upright(self, rotated_photo, tmp_path):
+        """Test that rendition widths refer to the displayed orientation"""
+        manifest = ImageReducer().renditions(rotated_photo, tmp_path, [400], ['jpeg'])
+        with Image.open(tmp_path / manifest['renditions'][0]['file']) as img:
+            assert img.size == (400, 600)
+
+    @pytest.mark.skipif(not ICC_AVAILABLE, reason="Pillow built without littlecms")
+    def test_icc_transform_built_once(self, tmp_path, monkeypatch):
+        """Test that images sharing a profile reuse one cached transform"""
+        from PIL import ImageCms
+        import imagereducer.image_reducer as module
+
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"wide{i}.jpg"
+            Image.new('RGB', (200, 100), (200, 30, 30)).save(path, icc_profile=profile)
+            paths.append(path)
+
+        built = []
+        original = ImageCms.buildTransform
+
+        def counting_build(*args, **kwargs):
+            built.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(module, '_ICC_TRANSFORMS', {})
+        monkeypatch.setattr(ImageCms, 'getProfileDescription', lambda profile: 'Camera RGB')
+        monkeypatch.setattr(ImageCms, 'buildTransform', counting_build)
+
+        reducer = ImageReducer()
+        for path in paths:
+            reducer.reduce(path, tmp_path / f"{path.stem}_out.jpg")
+            with Image.open(tmp_path / f"{path.stem}_out.jpg") as img:
+                assert 'icc_profile' not in img.info
+        assert len(built) == 1
+
+
+class TestRenditions:
+    """Test cases for multi-rendition output"""
+
+    def test_writes_all_combinations(self, photo, tmp_path):
+        """Test that every width x format combination and a manifest are written"""
+        output_dir = tmp_path / "renditions"
+        manifest = ImageReducer().renditions(photo, output_dir, [480, 960], ['jpeg', 'png'])
+
+        assert len(manifest['renditions']) == 4
+        for rendition in manifest['renditions']:
+            with Image.open(output_dir / rendition['file']) as img:
+                assert img.width == rendition['width']
+        assert (output_dir / "photo_manifest.json").exists()
+        assert manifest['srcset']['jpeg'] == "photo_480w.jpg 480w, photo_960w.jpg 960w"
+
+    def test_skips_widths_larger_than_source(self, photo, tmp_path):
+        """Test that renditions never upscale"""
+        manifest = ImageReducer().renditions(photo, tmp_path, [1200, 9000], ['jpeg'])
+        assert [r['width'] for r in manifest['renditions']] == [1200]
+
+    def test_decodes_source_once(self, photo, tmp_path, monkeypatch):
+        """Test that N renditions cost a single open and decode of the source"""
+        import imagereducer.image_reducer as module
+        calls = []
+        original = module.open_image
+
+        def counting_open(path):
+            calls.append(path)
+            return original(path)
+
+        monkeypatch.setattr(module, 'open_image', counting_open)
+        ImageReducer().renditions(photo, tmp_path, [320, 640, 1280], ['jpeg', 'png'])
+        assert len(calls) == 1
+
+
+class TestCompressBytes:
+    """Test cases for in-memory compression"""
+
+    def test_matches_file_output(self, photo, tmp_path):
+        """Test that bytes in, bytes out gives the same result as reduce()"""
+        reducer = ImageReducer(max_size_mb=0.3)
+        reducer.reduce(photo, tmp_path / "out.jpg")
+        result = reducer.compress_bytes(photo.read_bytes())
+        assert result['success'] is True
+        assert result['format'] == 'JPEG'
+        assert result['data'] == (tmp_path / "out.jpg").read_bytes()
+        assert result['output_size'] == len(result['data']) <= 0.3 * 1024 * 1024
+        assert result['input_size'] == photo.stat().st_size
+
+    def test_memoryview_and_file_objects(self, transparent_png):
+        """Test that memoryviews and file objects are accepted as input"""
+        data = bytearray(transparent_png.read_bytes())
+        reducer = ImageReducer(preserve_transparency=True, output_format='png')
+        from_view = reducer.compress_bytes(memoryview(data))
+        from_file = reducer.compress_bytes(io.BytesIO(data))
+        assert from_view['data'] == from_file['data']
+        data.append(0)  # the buffer is released again after use
+        with Image.open(io.BytesIO(from_view['data'])) as img:
+            assert img.mode == 'RGBA'
+
+    def test_invalid_input(self):
+        """Test that undecodable or unsupported data is reported, not raised"""
+        assert compress_bytes(b"not an image")['success'] is False
+        gif = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(gif, 'GIF')
+        result = compress_bytes(gif.getvalue())
+        assert result['success'] is False
+        assert 'GIF' in result['error']
+
+    def test_buffer_reader(self):
+        """Test that BufferReader reads and seeks like a file"""
+        reader = BufferReader(memoryview(b"0123456789")[2:])
+        assert reader.read(3) == b"234"
+        assert reader.seek(-2, io.SEEK_END) == 6
+        assert reader.read() == b"89"
+        assert reader.read(5) == b""
+        reader.seek(1)
+        assert reader.tell() == 1
+
+
+
+@pytest.fixture
+def small_photo(tmp_path):
+    """Create a JPEG that already meets the default target (no metadata)"""
+    img_path = tmp_path / "small.jpg"
+    Image.effect_noise((800, 600), 64).convert('RGB').save(img_path, 'JPEG', quality=80)
+    return img_path
+
+
+class TestPassThrough:
+    """Test cases for using already-small images unchanged"""
+
+    def test_small_file_copied_unchanged(self, small_photo, tmp_path, monkeypatch):
+        """Test that a file meeting the target is copied without decoding"""
+        monkeypatch.setattr(Image.Image, 'load', lambda self: pytest.fail("image decoded"))
+        output_path = tmp_path / "out.jpg"
+        result = ImageReducer(pass_through='copy').compress(str(small_photo), str(output_path))
+        assert result['success'] is True
+        assert result['passed_through'] in ('copy', 'reflink')
+        assert result['dimensions'] == (800, 600)
+        assert output_path.read_bytes() == small_photo.read_bytes()
+
+    def test_hard_link(self, small_photo, tmp_path):
+        """Test that link mode hard-links the input where possible"""
+        output_path = tmp_path / "out.jpg"
+        result = ImageReducer(pass_through='link').compress(str(small_photo), str(output_path))
+        assert result['passed_through'] in ('link', 'reflink', 'copy')
+        if result['passed_through'] == 'link':
+            assert os.path.samefile(small_photo, output_path)
+
+    def test_off_by_default(self, small_photo, tmp_path):
+        """Test that every image is compressed unless pass-through is enabled"""
+        result = ImageReducer().compress(str(small_photo), str(tmp_path / "out.jpg"))
+        assert result['passed_through'] is None
+
+    def test_too_large_or_too_wide(self, small_photo, photo):
+        """Test that files over the size or width limit are compressed"""
+        assert ImageReducer(max_width=640).meets_target(small_photo) is False
+        assert ImageReducer(max_size_mb=0.01).meets_target(small_photo) is False
+        assert ImageReducer(max_size_mb=0.3).meets_target(photo) is False
+        assert ImageReducer().meets_target(small_photo) is True
+
+    def test_other_output_format(self, small_photo):
+        """Test that a JPEG is not passed through when PNG output is wanted"""
+        reducer = ImageReducer(output_format='png')
+        assert reducer.meets_target(small_photo) is False
+
+    def test_metadata_and_orientation(self, tmp_path):
+        """Test that files needing rotation or metadata removal are compressed"""
+        exif = Image.Exif()
+        exif[0x010F] = 'TestCam'
+        tagged = tmp_path / "tagged.jpg"
+        Image.new('RGB', (400, 300), 'blue').save(tagged, 'JPEG', exif=exif.tobytes())
+        assert ImageReducer().meets_target(tagged) is False
+        assert ImageReducer(keep_metadata=True).meets_target(tagged) is True
+
+        exif[0x0112] = 6
+        rotated = tmp_path / "rotated.jpg"
+        Image.new('RGB', (400, 300), 'blue').save(rotated, 'JPEG', exif=exif.tobytes())
+        assert ImageReducer(keep_metadata=True).meets_target(rotated) is False
+
+    def test_cmyk_without_profile(self, tmp_path):
+        """Test that a CMYK JPEG the encoder would keep as CMYK can be passed through"""
+        path = tmp_path / "cmyk.jpg"
+        Image.new('CMYK', (400, 300), (0, 128, 255, 0)).save(path, 'JPEG')
+        reducer = ImageReducer()
+        assert reducer.meets_target(path) is True
+        reducer.reduce(path, tmp_path / "out.jpg")
+        with Image.open(tmp_path / "out.jpg") as img:
+            assert img.mode == 'CMYK'
+
+    def test_transparent_png(self, transparent_png):
+        """Test that a small PNG keeping its transparency can be passed through"""
+        assert ImageReducer(preserve_transparency=True).meets_target(transparent_png, preserve_alpha=True) is True
+        assert ImageReducer().meets_target(transparent_png) is False  # becomes a JPEG
+
+    def test_compress_bytes(self, small_photo):
+        """Test that in-memory input meeting the target is returned as is"""
+        data = small_photo.read_bytes()
+        result = ImageReducer(pass_through='copy').compress_bytes(io.BytesIO(data))
+        assert result['success'] is True
+        assert result['passed_through'] is True
+        assert result['data'] == data
+        assert result['format'] == 'JPEG'
+
+    def test_invalid_mode(self):
+        """Test that unknown modes are rejected"""
+        with pytest.raises(ValueError):
+            ImageReducer(pass_through='move')
+
+
+
+@pytest.fixture
+def encoded_qualities(monkeypatch):
+    """Record the quality of every encode"""
+    qualities = []
+    original = ImageReducer._encode
+
+    def recording_encode(self, img, output_format, quality, **kwargs):
+        qualities.append(quality)
+        return original(self, img, output_format, quality, **kwargs)
+
+    monkeypatch.setattr(ImageReducer, '_encode', recording_encode)
+    return qualities
+
+
+class TestSourceQuality:
+    """Test cases for estimating and respecting the source JPEG quality"""
+
+    @pytest.mark.parametrize('quality', [20, 50, 70, 85, 95])
+    def test_estimate(self, tmp_path, quality):
+        """Test that libjpeg qualities are recovered from the header"""
+        path = tmp_path / "q.jpg"
+        Image.effect_noise((320, 240), 64).convert('RGB').save(path, 'JPEG', quality=quality)
+        with Image.open(path) as img:
+            assert estimate_jpeg_quality(img) == quality
+
+    def test_not_a_jpeg(self, transparent_png):
+        """Test that non-JPEG images have no estimate"""
+        with Image.open(transparent_png) as img:
+            assert estimate_jpeg_quality(img) is None
+
+    def test_low_quality_source_not_inflated(self, tmp_path):
+        """Test that a quality 70 source is not re-encoded at quality 85"""
+        path = tmp_path / "low.jpg"
+        Image.effect_noise((2400, 1600), 64).convert('RGB').save(path, 'JPEG', quality=70)
+        output_path = tmp_path / "out.jpg"
+        _, quality = ImageReducer(quality=85, max_size_mb=10).reduce(path, output_path)
+        assert quality == 70
+        with Image.open(output_path) as img:
+            assert estimate_jpeg_quality(img) == 70
+
+    def test_keeps_source_tables(self, tmp_path, encoded_qualities):
+        """Test that a resized source reuses its quantization tables"""
+        path = tmp_path / "low.jpg"
+        exif = Image.Exif()
+        exif[0x010F] = 'TestCam'
+        Image.effect_noise((2400, 1600), 64).convert('RGB').save(path, 'JPEG', quality=75, exif=exif.tobytes())
+        output_path = tmp_path / "out.jpg"
+        ImageReducer(quality=85, max_width=1200, max_size_mb=10).reduce(path, output_path)
+        assert encoded_qualities == ['keep']
+        with Image.open(output_path) as img:
+            assert img.size == (1200, 800)
+            assert not img.info.get('exif')  # metadata still stripped
+
+    def test_higher_quality_source_uses_setting(self, photo, tmp_path, encoded_qualities):
+        """Test that a quality 95 source is encoded at the configured quality"""
+        ImageReducer(quality=85, max_size_mb=10).reduce(photo, tmp_path / "out.jpg")
+        assert encoded_qualities == [85]
+
+    def test_rotated_source_not_kept(self, rotated_photo, tmp_path, encoded_qualities):
+        """Test that a rotated image is encoded at a quality, not with kept tables"""
+        ImageReducer(quality=85, max_size_mb=10).reduce(rotated_photo, tmp_path / "out.jpg")
+        assert encoded_qualities == [75]  # Pillow's default quality
+
+
+
+@pytest.fixture
+def graphic_png(tmp_path):
+    """Create an opaque PNG chart with a few flat colours"""
+    img_path = tmp_path / "chart.png"
+    img = Image.new('RGB', (1200, 800), 'white')
+    for i in range(8):
+        img.paste((i * 30, 90, 240 - i * 30), (i * 120, i * 80, i * 120 + 300, i * 80 + 120))
+    img.save(img_path, 'PNG')
+    return img_path
+
+
+class TestContentRouting:
+    """Test cases for choosing format and colour mode from the content"""
+
+    def test_graphic_to_palette_png(self, graphic_png):
+        """Test that a graphic becomes a lossless palette PNG"""
+        encoded = ImageReducer(analyze_content=True).encode_file(graphic_png)
+        assert encoded['format'] == 'PNG'
+        assert encoded['content']['kind'] == 'graphic'
+        with Image.open(io.BytesIO(encoded['data'])) as img:
+            assert img.mode == 'P'
+            with Image.open(graphic_png) as original:
+                assert ImageChops.difference(img.convert('RGB'), original).getbbox() is None
+
+    def test_photo_to_jpeg(self, photo):
+        """Test that a photo stays JPEG"""
+        encoded = ImageReducer(analyze_content=True).encode_file(photo)
+        assert encoded['format'] == 'JPEG'
+        assert encoded['content']['kind'] == 'photo'
+
+    def test_opaque_alpha_to_jpeg(self, tmp_path):
+        """Test that an alpha channel with nothing transparent is dropped"""
+        path = tmp_path / "opaque.png"
+        Image.effect_noise((800, 600), 64).convert('RGBA').save(path)
+        encoded = ImageReducer(analyze_content=True, preserve_transparency=True).encode_file(path, True)
+        assert encoded['format'] == 'JPEG'
+        assert encoded['content']['alpha'] == 'opaque'
+
+    def test_transparency_kept(self, transparent_png):
+        """Test that real transparency still goes to PNG with alpha"""
+        encoded = ImageReducer(analyze_content=True).encode_file(transparent_png, True)
+        assert encoded['format'] == 'PNG'
+        with Image.open(io.BytesIO(encoded['data'])) as img:
+            assert img.mode == 'RGBA'
+
+    def test_grayscale_jpeg(self, tmp_path):
+        """Test that grey images are encoded with one channel"""
+        path = tmp_path / "gray.jpg"
+        Image.effect_noise((800, 600), 64).convert('RGB').save(path, 'JPEG', quality=95)
+        encoded = ImageReducer(analyze_content=True).encode_file(path)
+        assert encoded['content']['mode'] == 'L'
+        with Image.open(io.BytesIO(encoded['data'])) as img:
+            assert img.mode == 'L'
+
+    def test_reduce_keeps_planned_format(self, graphic_png, tmp_path):
+        """Test that reduce() only changes the colour mode, never the format"""
+        output_path = tmp_path / "chart.jpg"
+        ImageReducer(analyze_content=True).reduce(graphic_png, output_path)
+        with Image.open(output_path) as img:
+            assert img.format == 'JPEG'
+
+    def test_analysis_keeps_reduced_jpeg_decode(self, tmp_path, monkeypatch):
+        """Test that classifying a JPEG does not force a full-size decode"""
+        path = tmp_path / "big.jpg"
+        Image.effect_noise((4000, 3000), 64).convert('RGB').save(path, 'JPEG', quality=90)
+        decoded = []
+        original = image_reducer.classify_image
+
+        def recording_classify(img):
+            img.load()
+            decoded.append(img.size)
+            return original(img)
+
+        monkeypatch.setattr(image_reducer, 'classify_image', recording_classify)
+        reducer = ImageReducer(max_width=500, analyze_content=True, large_image_pixels=None)
+        size, _ = reducer.reduce(path, tmp_path / "out.jpg")
+        assert decoded == [(1000, 750)]  # 1/4 scale, about twice the target
+        assert size == (500, 375)
+
+    def test_reduce_opaque_alpha_keeps_png(self, tmp_path):
+        """Test that reduce() writes PNG when it was asked for, even if the alpha is unused"""
+        path = tmp_path / "opaque.png"
+        Image.effect_noise((800, 600), 64).convert('RGBA').save(path)
+        reducer = ImageReducer(analyze_content=True)
+        output_path = tmp_path / f"out{reducer.output_extension(True)}"
+        reducer.reduce(path, output_path, True)
+        assert output_path.suffix == '.png'
+        with Image.open(output_path) as img:
+            assert img.format == 'PNG'
+
+    def test_many_colour_graphic_lossless(self, tmp_path):
+        """Test that a graphic with more than 256 colours is not quantized"""
+        drawing = Image.new('RGB', (2400, 1600), 'white')
+        draw = ImageDraw.Draw(drawing)
+        for i in range(40):
+            draw.line((0, i * 40, 2400, 1600 - i * 37), fill=(i * 6, 255 - i * 5, (i * 37) % 256), width=5)
+        # Anti-aliased by downscaling: thousands of colours, still a graphic
+        drawing = drawing.resize((1199, 799), Image.Resampling.LANCZOS)
+        path = tmp_path / "drawing.png"
+        drawing.save(path)
+        encoded = ImageReducer(output_format='png', analyze_content=True).encode_file(path)
+        assert encoded['content']['kind'] == 'graphic'
+        assert encoded['content']['colors'] is None
+        with Image.open(io.BytesIO(encoded['data'])) as img:
+            assert img.mode == 'RGB'
+            assert ImageChops.difference(img, drawing).getbbox() is None
+
+    def test_explicit_png_uses_palette(self, graphic_png, tmp_path):
+        """Test that PNG output of a graphic uses a palette and is smaller"""
+        sizes = {}
+        for analyze in (False, True):
+            output_path = tmp_path / f"chart_{analyze}.png"
+            ImageReducer(output_format='png', analyze_content=analyze).reduce(graphic_png, output_path)
+            sizes[analyze] = output_path.stat().st_size
+        assert sizes[True] < sizes[False]
+
+    def test_compress_bytes_routes(self, graphic_png):
+        """Test that in-memory compression reports the chosen format"""
+        result = ImageReducer(analyze_content=True).compress_bytes(graphic_png.read_bytes())
+        assert result['success']
+        assert result['format'] == 'PNG'
+        assert result['content']['mode'] == 'P'
+
+    def test_off_by_default(self, graphic_png):
+        """Test that without analysis nothing changes"""
+        result = ImageReducer().compress_bytes(graphic_png.read_bytes())
+        assert result['format'] == 'JPEG'
+        assert result['content'] is None
+
+
+
+@pytest.fixture
+def jpeg_encodes(monkeypatch):
+    """Record (quality, final) for every JPEG encode"""
+    encodes = []
+    original = ImageReducer._encode
+
+    def recording_encode(self, img, output_format, quality, final=False, **kwargs):
+        if output_format == 'JPEG':
+            encodes.append((quality, final))
+        return original(self, img, output_format, quality, final=final, **kwargs)
+
+    monkeypatch.setattr(ImageReducer, '_encode', recording_encode)
+    return encodes
+
+
+class TestJpegSearch:
+    """Test cases for fast trial encodes in the JPEG search"""
+
+    def test_fits_first_time(self, photo, tmp_path, jpeg_encodes):
+        """Test that an image fitting at the start quality is encoded once, in full"""
+        ImageReducer(max_size_mb=10).reduce(photo, tmp_path / "out.jpg")
+        assert jpeg_encodes == [(85, True)]
+
+    def test_trials_are_fast(self, photo, tmp_path, jpeg_encodes):
+        """Test that search steps are trial encodes and only the result is final"""
+        output_path = tmp_path / "out.jpg"
+        _, quality = ImageReducer(max_size_mb=0.3, min_width=400).reduce(photo, output_path)
+
+        assert jpeg_encodes[0] == (85, True)
+        assert jpeg_encodes[-1] == (quality, True)
+        trials = [encode for encode in jpeg_encodes[1:-1] if not encode[1]]
+        assert len(trials) >= 2
+        assert os.path.getsize(output_path) <= 0.3 * 1024 * 1024
+
+    @pytest.mark.parametrize('guess, margin', [(0.1, 0.9), (10.0, 0.05)])
+    def test_same_result_as_full_encodes(self, photo, monkeypatch, jpeg_encodes, guess, margin):
+        """Test that wrong size predictions cost encodes, not quality"""
+        import imagereducer.image_reducer as image_reducer
+        reducer = ImageReducer(max_size_mb=0.3, min_width=400)
+        with Image.open(photo) as img:
+            img.load()
+            # A ratio below zero predicts every step to fit: all full encodes
+            monkeypatch.setattr(image_reducer, "JPEG_OPTIMIZED_RATIO", -1.0)
+            monkeypatch.setattr(image_reducer, "JPEG_RATIO_MARGIN", 10.0)
+            expected = reducer._reduce_jpeg(img.copy(), int(0.3 * 1024 * 1024))
+
+            monkeypatch.setattr(image_reducer, "JPEG_OPTIMIZED_RATIO", guess)
+            monkeypatch.setattr(image_reducer, "JPEG_RATIO_MARGIN", margin)
+            del jpeg_encodes[:]
+            size, quality, data = reducer._reduce_jpeg(img.copy(), int(0.3 * 1024 * 1024))
+
+        assert (size, quality, data) == expected
+        assert sum(1 for _, final in jpeg_encodes if final) >= 2
+
+    def test_progressive(self, photo, tmp_path):
+        """Test that progressive output is written when enabled"""
+        output_path = tmp_path / "out.jpg"
+        ImageReducer(max_size_mb=10, progressive=True).reduce(photo, output_path)
+        with Image.open(output_path) as img:
+            assert img.info.get('progressive')
+
+
+
+class TestRateCacheSearch:
+    """Test cases for starting the JPEG search from recorded sizes"""
+
+    def _reduce(self, photo, tmp_path, max_size_mb, cache=None):
+        output_path = tmp_path / "out.jpg"
+        result = ImageReducer(max_size_mb=max_size_mb, min_width=400, rate_cache=cache).reduce(photo, output_path)
+        return result, output_path.read_bytes()
+
+    def test_same_target_one_encode(self, photo, tmp_path, jpeg_encodes):
+        """Test that running again with the same target encodes once"""
+        with RateCache(tmp_path / "cache.db") as cache:
+            first = self._reduce(photo, tmp_path, 0.3, cache)
+            del jpeg_encodes[:]
+            assert self._reduce(photo, tmp_path, 0.3, cache) == first
+        assert jpeg_encodes == [(first[0][1], True)]
+
+    @pytest.mark.parametrize('retarget_mb', [0.2, 0.5])
+    def test_retarget_same_result(self, photo, tmp_path, jpeg_encodes, retarget_mb):
+        """Test that another target gives the same file as a search without the cache, in fewer encodes"""
+        expected = self._reduce(photo, tmp_path, retarget_mb)
+        cold_encodes = len(jpeg_encodes)
+
+        with RateCache(tmp_path / "cache.db") as cache:
+            self._reduce(photo, tmp_path, 0.3, cache)
+            del jpeg_encodes[:]
+            assert self._reduce(photo, tmp_path, retarget_mb, cache) == expected
+        assert len(jpeg_encodes) < cold_encodes
+
+    @pytest.mark.parametrize('retarget_mb', [0.2, 0.3])
+    def test_smaller_target_predicted(self, photo, tmp_path, jpeg_encodes, retarget_mb):
+        """Test that a target below every recorded size starts near where it fits, with the same result"""
+        expected = self._reduce(photo, tmp_path, retarget_mb)
+        cold_encodes = len(jpeg_encodes)
+
+        with RateCache(tmp_path / "cache.db") as cache:
+            self._reduce(photo, tmp_path, 10, cache)
+            del jpeg_encodes[:]
+            assert self._reduce(photo, tmp_path, retarget_mb, cache) == expected
+        assert jpeg_encodes[0] != (85, True)
+        assert len(jpeg_encodes) < cold_encodes
+
+    @pytest.mark.parametrize('predicted', [0, -1])
+    def test_wrong_prediction_same_result(self, photo, tmp_path, monkeypatch, predicted):
+        """Test that a prediction too early or too late still finds the first setting that fits"""
+        expected = self._reduce(photo, tmp_path, 0.2)
+        with RateCache(tmp_path / "cache.db") as cache:
+            self._reduce(photo, tmp_path, 10, cache)
+            monkeypatch.setattr(ImageReducer, '_predict_jpeg_start',
+                                staticmethod(lambda settings, *args: range(len(settings))[predicted]))
+            assert self._reduce(photo, tmp_path, 0.2, cache) == expected
+
+    def test_predict_interpolates(self):
+        """Test that the prediction follows the recorded sizes between and beyond them"""
+        settings = ImageReducer(min_quality=50, min_width=1000)._jpeg_settings(85, (1200, 800), '4:2:0')
+        # Shrinking by half per step, twice as fast as expected: 8 and 2 MB recorded
+        anchors = {0: 8_000_000, 2: 2_000_000}
+        assert ImageReducer._predict_jpeg_start(settings, anchors, 0, 4_000_000) == 1
+        assert ImageReducer._predict_jpeg_start(settings, anchors, 0, 600_000) == 4
+        assert ImageReducer._predict_jpeg_start(settings, anchors, 0, 1) == len(settings) - 1
+        assert ImageReducer._predict_jpeg_start(settings, {}, 3, 500_000) == 3
+
+    def test_changed_source_searched_again(self, photo, tmp_path, jpeg_encodes):
+        """Test that sizes recorded for a file that changed since are not used"""
+        with RateCache(tmp_path / "cache.db") as cache:
+            self._reduce(photo, tmp_path, 0.3, cache)
+            with Image.open(photo) as img:
+                img.transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(photo, 'JPEG', quality=95)
+            del jpeg_encodes[:]
+            self._reduce(photo, tmp_path, 0.3, cache)
+        assert jpeg_encodes[0] == (85, True)
+        assert len(jpeg_encodes) > 1
+
+
+def _sampling(data: bytes) -> str:
+    """Chroma subsampling of an encoded JPEG"""
+    with Image.open(io.BytesIO(data)) as img:
+        return {0: '4:4:4', 1: '4:2:2', 2: '4:2:0'}[JpegImagePlugin.get_sampling(img)]
+
+
+class TestSubsampling:
+    """Test cases for JPEG chroma subsampling"""
+
+    @pytest.mark.parametrize('subsampling', ['4:4:4', '4:2:2', '4:2:0'])
+    def test_explicit(self, graphic_png, subsampling):
+        """Test that a fixed subsampling is used for every image"""
+        result = ImageReducer(output_format='jpeg', subsampling=subsampling).compress_bytes(graphic_png.read_bytes())
+        assert _sampling(result['data']) == subsampling
+
+    def test_auto_by_content(self, graphic_png):
+        """Test that auto keeps full colour for graphics and halves it for photos"""
+        colour_photo = io.BytesIO()
+        Image.merge('RGB', [Image.effect_noise((900, 600), sigma) for sigma in (40, 64, 90)]).save(colour_photo, 'PNG')
+
+        reducer = ImageReducer(output_format='jpeg', analyze_content=True)
+        assert _sampling(reducer.compress_bytes(graphic_png.read_bytes())['data']) == '4:4:4'
+        assert _sampling(reducer.compress_bytes(colour_photo.getvalue())['data']) == '4:2:0'
+        assert _sampling(ImageReducer(output_format='jpeg').compress_bytes(graphic_png.read_bytes())['data']) == '4:2:0'
+
+    def test_auto_tries_subsampling_before_quality(self, graphic_png):
+        """Test that a graphic missing the target at 4:4:4 gets 4:2:0 at the same quality"""
+        sizes = {
+            subsampling: len(ImageReducer(output_format='jpeg', subsampling=subsampling)
+                             .compress_bytes(graphic_png.read_bytes())['data'])
+            for subsampling in ('4:4:4', '4:2:0')
+        }
+        target = (sizes['4:4:4'] + sizes['4:2:0']) / 2
+        reducer = ImageReducer(output_format='jpeg', analyze_content=True, max_size_mb=target / (1024 * 1024))
+        result = reducer.compress_bytes(graphic_png.read_bytes())
+
+        assert result['quality'] == 85
+        assert _sampling(result['data']) == '4:2:0'
+
+    def test_invalid(self):
+        """Test that an unknown subsampling is rejected"""
+        with pytest.raises(ValueError):
+            ImageReducer(subsampling='4:1:1')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,143 @@
+"""
+Unit tests for journal module
+
+Tests recording batch progress, verifying completed outputs and resuming.
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+import pytest
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.journal import BatchJournal, DONE, FAILED, PLANNED, RUNNING
+
+
+@pytest.fixture
+def batch(tmp_path):
+    """Three source files and their (not yet written) outputs"""
+    sources = []
+    for i in range(3):
+        source = tmp_path / f"img{i}.jpg"
+        source.write_bytes(b"x" * (100 + i))
+        sources.append(source)
+    outputs = [tmp_path / "out" / source.name for source in sources]
+    return sources, outputs
+
+
+def _write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"y" * size)
+
+
+class TestJournal:
+    """Test recording progress"""
+
+    def test_states(self, tmp_path, batch):
+        """Files move from planned to running to done or failed"""
+        sources, outputs = batch
+        with BatchJournal(tmp_path / "journal.db") as journal:
+            journal.plan(zip(sources, outputs))
+            assert journal.counts() == {PLANNED: 3}
+            journal.start(sources[0])
+            journal.start(sources[1])
+            assert journal.counts() == {PLANNED: 1, RUNNING: 2}
+            _write(outputs[0], 10)
+            journal.finish(sources[0])
+            journal.fail(sources[1], "broken")
+            assert journal.counts() == {PLANNED: 1, DONE: 1, FAILED: 1}
+
+    def test_finish_other_output(self, tmp_path, batch):
+        """A file written under another name than planned records that name"""
+        sources, outputs = batch
+        with BatchJournal(tmp_path / "journal.db") as journal:
+            journal.plan(zip(sources, outputs))
+            actual = outputs[0].with_suffix('.png')
+            _write(actual, 10)
+            journal.finish(sources[0], output=actual)
+            assert journal.outputs()[os.path.abspath(sources[0])] == actual
+            assert journal.is_complete(sources[0])
+
+    def test_wal_mode(self, tmp_path):
+        """The journal uses write-ahead logging"""
+        path = tmp_path / "journal.db"
+        BatchJournal(path).close()
+        assert sqlite3.connect(str(path)).execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    def test_concurrent_updates(self, tmp_path, batch):
+        """Workers can record starts concurrently"""
+        sources, outputs = batch
+        with BatchJournal(tmp_path / "journal.db") as journal:
+            journal.plan(zip(sources, outputs))
+            threads = [threading.Thread(target=journal.start, args=(source,)) for source in sources]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert journal.counts() == {RUNNING: 3}
+
+
+class TestResume:
+    """Test continuing an interrupted batch"""
+
+    def _interrupted(self, tmp_path, batch):
+        # First file done, second in progress when the run stopped
+        sources, outputs = batch
+        journal = BatchJournal(tmp_path / "journal.db")
+        journal.plan(zip(sources, outputs))
+        journal.start(sources[0])
+        _write(outputs[0], 10)
+        journal.finish(sources[0], 10)
+        journal.start(sources[1])
+        journal.close()
+
+    def test_completed_survive_reopen(self, tmp_path, batch):
+        """Completed files are known after reopening with resume"""
+        self._interrupted(tmp_path, batch)
+        sources, outputs = batch
+        with BatchJournal(tmp_path / "journal.db", resume=True) as journal:
+            assert journal.completed() == {os.path.abspath(sources[0])}
+            assert journal.is_complete(sources[0])
+            assert not journal.is_complete(sources[1])
+            # Unfinished files keep their output names
+            assert journal.outputs()[os.path.abspath(sources[1])] == outputs[1]
+
+    def test_new_batch_clears(self, tmp_path, batch):
+        """Without resume the previous records are dropped"""
+        self._interrupted(tmp_path, batch)
+        with BatchJournal(tmp_path / "journal.db") as journal:
+            assert journal.completed() == set()
+            assert journal.outputs() == {}
+
+    def test_missing_output_redone(self, tmp_path, batch):
+        """A completed file whose output is gone runs again"""
+        self._interrupted(tmp_path, batch)
+        sources, outputs = batch
+        outputs[0].unlink()
+        with BatchJournal(tmp_path / "journal.db", resume=True) as journal:
+            assert journal.completed() == set()
+
+    def test_truncated_output_redone(self, tmp_path, batch):
+        """A completed file whose output has the wrong size runs again"""
+        self._interrupted(tmp_path, batch)
+        sources, outputs = batch
+        outputs[0].write_bytes(b"")
+        with BatchJournal(tmp_path / "journal.db", resume=True) as journal:
+            assert not journal.is_complete(sources[0])
+
+    def test_changed_source_redone(self, tmp_path, batch):
+        """A source edited since it was compressed runs again"""
+        self._interrupted(tmp_path, batch)
+        sources, outputs = batch
+        sources[0].write_bytes(b"changed")
+        with BatchJournal(tmp_path / "journal.db", resume=True) as journal:
+            assert journal.completed() == set()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,130 @@
+"""
+Unit tests for perceptual module
+
+Tests perceptual hashes, the BK-tree index and near-duplicate grouping.
+"""
+
+import sys
+import random
+import pytest
+from pathlib import Path
+from PIL import Image, ImageEnhance
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.image_reducer import ImageTooLargeError
+from imagereducer.perceptual import BKTree, find_near_duplicates, hamming, hash_memory, image_hash
+from imagereducer.scheduler import MemoryBudget
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    """Create a scene, a smaller re-export, a brighter copy and an unrelated image"""
+    scene = Image.radial_gradient('L').resize((1600, 1200)).convert('RGB')
+    scene.paste((200, 30, 30), (300, 300, 900, 700))
+    scene.save(tmp_path / "scene.jpg", quality=90)
+    scene.resize((640, 480)).save(tmp_path / "scene_small.jpg", quality=60)
+    ImageEnhance.Brightness(scene).enhance(1.1).save(tmp_path / "scene_bright.png")
+    Image.linear_gradient('L').resize((1600, 1200)).convert('RGB').save(tmp_path / "other.jpg")
+    return tmp_path
+
+
+class TestHashes:
+    """Test cases for dhash and phash"""
+
+    @pytest.mark.parametrize("method", ['dhash', 'phash'])
+    def test_similar_images_hash_close(self, scenes, method):
+        """Test that re-exports are close and unrelated images are far apart"""
+        base, size, _ = image_hash(scenes / "scene.jpg", method)
+        assert size == (1600, 1200)
+        assert hamming(base, image_hash(scenes / "scene_small.jpg", method)[0]) <= 6
+        assert hamming(base, image_hash(scenes / "scene_bright.png", method)[0]) <= 6
+        assert hamming(base, image_hash(scenes / "other.jpg", method)[0]) > 16
+
+
+class TestReducedDecode:
+    """Test cases for the pixel limit and reduction before hashing"""
+
+    def test_pixel_limit(self, scenes):
+        """Test that a PNG above the limit is refused, while a JPEG counts its reduced decode"""
+        with pytest.raises(ImageTooLargeError):
+            image_hash(scenes / "scene_bright.png", max_image_pixels=100_000)
+        assert image_hash(scenes / "scene.jpg", max_image_pixels=100_000)[1] == (1600, 1200)
+
+    def test_png_reduced_before_hashing(self, scenes, monkeypatch):
+        """Test that other formats are box-reduced, not converted at full size"""
+        converted = []
+        original = Image.Image.convert
+
+        def convert(img, *args, **kwargs):
+            converted.append(img.size)
+            return original(img, *args, **kwargs)
+
+        monkeypatch.setattr(Image.Image, 'convert', convert)
+        image_hash(scenes / "scene_bright.png")
+        assert max(w * h for w, h in converted) < 200 * 200
+
+    def test_memory_estimate(self, scenes):
+        """Test that the estimate reflects the reduced JPEG decode"""
+        assert hash_memory(scenes / "scene.jpg") == 200 * 150 * 4
+        assert hash_memory(scenes / "scene_bright.png") == 1600 * 1200 * 4
+
+
+class TestBKTree:
+    """Test cases for the BK-tree index"""
+
+    def test_matches_brute_force(self):
+        """Test that radius queries return exactly the brute-force matches"""
+        rng = random.Random(42)
+        values = [rng.getrandbits(64) for _ in range(2000)]
+        # Add close neighbours so queries have hits
+        values += [v ^ (1 << rng.randrange(64)) for v in values[:200]]
+        tree = BKTree()
+        for i, value in enumerate(values):
+            tree.add(value, i)
+        assert len(tree) == len(values)
+
+        for query in values[:50]:
+            expected = sorted(i for i, v in enumerate(values) if hamming(query, v) <= 3)
+            assert sorted(i for _, i in tree.search(query, 3)) == expected
+
+    def test_empty_tree(self):
+        """Test that searching an empty tree finds nothing"""
+        assert BKTree().search(0, 10) == []
+
+
+class TestFindNearDuplicates:
+    """Test cases for find_near_duplicates"""
+
+    def test_groups_anchored_on_largest(self, scenes):
+        """Test that the group keeps the highest-resolution image first"""
+        paths = [scenes / n for n in ("scene_small.jpg", "other.jpg", "scene.jpg", "scene_bright.png")]
+        groups = find_near_duplicates(paths)
+        assert len(groups) == 1
+        assert groups[0][0] == scenes / "scene.jpg"
+        assert set(groups[0][1:]) == {scenes / "scene_small.jpg", scenes / "scene_bright.png"}
+
+    def test_within_budget_and_limit(self, scenes):
+        """Test that a memory budget gives the same groups, and images above the limit are left out"""
+        paths = [scenes / n for n in ("scene.jpg", "scene_small.jpg", "scene_bright.png")]
+        assert find_near_duplicates(paths, budget=MemoryBudget(1024 * 1024)) == find_near_duplicates(paths)
+        assert find_near_duplicates(paths, max_image_pixels=100_000) == [[scenes / "scene.jpg", scenes / "scene_small.jpg"]]
+
+    def test_flat_colours_not_grouped(self, tmp_path):
+        """Test that featureless images of different colours are kept apart"""
+        Image.new('RGB', (200, 200), 'red').save(tmp_path / "red.jpg")
+        Image.new('RGB', (200, 200), 'blue').save(tmp_path / "blue.jpg")
+        assert find_near_duplicates([tmp_path / "red.jpg", tmp_path / "blue.jpg"]) == []
+
+    def test_unreadable_and_invalid_method(self, scenes):
+        """Test that broken files are skipped and unknown methods rejected"""
+        (scenes / "bad.jpg").write_text("not an image")
+        assert find_near_duplicates([scenes / "bad.jpg", scenes / "other.jpg"]) == []
+        with pytest.raises(ValueError):
+            find_near_duplicates([], method='ahash')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,97 @@
+"""
+Unit tests for probe module
+
+Tests header-only probing and cost-based ordering of batches.
+"""
+
+import sys
+import pytest
+from pathlib import Path
+from PIL import Image
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.probe import ImageInfo, probe_image, probe_images, estimate_cost, order_by_cost
+
+
+@pytest.fixture
+def images(tmp_path):
+    """Create images of different sizes and modes"""
+    paths = {
+        'small.jpg': Image.new('RGB', (400, 300), 'red'),
+        'large.jpg': Image.new('RGB', (3000, 2000), 'blue'),
+        'alpha.png': Image.new('RGBA', (800, 600), (0, 0, 0, 0)),
+        'palette.png': Image.new('P', (200, 200)),
+    }
+    for name, img in paths.items():
+        if name == 'palette.png':
+            img.save(tmp_path / name, transparency=0)
+        else:
+            img.save(tmp_path / name)
+    return tmp_path
+
+
+class TestProbe:
+    """Test cases for probe_image"""
+
+    def test_reads_header(self, images):
+        """Test that dimensions, mode and format are read"""
+        info = probe_image(images / 'large.jpg')
+        assert info.size == (3000, 2000)
+        assert info.mode == 'RGB'
+        assert info.format == 'JPEG'
+        assert info.has_alpha is False
+        assert info.file_size > 0
+        assert info.error is None
+
+    def test_detects_transparency(self, images):
+        """Test alpha detection for RGBA and palette transparency"""
+        assert probe_image(images / 'alpha.png').has_alpha is True
+        assert probe_image(images / 'palette.png').has_alpha is True
+
+    def test_does_not_decode_pixels(self, images, monkeypatch):
+        """Test that probing never loads pixel data"""
+        def fail_load(self):
+            raise AssertionError("probe must not decode pixels")
+
+        monkeypatch.setattr(Image.Image, 'load', fail_load)
+        monkeypatch.setattr('PIL.ImageFile.ImageFile.load', fail_load)
+        assert probe_image(images / 'large.jpg').width == 3000
+
+    def test_invalid_file_sets_error(self, tmp_path):
+        """Test that unreadable files are reported instead of raising"""
+        bad = tmp_path / "bad.jpg"
+        bad.write_text("not an image")
+        info = probe_image(bad)
+        assert info.error is not None
+        assert estimate_cost(info) == 0
+
+    def test_probe_images_keeps_order(self, images):
+        """Test that parallel probing preserves input order"""
+        paths = [images / 'small.jpg', images / 'large.jpg', images / 'alpha.png']
+        infos = probe_images(paths, max_workers=3)
+        assert [info.path for info in infos] == paths
+
+
+class TestOrdering:
+    """Test cases for cost-based ordering"""
+
+    def test_largest_first(self, images):
+        """Test that the most expensive image is scheduled first"""
+        infos = probe_images(sorted(images.glob('*')))
+        ordered = order_by_cost(infos)
+        assert ordered[0].path.name == 'large.jpg'
+        assert ordered[-1].path.name == 'palette.png'
+
+    def test_order_with_key(self):
+        """Test ordering arbitrary jobs through a key function"""
+        jobs = [('a', ImageInfo(Path('a'), 100, 100, 'RGB', 'PNG')),
+                ('b', ImageInfo(Path('b'), 5000, 4000, 'RGB', 'PNG'))]
+        ordered = order_by_cost(jobs, key=lambda job: job[1])
+        assert [name for name, _ in ordered] == ['b', 'a']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
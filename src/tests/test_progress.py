@@ -0,0 +1,130 @@
+"""
+Unit tests for progress module
+
+Tests batch counters, throughput and ETA, duration formatting and the report file.
+"""
+
+import sys
+import time
+import threading
+import pytest
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.progress import ProgressTracker, ProgressReport, format_duration
+
+
+class TestFormatDuration:
+    """Test ETA formatting"""
+
+    def test_minutes_and_seconds(self):
+        """Short durations show M:SS"""
+        assert format_duration(0) == "0:00"
+        assert format_duration(75.4) == "1:15"
+
+    def test_hours(self):
+        """Long durations show H:MM:SS"""
+        assert format_duration(3 * 3600 + 5 * 60 + 9) == "3:05:09"
+
+    def test_unknown(self):
+        """None means no estimate yet"""
+        assert format_duration(None) == "--:--"
+
+
+class TestProgressTracker:
+    """Test batch counters"""
+
+    def test_counts_and_bytes(self):
+        """Advances add up, failures counted separately"""
+        tracker = ProgressTracker(10)
+        tracker.advance(input_bytes=1000, output_bytes=200)
+        tracker.advance(3, input_bytes=3000, output_bytes=600)
+        tracker.advance(failed=True)
+        stats = tracker.snapshot()
+        assert stats['done'] == 5
+        assert stats['failed'] == 1
+        assert stats['percent'] == 50.0
+        assert stats['input_bytes'] == 4000
+        assert stats['output_bytes'] == 800
+
+    def test_no_eta_before_progress(self):
+        """ETA is unknown until something has finished"""
+        stats = ProgressTracker(10).snapshot()
+        assert stats['done'] == 0
+        assert stats['eta'] is None
+
+    def test_rate_and_eta(self):
+        """ETA is the remaining files at the current rate"""
+        tracker = ProgressTracker(100)
+        time.sleep(0.05)
+        tracker.advance(10)
+        stats = tracker.snapshot()
+        assert stats['rate'] > 0
+        assert stats['eta'] == pytest.approx(90 / stats['rate'])
+
+    def test_rate_follows_recent_speed(self):
+        """Throughput is measured over the recent window, not the whole run"""
+        tracker = ProgressTracker(1000, window_seconds=0.05)
+        tracker.advance(500)
+        tracker.snapshot()
+        time.sleep(0.1)
+        tracker.snapshot()
+        time.sleep(0.1)
+        # Nothing finished during the last window
+        assert tracker.snapshot()['rate'] == 0.0
+
+    def test_finished_batch(self):
+        """A finished batch has no time remaining"""
+        tracker = ProgressTracker(2)
+        tracker.advance(2)
+        stats = tracker.snapshot()
+        assert stats['percent'] == 100.0
+        assert stats['eta'] == 0.0
+
+    def test_thread_safe(self):
+        """Concurrent advances are not lost"""
+        tracker = ProgressTracker(8000)
+
+        def work():
+            for _ in range(1000):
+                tracker.advance(input_bytes=2)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = tracker.snapshot()
+        assert stats['done'] == 8000
+        assert stats['input_bytes'] == 16000
+
+
+class TestProgressReport:
+    """Test the full report file"""
+
+    def test_writes_every_line(self, tmp_path):
+        """All messages are kept, one per line"""
+        path = tmp_path / "report.txt"
+        with ProgressReport(path) as report:
+            for i in range(1000):
+                report.write(f"file_{i}.jpg\n")
+            report.write("first\nsecond")
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 1002
+        assert lines[0] == "file_0.jpg"
+        assert lines[-2:] == ["first", "second"]
+
+    def test_write_after_close_ignored(self, tmp_path):
+        """Late messages from workers do not raise"""
+        report = ProgressReport(tmp_path / "report.txt")
+        report.close()
+        report.write("late")
+        report.close()
+        assert (tmp_path / "report.txt").read_text(encoding='utf-8') == ""
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,75 @@
+"""
+Unit tests for ratecache module
+
+Tests recording encoded sizes, merging them across runs and dropping the
+points of changed files.
+"""
+
+import sys
+import pytest
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.ratecache import RateCache, settings_key
+
+
+@pytest.fixture
+def source(tmp_path):
+    """A source file; only its size and modification time matter"""
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"x" * 100)
+    return path
+
+
+SETTINGS = settings_key(format='JPEG', mode='RGB', max_width=1920)
+
+
+class TestRateCache:
+    """Test recording and reading points"""
+
+    def test_round_trip(self, tmp_path, source):
+        """Recorded points are read back, also after reopening"""
+        points = {(85, (1920, 1280), '4:2:0'): (900000, None), (80, (1920, 1280), '4:2:0'): (None, 800000)}
+        with RateCache(tmp_path / "cache.db") as cache:
+            cache.record(source, SETTINGS, points)
+        with RateCache(tmp_path / "cache.db") as cache:
+            assert cache.points(source, SETTINGS) == points
+
+    def test_sizes_merged(self, tmp_path, source):
+        """A later run adds the size it measured and keeps the other"""
+        point = (80, (1920, 1280), '4:2:0')
+        with RateCache(tmp_path / "cache.db") as cache:
+            cache.record(source, SETTINGS, {point: (None, 750000)})
+            cache.record(source, SETTINGS, {point: (700000, None)})
+            assert cache.points(source, SETTINGS) == {point: (700000, 750000)}
+
+    def test_settings_separate(self, tmp_path, source):
+        """Points are only shared between identical settings"""
+        point = (85, (1920, 1280), '4:2:0')
+        with RateCache(tmp_path / "cache.db") as cache:
+            cache.record(source, SETTINGS, {point: (900000, None)})
+            assert cache.points(source, settings_key(format='JPEG', mode='L', max_width=1920)) == {}
+
+    def test_changed_source(self, tmp_path, source):
+        """Points of a file that changed since are dropped"""
+        point = (85, (1920, 1280), '4:2:0')
+        with RateCache(tmp_path / "cache.db") as cache:
+            cache.record(source, SETTINGS, {point: (900000, 950000)})
+            source.write_bytes(b"y" * 200)
+            assert cache.points(source, SETTINGS) == {}
+
+            cache.record(source, SETTINGS, {point: (500000, None)})
+            assert cache.points(source, SETTINGS) == {point: (500000, None)}
+
+    def test_missing_source(self, tmp_path):
+        """Nothing is recorded for a file that does not exist"""
+        with RateCache(tmp_path / "cache.db") as cache:
+            cache.record(tmp_path / "gone.jpg", SETTINGS, {(85, (10, 10), '4:2:0'): (100, None)})
+            assert cache.points(tmp_path / "gone.jpg", SETTINGS) == {}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,109 @@
+"""
+Unit tests for scheduler module
+
+Tests the MemoryBudget admission control and the run_jobs worker pool.
+"""
+
+import sys
+import time
+import threading
+import pytest
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.scheduler import MemoryBudget, run_jobs
+
+
+class TestMemoryBudget:
+    """Test cases for MemoryBudget"""
+
+    def test_acquire_and_release(self):
+        """Test that reservations are tracked"""
+        budget = MemoryBudget(100)
+        reserved = budget.acquire(40)
+        assert reserved == 40
+        assert budget.in_use == 40
+        budget.release(reserved)
+        assert budget.in_use == 0
+
+    def test_oversized_job_is_clamped(self):
+        """Test that a job larger than the budget runs alone instead of blocking"""
+        budget = MemoryBudget(100)
+        assert budget.acquire(500) == 100
+        assert budget.in_use == 100
+
+    def test_acquire_blocks_until_release(self):
+        """Test that a job waits while the budget is full"""
+        budget = MemoryBudget(100)
+        first = budget.acquire(80)
+        admitted = threading.Event()
+
+        def second():
+            budget.acquire(50)
+            admitted.set()
+
+        thread = threading.Thread(target=second)
+        thread.start()
+        assert not admitted.wait(0.1), "Second job should wait for memory"
+
+        budget.release(first)
+        assert admitted.wait(1.0), "Second job should start after release"
+        thread.join()
+
+
+class TestRunJobs:
+    """Test cases for run_jobs"""
+
+    def test_runs_all_jobs(self):
+        """Test that every job produces a result"""
+        results = list(run_jobs(range(10), lambda n: n * 2, max_workers=4))
+        assert sorted(r for _, r, _ in results) == [n * 2 for n in range(10)]
+
+    def test_reports_errors_per_job(self):
+        """Test that a failing job does not stop the batch"""
+        def func(n):
+            if n == 3:
+                raise ValueError("bad job")
+            return n
+
+        results = list(run_jobs(range(5), func, max_workers=2))
+        errors = [(job, err) for job, _, err in results if err is not None]
+        assert len(results) == 5
+        assert len(errors) == 1
+        assert errors[0][0] == 3
+        assert isinstance(errors[0][1], ValueError)
+
+    def test_budget_limits_concurrency(self):
+        """Test that concurrent jobs never exceed the memory budget"""
+        budget = MemoryBudget(100)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def func(job):
+            with lock:
+                running.append(job)
+                peak.append(sum(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(job)
+            return job
+
+        jobs = [60, 30, 60, 30, 40, 60]
+        results = list(run_jobs(jobs, func, max_workers=4, budget=budget, estimate=lambda job: job))
+
+        assert len(results) == len(jobs)
+        assert max(peak) <= 100
+        assert budget.in_use == 0
+
+    def test_should_stop(self):
+        """Test that should_stop prevents new jobs from starting"""
+        results = list(run_jobs(range(10), lambda n: n, max_workers=2, should_stop=lambda: True))
+        assert results == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,149 @@
+"""
+Unit tests for server module
+
+Tests the HTTP compression service against localhost.
+"""
+
+import io
+import sys
+import json
+import threading
+import http.client
+import pytest
+from pathlib import Path
+from PIL import Image
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.server import CompressionServer, STATS_HEADER
+
+
+def jpeg_bytes(size=(2400, 1600)):
+    buffer = io.BytesIO()
+    Image.radial_gradient('L').resize(size).convert('RGB').save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_server():
+    """Start servers on free localhost ports and stop them after the test"""
+    servers = []
+
+    def start(**kwargs):
+        server = CompressionServer('127.0.0.1', 0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+class TestCompress:
+    """Test cases for POST /compress"""
+
+    def test_returns_compressed_image_and_stats(self, make_server):
+        """Test that an upload comes back compressed with its statistics"""
+        server = make_server()
+        body = jpeg_bytes()
+        status, headers, data = request(server, 'POST', '/compress?format=webp&max_width=800', body)
+        assert status == 200
+        assert headers['Content-Type'] == 'image/webp'
+        stats = json.loads(headers[STATS_HEADER])
+        assert stats['input_size'] == len(body)
+        assert stats['output_size'] == len(data) < len(body)
+        assert stats['dimensions'] == [800, 533]
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.format == 'WEBP'
+
+    def test_png_with_transparency(self, make_server):
+        """Test that a named PNG upload keeps its transparency when asked"""
+        server = make_server()
+        buffer = io.BytesIO()
+        Image.new('RGBA', (300, 300), (10, 20, 30, 128)).save(buffer, 'PNG')
+        status, headers, data = request(
+            server, 'POST', '/compress?preserve_transparency=1&filename=logo.png', buffer.getvalue()
+        )
+        assert status == 200
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.mode == 'RGBA'
+
+    def test_rejected_requests(self, make_server):
+        """Test the error responses for bad settings, unknown types and broken images"""
+        server = make_server()
+        assert request(server, 'POST', '/compress?quality=high', jpeg_bytes((100, 100)))[0] == 400
+        assert request(server, 'POST', '/compress?format=gif', jpeg_bytes((100, 100)))[0] == 400
+        assert request(server, 'POST', '/compress', b"plain text")[0] == 415
+        assert request(server, 'POST', '/compress?filename=bad.jpg', b"not a jpeg")[0] == 422
+        assert request(server, 'POST', '/elsewhere', b"x")[0] == 404
+
+
+class TestLimits:
+    """Test cases for body size limits and backpressure"""
+
+    def test_body_too_large(self, make_server):
+        """Test that uploads above the limit are refused before compression"""
+        server = make_server(max_body_mb=0.01)
+        status, _, data = request(server, 'POST', '/compress', jpeg_bytes())
+        assert status == 413
+        assert 'error' in json.loads(data)
+
+    def test_busy_server_refuses(self, make_server):
+        """Test that requests beyond the concurrency limit get 503 instead of waiting"""
+        server = make_server(max_requests=1)
+        assert server.request_slots.acquire(blocking=False)  # one request in flight
+        try:
+            status, headers, _ = request(server, 'POST', '/compress', jpeg_bytes((100, 100)))
+            assert status == 503
+            assert headers['Retry-After'] == '1'
+        finally:
+            server.request_slots.release()
+        assert request(server, 'POST', '/compress', jpeg_bytes((100, 100)))[0] == 200
+
+    def test_concurrent_requests_share_pool(self, make_server):
+        """Test that parallel uploads all complete on a small worker pool"""
+        server = make_server(max_workers=2, max_requests=8)
+        body = jpeg_bytes((1200, 800))
+        statuses = []
+        threads = [
+            threading.Thread(target=lambda: statuses.append(request(server, 'POST', '/compress', body)[0]))
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(60)
+        assert statuses == [200] * 6
+
+
+class TestHealth:
+    """Test cases for GET /health"""
+
+    def test_health(self, make_server):
+        """Test that the health endpoint reports the pool state"""
+        server = make_server(max_workers=3, queue_size=5)
+        status, headers, data = request(server, 'GET', '/health')
+        assert status == 200
+        health = json.loads(data)
+        assert health['status'] == 'ok'
+        assert health['workers'] == 3
+        assert health['queue_size'] == 5
+        assert health['active'] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
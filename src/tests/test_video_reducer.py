@@ -4,6 +4,7 @@ Unit tests for video_reducer module
 Tests the VideoReducer class and compress_video function.
 """
 
+import io
 import os
 import sys
 import pytest
@@ -14,7 +15,20 @@ from pathlib import Path
 src_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(src_dir))
 
-from imagereducer.video_reducer import VideoReducer, compress_video
+from imagereducer.video_reducer import VideoReducer, compress_video, check_ffmpeg_installed
+
+# Stands in for FFmpeg in pipe tests: upper-cases stdin to stdout, chunk by chunk
+PIPE_FILTER = (
+    "import sys\n"
+    "while True:\n"
+    "    chunk = sys.stdin.buffer.read1(65536)\n"
+    "    if not chunk: break\n"
+    "    sys.stdout.buffer.write(chunk.upper()); sys.stdout.buffer.flush()\n"
+)
+
+
+def use_command(monkeypatch, script):
+    monkeypatch.setattr(VideoReducer, 'ffmpeg_args', lambda self, *a, **k: [sys.executable, '-c', script])
 
 
 class TestVideoReducer:
@@ -144,6 +158,83 @@ class TestVideoReducer:
             os.unlink(tmp_path)
 
 
+class TestCompressStream:
+    """Test cases for streaming through FFmpeg's pipes"""
+    
+    def test_uses_pipes_and_fragmented_mp4(self):
+        """Test that the command reads stdin and writes fragmented MP4 to stdout"""
+        args = VideoReducer().ffmpeg_args('pipe:0', 'pipe:1', fragmented=True)
+        assert args[args.index('-i') + 1] == 'pipe:0'
+        assert 'empty_moov' in args[args.index('-movflags') + 1]
+        assert args[-2] == 'pipe:1'
+    
+    def test_streams_in_chunks(self, monkeypatch):
+        """Test that output flows before the input is exhausted"""
+        use_command(monkeypatch, PIPE_FILTER)
+        produced = []
+        first_output_at = []
+        
+        def source():
+            for _ in range(16):
+                produced.append(1)
+                yield b"a" * 256 * 1024
+        
+        class Destination(io.RawIOBase):
+            size = 0
+            
+            def write(self, chunk):
+                if not first_output_at:
+                    first_output_at.append(len(produced))
+                self.size += len(chunk)
+                return len(chunk)
+        
+        destination = Destination()
+        result = VideoReducer().compress_stream(source(), destination, chunk_size=64 * 1024)
+        assert result['success'] is True
+        assert result['input_size'] == result['output_size'] == destination.size == 16 * 256 * 1024
+        assert first_output_at[0] < 16
+    
+    def test_accepts_bytes_and_files(self, monkeypatch):
+        """Test bytes-like and file-like inputs"""
+        use_command(monkeypatch, PIPE_FILTER)
+        reducer = VideoReducer()
+        for source in (b"abc" * 1000, memoryview(b"abc" * 1000), io.BytesIO(b"abc" * 1000)):
+            destination = io.BytesIO()
+            assert reducer.compress_stream(source, destination)['success'] is True
+            assert destination.getvalue() == b"ABC" * 1000
+    
+    def test_ffmpeg_failure(self, monkeypatch):
+        """Test that FFmpeg's error message is reported"""
+        use_command(monkeypatch, "import sys; sys.stderr.write('pipe:0: Invalid data found'); sys.exit(1)")
+        result = VideoReducer().compress_stream(b"x" * (4 * 1024 * 1024), io.BytesIO())
+        assert result['success'] is False
+        assert 'Invalid data found' in result['error']
+    
+    def test_source_failure(self, monkeypatch):
+        """Test that an error while reading the source is reported"""
+        use_command(monkeypatch, PIPE_FILTER)
+        
+        def source():
+            yield b"abc"
+            raise ConnectionError("queue closed")
+        
+        result = VideoReducer().compress_stream(source(), io.BytesIO())
+        assert result['success'] is False
+        assert 'queue closed' in result['error']
+    
+    @pytest.mark.skipif(
+        not check_ffmpeg_installed() or not os.path.exists("sample_videos/sample_960x400_ocean_with_audio.mpeg"),
+        reason="FFmpeg or sample video not found"
+    )
+    def test_real_video_stream(self):
+        """Test streaming a real MPEG file to fragmented MP4"""
+        destination = io.BytesIO()
+        with open("sample_videos/sample_960x400_ocean_with_audio.mpeg", 'rb') as source:
+            result = VideoReducer(preset="ultrafast").compress_stream(source, destination)
+        assert result['success'] is True
+        assert destination.getvalue()[4:8] == b"ftyp"
+
+
 class TestCompressVideoFunction:
     """Test cases for compress_video convenience function"""
     
@@ -0,0 +1,130 @@
+"""
+Unit tests for watcher module
+
+Tests settle detection, change tracking and exclusions in polling and inotify mode.
+"""
+
+import os
+import sys
+import time
+import threading
+import pytest
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+from imagereducer.watcher import FolderWatcher, _Inotify
+
+
+def _inotify_available():
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        _Inotify().close()
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def make_watcher(folder, **kwargs):
+    kwargs.setdefault('use_inotify', False)
+    return FolderWatcher(folder, {'.jpg', '.png'}, settle_seconds=0.2, poll_interval=0.05, **kwargs)
+
+
+def collect(watcher, duration=1.0):
+    """Consume changes() for a while and return the reported paths"""
+    found = []
+    thread = threading.Thread(target=lambda: found.extend(watcher.changes()))
+    thread.start()
+    time.sleep(duration)
+    watcher.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    return found
+
+
+class TestPolling:
+    """Test cases for the mtime-polling fallback"""
+
+    def test_new_file_reported_once(self, tmp_path):
+        """Test that a new file is reported once it settles, and only once"""
+        watcher = make_watcher(tmp_path)
+        (tmp_path / "new.jpg").write_bytes(b"x" * 100)
+        (tmp_path / "notes.txt").write_text("ignored")
+        assert collect(watcher) == [tmp_path / "new.jpg"]
+
+    def test_existing_files(self, tmp_path):
+        """Test that files present at start are reported only with include_existing"""
+        (tmp_path / "old.jpg").write_bytes(b"x")
+        assert collect(make_watcher(tmp_path), 0.5) == []
+        assert collect(make_watcher(tmp_path, include_existing=True), 0.5) == [tmp_path / "old.jpg"]
+
+    def test_growing_file_held_back(self, tmp_path):
+        """Test that a file still being written is not reported until it stops growing"""
+        watcher = make_watcher(tmp_path)
+        path = tmp_path / "copying.jpg"
+        with open(path, 'wb') as f:
+            for _ in range(6):
+                f.write(b"x" * 1000)
+                f.flush()
+                list(watcher._settled())
+                watcher._poll()
+                assert list(watcher._settled()) == []
+                time.sleep(0.1)
+        time.sleep(0.3)
+        assert list(watcher._settled()) == [path]
+
+    def test_changed_file_reported_again(self, tmp_path):
+        """Test that rewriting a reported file reports it again"""
+        path = tmp_path / "photo.jpg"
+        path.write_bytes(b"first")
+        watcher = make_watcher(tmp_path, rescan_interval=0)
+        path.write_bytes(b"second version")
+        assert collect(watcher, 0.6) == [path]
+
+    def test_excluded_and_hidden(self, tmp_path):
+        """Test that the output folder and hidden temporary files are ignored"""
+        output = tmp_path / "Reduced"
+        output.mkdir()
+        watcher = make_watcher(tmp_path, exclude=[output])
+        (output / "photo.jpg").write_bytes(b"x")
+        (tmp_path / ".photo.1234abcd.tmp.jpg").write_bytes(b"x")
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        (sub / "nested.png").write_bytes(b"x")
+        assert collect(watcher) == [sub / "nested.png"]
+
+    def test_unchanged_folders_not_listed(self, tmp_path, monkeypatch):
+        """Test that polling only lists folders whose entries changed"""
+        for i in range(5):
+            (tmp_path / f"dir{i}").mkdir()
+        watcher = make_watcher(tmp_path)
+        listed = []
+        original = os.scandir
+        monkeypatch.setattr(os, 'scandir', lambda path: listed.append(path) or original(path))
+        time.sleep(0.05)
+        (tmp_path / "dir3" / "new.jpg").write_bytes(b"x")
+        watcher._poll()
+        assert listed == [str(tmp_path / "dir3")]
+
+
+@pytest.mark.skipif(not _inotify_available(), reason="inotify not available")
+class TestInotify:
+    """Test cases for inotify mode"""
+
+    def test_new_files_and_folders(self, tmp_path):
+        """Test that inotify sees new files, including inside new folders"""
+        watcher = make_watcher(tmp_path, use_inotify=True)
+        assert watcher.uses_inotify
+        (tmp_path / "new.jpg").write_bytes(b"x")
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        (sub / "nested.png").write_bytes(b"x")
+        assert sorted(collect(watcher)) == [tmp_path / "new.jpg", sub / "nested.png"]
+        assert watcher._inotify is None  # released when changes() returned
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
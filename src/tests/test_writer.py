@@ -0,0 +1,170 @@
+"""
+Unit tests for writer module
+
+Tests name reservation, atomic output files and output layouts.
+"""
+
+import os
+import sys
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add src directory to path
+src_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(src_dir))
+
+import imagereducer.writer as writer_module
+from imagereducer.writer import OutputWriter, atomic_output, copy_file, layout_subfolder
+
+
+class TestReserve:
+    """Test cases for OutputWriter.reserve"""
+
+    def test_existing_files_are_indexed(self, tmp_path):
+        """Test that names already in the folder are not handed out"""
+        (tmp_path / "photo.jpg").write_bytes(b"old")
+        (tmp_path / "photo_1.jpg").write_bytes(b"old")
+        writer = OutputWriter(tmp_path)
+        assert writer.reserve("photo", ".jpg").name == "photo_2.jpg"
+        assert writer.reserve("photo", ".png").name == "photo.png"
+
+    def test_parallel_reservations_are_unique(self, tmp_path):
+        """Test that concurrent workers never get the same name"""
+        writer = OutputWriter(tmp_path)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            names = list(executor.map(lambda _: writer.reserve("img", ".jpg").name, range(200)))
+        assert len(set(names)) == 200
+
+    def test_does_not_stat_candidates(self, tmp_path, monkeypatch):
+        """Test that reservations use the index, not the file system"""
+        writer = OutputWriter(tmp_path)
+        monkeypatch.setattr(Path, 'exists', lambda self: pytest.fail("exists() called"))
+        writer.reserve("img", ".jpg")
+
+    def test_release(self, tmp_path):
+        """Test that a released name can be reserved again"""
+        writer = OutputWriter(tmp_path)
+        path = writer.reserve("img", ".jpg")
+        writer.release(path)
+        assert writer.reserve("img", ".jpg") == path
+
+    def test_claim(self, tmp_path):
+        """Test that a claimed name is not handed out, even before it exists"""
+        writer = OutputWriter(tmp_path)
+        claimed = writer.claim(tmp_path / "img.jpg")
+        assert not claimed.exists()
+        assert writer.reserve("img", ".jpg").name == "img_1.jpg"
+
+
+class TestAtomicOutput:
+    """Test cases for atomic writes"""
+
+    def test_success_renames_into_place(self, tmp_path):
+        """Test that the file appears under its final name only"""
+        target = tmp_path / "out.jpg"
+        with atomic_output(target) as tmp:
+            assert tmp.parent == tmp_path
+            assert tmp.suffix == ".jpg"
+            tmp.write_bytes(b"data")
+            assert not target.exists()
+        assert target.read_bytes() == b"data"
+        assert list(tmp_path.iterdir()) == [target]
+
+    def test_failure_leaves_nothing(self, tmp_path):
+        """Test that an interrupted write leaves no partial or temporary file"""
+        target = tmp_path / "out.jpg"
+        target.write_bytes(b"previous")
+        with pytest.raises(RuntimeError):
+            with atomic_output(target) as tmp:
+                tmp.write_bytes(b"partial")
+                raise RuntimeError("encoder crashed")
+        assert target.read_bytes() == b"previous"
+        assert list(tmp_path.iterdir()) == [target]
+
+    def test_fsync_is_batched(self, tmp_path, monkeypatch):
+        """Test that the folder is flushed once per batch and on close"""
+        synced = []
+        monkeypatch.setattr(writer_module, '_fsync_dir', lambda folder: synced.append(folder))
+        with OutputWriter(tmp_path, fsync=True, fsync_batch=4) as writer:
+            for i in range(10):
+                writer.write_bytes(writer.reserve(f"img{i}", ".jpg"), b"x")
+        assert len(synced) == 3  # after 4, after 8, and on close
+        assert len(list(tmp_path.iterdir())) == 10
+
+
+class TestCopyFile:
+    """Test cases for copy_file"""
+
+    def test_copy(self, tmp_path):
+        """Test that the copy has the same content and is a separate file"""
+        source = tmp_path / "a.jpg"
+        source.write_bytes(os.urandom(3 * 1024 * 1024))
+        how = copy_file(source, tmp_path / "b.jpg")
+        assert how in ('reflink', 'copy')
+        assert (tmp_path / "b.jpg").read_bytes() == source.read_bytes()
+        assert not os.path.samefile(source, tmp_path / "b.jpg")
+
+    def test_fallback(self, tmp_path, monkeypatch):
+        """Test that a plain copy is made when the kernel cannot copy"""
+        monkeypatch.setattr(writer_module, '_reflink', lambda src, dst: False)
+
+        def unsupported(*args):
+            raise OSError("not supported")
+
+        monkeypatch.setattr(os, 'copy_file_range', unsupported, raising=False)
+        source = tmp_path / "a.jpg"
+        source.write_bytes(os.urandom(100_000))
+        (tmp_path / "b.jpg").write_bytes(b"old content that is longer" * 10_000)
+        assert copy_file(source, tmp_path / "b.jpg") == 'copy'
+        assert (tmp_path / "b.jpg").read_bytes() == source.read_bytes()
+
+
+class TestLayouts:
+    """Test cases for output layouts"""
+
+    def test_mirror_keeps_subfolders(self, tmp_path):
+        """Test that same-named files in different subfolders do not collide"""
+        source = tmp_path / "photos"
+        for sub in ("a", "b"):
+            (source / sub).mkdir(parents=True)
+            (source / sub / "img.jpg").write_bytes(b"x")
+        writer = OutputWriter(source / "Reduced", layout='mirror', source_root=source)
+        first = writer.reserve("img", ".jpg", source=source / "a" / "img.jpg")
+        second = writer.reserve("img", ".jpg", source=source / "b" / "img.jpg")
+        assert first == source / "Reduced" / "a" / "img.jpg"
+        assert second == source / "Reduced" / "b" / "img.jpg"
+        assert first.parent.is_dir()
+
+    def test_hash_shards_are_stable(self, tmp_path):
+        """Test that hash sharding is deterministic and uses hex prefixes"""
+        subfolder = layout_subfolder('hash', tmp_path / "img.jpg", shard_levels=2)
+        assert subfolder == layout_subfolder('hash', Path("elsewhere") / "img.png", shard_levels=2)
+        assert len(subfolder.parts) == 2
+        assert all(len(part) == 2 for part in subfolder.parts)
+
+    def test_date_layout(self, tmp_path):
+        """Test that the date layout uses the source's modified date"""
+        source = tmp_path / "img.jpg"
+        source.write_bytes(b"x")
+        os.utime(source, (1760600000, 1760600000))  # 2025-10-16
+        assert layout_subfolder('date', source).name.startswith("2025-10-1")
+
+    def test_folders_created_and_listed_once(self, tmp_path, monkeypatch):
+        """Test that each output folder is created and indexed only once"""
+        writer = OutputWriter(tmp_path / "out", layout='hash')
+        scans = []
+        original = os.scandir
+        monkeypatch.setattr(writer_module.os, 'scandir', lambda path: scans.append(path) or original(path))
+        for _ in range(5):
+            writer.reserve("same", ".jpg", source=tmp_path / "same.jpg")
+        assert len(scans) == 1
+
+    def test_invalid_layout(self, tmp_path):
+        """Test that unknown layouts are rejected"""
+        with pytest.raises(ValueError):
+            OutputWriter(tmp_path, layout='random')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
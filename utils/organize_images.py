@@ -5,9 +5,12 @@ from pathlib import Path
 import hashlib
 
 def get_image_hash(filepath):
-    """Calcula el hash MD5 de una imagen para detectar duplicados"""
+    """Calcula el hash MD5 de una imagen para detectar duplicados (por bloques, sin cargarla entera)"""
+    md5 = hashlib.md5()
     with open(filepath, 'rb') as f:
-        return hashlib.md5(f.read()).hexdigest()
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
 
 # Configuración
 workspace_root = Path(__file__).parent